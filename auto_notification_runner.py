@@ -3,16 +3,18 @@
 AUTOMATIC NOTIFICATION RUNNER
 ============================
 
-Mô tả: Chạy tự động xử lý notifications định kỳ
+Mô tả: Chạy tự động xử lý notifications theo sự kiện
 Cách hoạt động:
-1. Chạy liên tục và kiểm tra notifications mỗi phút
-2. Gửi thông báo khi tới thời gian
-3. Log kết quả và lỗi
-4. Chạy song song với web app
+1. Giữ các scheduled_time sắp tới trong min-heap (NotificationDispatcher)
+2. Ngủ đúng tới notification gần nhất, gửi thông báo khi tới thời gian
+3. Tự nạp lại hàng đợi khi web app thêm/xóa notification (PRAGMA data_version)
+4. Log kết quả và lỗi
+5. Chạy song song với web app
 
 Thuật toán chính:
-- Continuous monitoring
-- Scheduled execution
+- Event-driven dispatch (min-heap + wake-up)
+- Change detection qua PRAGMA data_version
+- Periodic resync làm lưới an toàn
 - Error handling
 - Logging
 
@@ -37,12 +39,13 @@ sys.path.append('backend')
 from core.database_manager import DatabaseManager
 from notifications.telegram_notifier import TelegramNotifier
 from notifications.notification_scheduler import NotificationScheduler
+from notifications.notification_dispatcher import NotificationDispatcher
 
 class AutoNotificationRunner:
     def __init__(self):
         """Khởi tạo Auto Notification Runner"""
         self.running = False
-        self.check_interval = 60  # Kiểm tra mỗi 60 giây
+        self.check_interval = 300  # Resync toàn bộ hàng đợi mỗi 300 giây (dự phòng)
         
         # Initialize database
         self.db = DatabaseManager("database/calendar_tools.db")
@@ -52,10 +55,22 @@ class AutoNotificationRunner:
         self.telegram_notifier = TelegramNotifier(bot_token)
         
         # Initialize notification scheduler
-        self.scheduler = NotificationScheduler(self.db, self.telegram_notifier)
+        # NOTIFICATION_DIAGNOSTIC=1 để in thông tin chẩn đoán chi tiết mỗi lần xử lý
+        self.scheduler = NotificationScheduler(
+            self.db,
+            self.telegram_notifier,
+            diagnostic_mode=os.environ.get('NOTIFICATION_DIAGNOSTIC') == '1'
+        )
+        
+        # Initialize event-driven dispatcher
+        self.dispatcher = NotificationDispatcher(
+            self.db,
+            process_fn=self._check_and_process_notifications,
+            resync_interval=self.check_interval
+        )
         
         print("✅ Auto Notification Runner initialized")
-        print(f"⏰ Check interval: {self.check_interval} seconds")
+        print(f"⏰ Resync interval: {self.check_interval} seconds")
     
     def start(self):
         """Bắt đầu chạy tự động"""
@@ -66,11 +81,9 @@ class AutoNotificationRunner:
         try:
             while self.running:
                 try:
-                    # Kiểm tra và xử lý notifications
-                    self._check_and_process_notifications()
-                    
-                    # Chờ interval
-                    time.sleep(self.check_interval)
+                    # Ngủ tới notification gần nhất và xử lý khi đến hạn
+                    self.dispatcher.run_forever()
+                    break
                     
                 except KeyboardInterrupt:
                     print("\n⏹️  Stopping Auto Notification Runner...")
@@ -83,6 +96,8 @@ class AutoNotificationRunner:
         except Exception as e:
             print(f"❌ Fatal error: {e}")
         finally:
+            # Ghi nốt trạng thái các notification đã gửi nhưng chưa flush
+            self.scheduler.flush_status_updates()
             print("✅ Auto Notification Runner stopped")
     
     def _check_and_process_notifications(self):
@@ -108,6 +123,7 @@ class AutoNotificationRunner:
     def stop(self):
         """Dừng runner"""
         self.running = False
+        self.dispatcher.stop()
 
 def main():
     """Main function"""
@@ -12,7 +12,8 @@ Cách hoạt động:
 
 Thuật toán:
 - Sử dụng SQLite cho đơn giản
-- Tạo connection pool để tối ưu performance
+- Dùng connection pool chung (shared/database/connection_pool.py):
+  connection theo thread, WAL + synchronous=NORMAL + busy_timeout
 - Sử dụng context manager để quản lý connection
 - Validate data trước khi insert/update
 
@@ -29,9 +30,14 @@ Ví dụ:
 
 import sqlite3
 import os
+import sys
 from typing import Optional, List, Dict, Any, Tuple
 from contextlib import contextmanager
 
+# Để import từ shared
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.database.connection_pool import get_pool
+
 class DatabaseManager:
     def __init__(self, db_path: str = "database/calendar_tools.db"):
         """
@@ -95,7 +101,9 @@ class DatabaseManager:
                 priority TEXT DEFAULT 'medium',
                 status TEXT DEFAULT 'pending',
                 created_at TEXT,
-                last_modified TEXT
+                last_modified TEXT,
+                deadline_epoch INTEGER,
+                created_at_epoch INTEGER
             )
             """
             
@@ -117,6 +125,8 @@ class DatabaseManager:
                 source TEXT DEFAULT 'manual',
                 created_at TEXT,
                 last_modified TEXT,
+                deadline_epoch INTEGER,
+                created_at_epoch INTEGER,
                 FOREIGN KEY (task_id) REFERENCES tasks (task_id)
             )
             """
@@ -132,7 +142,13 @@ class DatabaseManager:
                 scheduled_time TEXT,
                 sent_at TEXT,
                 status TEXT DEFAULT 'pending',
+                failure_reason TEXT,
+                claim_token TEXT,
                 created_at TEXT,
+                scheduled_epoch INTEGER,
+                sent_at_epoch INTEGER,
+                created_at_epoch INTEGER,
+                lease_expires_epoch INTEGER,
                 FOREIGN KEY (task_id) REFERENCES tasks (task_id),
                 FOREIGN KEY (event_id) REFERENCES calendar_events (event_id)
             )
@@ -159,6 +175,9 @@ class DatabaseManager:
             # Kiểm tra và cập nhật bảng tasks nếu cần
             self._update_tasks_table_schema(conn)
             
+            # Indexes cho các query nóng (notification runner, web app)
+            self._create_performance_indexes(conn)
+            
             conn.commit()
             print("✅ Database tables created successfully")
             
@@ -202,9 +221,69 @@ class DatabaseManager:
                     except Exception as e:
                         print(f"⚠️  Could not add user_id to calendar_events: {e}")
             
+            # Kiểm tra và cập nhật notifications
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='notifications'")
+            if cursor.fetchone():
+                cursor.execute("PRAGMA table_info(notifications)")
+                notification_columns = [column[1] for column in cursor.fetchall()]
+                
+                for column in ('failure_reason', 'claim_token'):
+                    if column not in notification_columns:
+                        print(f"🔄 Adding {column} column to notifications table...")
+                        try:
+                            cursor.execute(f"ALTER TABLE notifications ADD COLUMN {column} TEXT")
+                            print(f"✅ Added {column} column to notifications table")
+                        except Exception as e:
+                            print(f"⚠️  Could not add {column} to notifications: {e}")
+            
+            # Cột epoch INTEGER (UTC) song song với các cột thời gian TEXT
+            epoch_columns = {
+                'tasks': ('deadline_epoch', 'created_at_epoch'),
+                'calendar_events': ('deadline_epoch', 'created_at_epoch'),
+                'notifications': ('scheduled_epoch', 'sent_at_epoch', 'created_at_epoch', 'lease_expires_epoch'),
+            }
+            for table, table_columns in epoch_columns.items():
+                cursor.execute(f"PRAGMA table_info({table})")
+                existing = [column[1] for column in cursor.fetchall()]
+                if not existing:
+                    continue
+                for column in table_columns:
+                    if column not in existing:
+                        try:
+                            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER")
+                            print(f"✅ Added {column} column to {table} table")
+                        except Exception as e:
+                            print(f"⚠️  Could not add {column} to {table}: {e}")
+            
         except Exception as e:
             print(f"⚠️  Error updating tasks table schema: {e}")
     
+    def _create_performance_indexes(self, conn: sqlite3.Connection) -> None:
+        """Tạo indexes cho các query chạy thường xuyên (bỏ qua nếu bảng chưa có)"""
+        indexes = [
+            # _get_pending_notifications: WHERE status = 'pending' AND scheduled_time <= ?
+            "CREATE INDEX IF NOT EXISTS idx_notifications_status_time ON notifications (status, scheduled_time)",
+            "CREATE INDEX IF NOT EXISTS idx_notifications_task_id ON notifications (task_id)",
+            # Ghi trạng thái theo claim
+            "CREATE INDEX IF NOT EXISTS idx_notifications_claim_token ON notifications (claim_token)",
+            # Lookup telegram_user_id theo user
+            "CREATE INDEX IF NOT EXISTS idx_user_settings_user_key ON user_settings (user_id, setting_key)",
+            # get_tasks_page: keyset theo (created_at, task_id) trong từng user
+            "CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks (user_id, created_at, task_id)",
+            # get_task_stats: COUNT(*) ... GROUP BY status trong từng user
+            "CREATE INDEX IF NOT EXISTS idx_tasks_user_status ON tasks (user_id, status)",
+            # Scheduler claim: WHERE status = 'pending' AND scheduled_epoch <= ?
+            "CREATE INDEX IF NOT EXISTS idx_notifications_status_epoch ON notifications (status, scheduled_epoch)",
+            # Range theo deadline (epoch) trong từng user
+            "CREATE INDEX IF NOT EXISTS idx_tasks_user_deadline_epoch ON tasks (user_id, deadline_epoch)",
+        ]
+        
+        for index_query in indexes:
+            try:
+                conn.execute(index_query)
+            except sqlite3.OperationalError as e:
+                print(f"⚠️  Could not create index: {e}")
+    
     def _create_users_table(self, conn: sqlite3.Connection) -> None:
         """Tạo bảng users"""
         query = """
@@ -321,21 +400,19 @@ class DatabaseManager:
         """
         Context manager để quản lý database connection
         
+        Connection được mượn từ pool dùng chung; khối ngoài cùng commit khi
+        thành công, rollback khi có lỗi rồi trả connection về pool.
+        Lưu ý: trước đây phần ghi chưa conn.commit() bị bỏ khi đóng connection,
+        nay được commit tự động khi khối kết thúc không lỗi. Khối get_connection()
+        lồng nhau trong cùng thread chạy trong SAVEPOINT: lỗi chỉ hoàn tác phần
+        của khối trong, conn.commit() bên trong không commit sớm khối ngoài.
+        
         Yields:
             sqlite3.Connection: Database connection
         """
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # Để có thể access columns by name
+        # sqlite3.Row để có thể access columns by name
+        with get_pool(self.db_path).connection(row_factory=sqlite3.Row) as conn:
             yield conn
-        except Exception as e:
-            if conn:
-                conn.rollback()
-            raise e
-        finally:
-            if conn:
-                conn.close()
     
     def execute_query(self, conn: sqlite3.Connection, query: str, params: Tuple = ()) -> List[Dict[str, Any]]:
         """
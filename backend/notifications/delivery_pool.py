@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+DELIVERY POOL MODULE
+===================
+
+Mô tả: Worker pool gửi thông báo song song qua nhiều kênh
+Cách hoạt động:
+1. Nhận một batch notifications đến hạn
+2. Gửi song song bằng ThreadPoolExecutor có giới hạn số worker
+3. Mỗi kênh (telegram, email, zalo) có giới hạn concurrency riêng
+4. Thu thập toàn bộ kết quả để ghi trạng thái theo batch
+
+Thuật toán chính:
+- Bounded thread pool (concurrent.futures)
+- BoundedSemaphore cho từng kênh
+- Collect results theo thứ tự đầu vào
+
+Hướng dẫn sử dụng:
+1. Khởi tạo DeliveryPool(max_workers, channel_limits)
+2. Gọi run_batch(fn, items) để gửi cả batch
+3. Bọc lời gọi API của từng kênh trong channel_slot('telegram')
+
+Ví dụ:
+    pool = DeliveryPool(max_workers=8, channel_limits={'telegram': 8})
+    outcomes = pool.run_batch(scheduler._send_notification, notifications)
+    for item, result, error in outcomes:
+        ...
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_CHANNEL_LIMITS = {
+    'telegram': 8,
+    'email': 4,
+    'zalo': 4,
+}
+
+class DeliveryPool:
+    def __init__(self, max_workers: int = 8, channel_limits: Optional[Dict[str, int]] = None):
+        """
+        Khởi tạo DeliveryPool
+
+        Args:
+            max_workers: Số worker tối đa gửi đồng thời
+            channel_limits: Số request đồng thời tối đa cho từng kênh
+        """
+        self.max_workers = max_workers
+        self.channel_limits = dict(DEFAULT_CHANNEL_LIMITS)
+        if channel_limits:
+            self.channel_limits.update(channel_limits)
+
+        self._semaphores = {
+            channel: threading.BoundedSemaphore(limit)
+            for channel, limit in self.channel_limits.items()
+        }
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Tạo executor khi cần (lazy) để không sinh thread lúc import"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='notif-delivery'
+                )
+            return self._executor
+
+    @contextmanager
+    def channel_slot(self, channel: str):
+        """
+        Giữ một slot của kênh trong lúc gọi API
+
+        Args:
+            channel: Tên kênh (telegram, email, zalo)
+        """
+        semaphore = self._semaphores.get(channel)
+        if semaphore is None:
+            yield
+            return
+        with semaphore:
+            yield
+
+    def run_batch(self, fn: Callable[[Any], Any], items: Iterable[Any]) -> List[Tuple[Any, Any, Optional[Exception]]]:
+        """
+        Thuật toán gửi batch:
+        1. Submit từng item vào pool
+        2. Chờ tất cả hoàn tất
+        3. Trả về (item, result, error) theo thứ tự đầu vào
+
+        Args:
+            fn: Hàm gửi cho một item
+            items: Danh sách items
+
+        Returns:
+            List (item, result, error); error là None nếu thành công
+        """
+        items = list(items)
+        if not items:
+            return []
+
+        # Một item thì gửi trực tiếp, không cần qua pool
+        if len(items) == 1:
+            return [self._call(fn, items[0])]
+
+        executor = self._get_executor()
+        futures = [executor.submit(self._call, fn, item) for item in items]
+        return [future.result() for future in futures]
+
+    def _call(self, fn: Callable[[Any], Any], item: Any) -> Tuple[Any, Any, Optional[Exception]]:
+        try:
+            return item, fn(item), None
+        except Exception as e:
+            return item, None, e
+
+    def shutdown(self, wait: bool = True):
+        """Dừng pool"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
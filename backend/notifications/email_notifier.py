@@ -11,40 +11,49 @@ Cách hoạt động:
 4. Xử lý lỗi và retry
 
 Thuật toán chính:
-- Sử dụng SMTP protocol
+- Sử dụng SMTP protocol qua SMTPConnectionPool (giữ kết nối đã login, gửi nhiều email/kết nối)
 - HTML email templates
 - Attachment support
 - Retry mechanism
-- Rate limiting
+- Rate limiting dùng chung (token bucket theo SMTP account + theo người nhận)
 
 Hướng dẫn sử dụng:
 1. Cấu hình SMTP settings trong config
 2. Gọi send_email() để gửi email
 3. Gọi send_template_email() để gửi template
 4. Gọi send_attachment_email() để gửi file
+5. Gọi send_bulk_emails() để gửi nhiều email trên cùng kết nối
 
 Ví dụ:
     notifier = EmailNotifier(smtp_config)
     notifier.send_email("user@example.com", "Subject", "Body")
 """
 
-import smtplib
-import ssl
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
 from typing import Dict, Any, Optional, List
 from datetime import datetime
-import time
+import os
+import sys
+
+# Add parent directory to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from notifications.rate_limiter import get_shared_rate_limiter
+from notifications.smtp_pool import SMTPConnectionPool
 
 class EmailNotifier:
-    def __init__(self, smtp_config: Dict[str, Any]):
+    def __init__(self, smtp_config: Dict[str, Any], rate_limiter=None):
         """
         Khởi tạo EmailNotifier
         
         Args:
             smtp_config: Dict chứa SMTP configuration
+            rate_limiter: RateLimiter instance (mặc định: limiter dùng chung)
         """
         self.smtp_server = smtp_config.get('smtp_server', 'smtp.gmail.com')
         self.smtp_port = smtp_config.get('smtp_port', 587)
@@ -54,7 +63,20 @@ class EmailNotifier:
         self.from_name = smtp_config.get('from_name', 'Calendar Tools')
         
         self.max_retries = 3
-        self.rate_limit_delay = 2  # Delay giữa các email (seconds)
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter()
+        self.rate_limit_delay = 2  # Backoff cơ sở khi lỗi tạm thời (seconds)
+        
+        # use_tls=False + username rỗng để test với SMTP server local (aiosmtpd)
+        self.smtp_pool = SMTPConnectionPool(
+            self.smtp_server,
+            self.smtp_port,
+            username=self.username,
+            password=self.password,
+            use_tls=smtp_config.get('use_tls', True),
+            use_ssl=smtp_config.get('use_ssl', False),
+            max_size=smtp_config.get('pool_size', 2),
+            timeout=smtp_config.get('timeout', 30)
+        )
     
     def send_email(self, to_email: str, subject: str, body: str, is_html: bool = True) -> bool:
         """
@@ -95,25 +117,9 @@ class EmailNotifier:
                 message.attach(text_body)
             
             # Bước 4: Gửi email với retry
-            for attempt in range(self.max_retries):
-                try:
-                    # Kết nối SMTP
-                    context = ssl.create_default_context()
-                    with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                        server.starttls(context=context)
-                        server.login(self.username, self.password)
-                        
-                        # Gửi email
-                        text = message.as_string()
-                        server.sendmail(self.from_email, to_email, text)
-                        
-                        print(f"✅ Email sent to {to_email}")
-                        return True
-                        
-                except Exception as e:
-                    print(f"❌ Email send error (attempt {attempt + 1}): {e}")
-                    if attempt < self.max_retries - 1:
-                        time.sleep(self.rate_limit_delay * (attempt + 1))
+            if self._deliver(to_email, message):
+                print(f"✅ Email sent to {to_email}")
+                return True
             
             return False
             
@@ -121,6 +127,56 @@ class EmailNotifier:
             print(f"❌ Email error: {e}")
             return False
     
+    def _deliver(self, to_email: str, message) -> bool:
+        """
+        Gửi MIME message qua kết nối lấy từ pool, retry khi lỗi
+        
+        Kết nối hỏng bị pool loại bỏ nên lần retry sau sẽ tự reconnect.
+        
+        Args:
+            to_email: Email người nhận
+            message: MIME message
+            
+        Returns:
+            True nếu gửi thành công
+        """
+        text = message.as_string()
+        for attempt in range(self.max_retries):
+            self.rate_limiter.acquire('email', to_email)
+            try:
+                with self.smtp_pool.connection() as server:
+                    server.sendmail(self.from_email, to_email, text)
+                return True
+                
+            except Exception as e:
+                print(f"❌ Email send error (attempt {attempt + 1}): {e}")
+                if attempt < self.max_retries - 1:
+                    self.rate_limiter.penalize('email', to_email, self.rate_limit_delay * (attempt + 1))
+        
+        return False
+    
+    def send_bulk_emails(self, messages: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Gửi nhiều email, tái sử dụng kết nối SMTP đã login trong pool
+        
+        Args:
+            messages: List dict gồm to_email, subject, body, is_html (optional)
+            
+        Returns:
+            Dict {'sent': n, 'failed': m}
+        """
+        sent = 0
+        for item in messages:
+            if self.send_email(item['to_email'], item['subject'], item['body'], item.get('is_html', True)):
+                sent += 1
+        
+        print(f"✅ Bulk email: {sent}/{len(messages)} sent")
+        return {'sent': sent, 'failed': len(messages) - sent}
+    
+    def close(self):
+        """Đóng các kết nối SMTP đang giữ"""
+        self.smtp_pool.close_all()
+    
     def send_template_email(self, to_email: str, template_name: str, data: Dict[str, Any]) -> bool:
         """
         Gửi email theo template
@@ -178,12 +234,8 @@ class EmailNotifier:
             message.attach(part)
             
             # Gửi email
-            context = ssl.create_default_context()
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls(context=context)
-                server.login(self.username, self.password)
-                text = message.as_string()
-                server.sendmail(self.from_email, to_email, text)
+            if not self._deliver(to_email, message):
+                return False
             
             print(f"✅ Email with attachment sent to {to_email}")
             return True
@@ -302,5 +354,40 @@ def test_email_notifier():
         import traceback
         traceback.print_exc()
 
+def test_email_notifier_local(port: int = 8025):
+    """
+    Test gửi nhiều email qua SMTP server local (không TLS, không login)
+    
+    Chạy server trước: python -m aiosmtpd -n -l localhost:8025
+    """
+    try:
+        smtp_config = {
+            'smtp_server': 'localhost',
+            'smtp_port': port,
+            'use_tls': False,
+            'from_email': 'calendar-tools@localhost',
+            'from_name': 'Calendar Tools Test'
+        }
+        
+        notifier = EmailNotifier(smtp_config)
+        messages = [
+            {'to_email': f'user{i}@localhost', 'subject': f'Test {i}', 'body': f'Body {i}'}
+            for i in range(5)
+        ]
+        
+        result = notifier.send_bulk_emails(messages)
+        print(f"✅ send_bulk_emails() works: {result}")
+        notifier.close()
+        
+        print("🎉 EmailNotifier local test passed!")
+        
+    except Exception as e:
+        print(f"❌ EmailNotifier local test failed: {e}")
+        import traceback
+        traceback.print_exc()
+
 if __name__ == "__main__":
-    test_email_notifier()
\ No newline at end of file
+    if os.environ.get('SMTP_TEST_PORT'):
+        test_email_notifier_local(int(os.environ['SMTP_TEST_PORT']))
+    else:
+        test_email_notifier()
\ No newline at end of file
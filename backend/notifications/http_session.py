@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP SESSION MODULE
+==================
+
+Mô tả: Tạo requests.Session có connection pool dùng chung cho các notifier
+Cách hoạt động:
+1. Mỗi notifier giữ một Session keep-alive (không handshake TCP+TLS mỗi tin)
+2. HTTPAdapter giới hạn số connection theo pool_size, các worker chờ khi hết
+3. Tắt cookie để Session an toàn khi dùng chung giữa các worker thread
+
+Thuật toán chính:
+- urllib3 connection pool (thread-safe) qua requests HTTPAdapter
+- pool_block=True để không mở quá pool_size connection
+- Cookie policy chặn toàn bộ cookie (API bot không cần cookie)
+
+Hướng dẫn sử dụng:
+1. Gọi create_http_session(pool_size) khi khởi tạo notifier
+2. Dùng session.post/get với timeout=(connect_timeout, read_timeout)
+3. Gọi session.close() khi dừng
+
+Ví dụ:
+    session = create_http_session(pool_size=8)
+    session.post(url, json=payload, timeout=(5, 30))
+"""
+
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+def create_http_session(pool_size: int = 10, pool_connections: int = 2) -> requests.Session:
+    """
+    Tạo Session keep-alive có connection pool
+
+    Args:
+        pool_size: Số connection tối đa tới mỗi host
+        pool_connections: Số host được giữ pool
+
+    Returns:
+        requests.Session
+    """
+    session = requests.Session()
+
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_size,
+        pool_block=True
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    # Không lưu cookie -> không có state dùng chung giữa các thread
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    return session
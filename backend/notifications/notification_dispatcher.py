@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+NOTIFICATION DISPATCHER MODULE
+=============================
+
+Mô tả: Điều phối gửi thông báo theo sự kiện thay vì polling cố định
+Cách hoạt động:
+1. Nạp các scheduled_time sắp tới của notifications pending vào min-heap
+2. Ngủ đúng tới thời điểm notification gần nhất đến hạn
+3. Bị đánh thức sớm khi có notification mới/bị xóa (DB thay đổi hoặc wake())
+4. Gọi hàm xử lý (process_pending_notifications) khi có notification đến hạn
+
+Thuật toán chính:
+- Min-heap (heapq) theo timestamp của scheduled_time
+- PRAGMA data_version trên 1 connection cố định để phát hiện commit từ
+  process khác (web app tạo/sửa task) với chi phí gần như bằng 0, không đọc bảng nào
+- threading.Event cho wake()/stop() từ thread khác
+- Resync định kỳ làm lưới an toàn
+
+Hướng dẫn sử dụng:
+1. Khởi tạo NotificationDispatcher(db, scheduler)
+2. Gọi run_forever() trong runner (blocking)
+3. Gọi wake() khi biết có notification pending vừa thay đổi
+4. Gọi stop() để dừng
+
+Ví dụ:
+    dispatcher = NotificationDispatcher(db, scheduler)
+    dispatcher.run_forever()
+"""
+
+import heapq
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+class NotificationDispatcher:
+    def __init__(self, db, scheduler=None, process_fn: Optional[Callable[[], object]] = None,
+                 change_poll_interval: float = 1.0, resync_interval: float = 300,
+                 retry_delay: float = 30, heap_size: int = 256):
+        """
+        Khởi tạo NotificationDispatcher
+
+        Args:
+            db: DatabaseManager instance
+            scheduler: NotificationScheduler instance
+            process_fn: Hàm xử lý khi có notification đến hạn
+                        (mặc định: scheduler.process_pending_notifications)
+            change_poll_interval: Chu kỳ kiểm tra PRAGMA data_version (giây)
+            resync_interval: Chu kỳ nạp lại toàn bộ heap để dự phòng (giây)
+            retry_delay: Thời gian hoãn notification đến hạn nhưng chưa được xử lý (giây)
+            heap_size: Số notification gần nhất được giữ trong heap
+        """
+        if process_fn is None and scheduler is None:
+            raise ValueError("scheduler or process_fn is required")
+
+        self.db = db
+        self.scheduler = scheduler
+        self.process_fn = process_fn or scheduler.process_pending_notifications
+        self.change_poll_interval = change_poll_interval
+        self.resync_interval = resync_interval
+        self.retry_delay = retry_delay
+        self.heap_size = heap_size
+
+        self._heap: List[Tuple[float, str]] = []
+        self._retry_after: Dict[str, float] = {}
+        self._wake_event = threading.Event()
+        self._running = False
+        self._watch_conn: Optional[sqlite3.Connection] = None
+        self._data_version = None
+        self._last_resync = 0.0
+        print("✅ NotificationDispatcher initialized")
+
+    def wake(self, *args, **kwargs):
+        """Đánh thức dispatcher để nạp lại heap (thread-safe)"""
+        self._wake_event.set()
+
+    def stop(self):
+        """Dừng dispatcher"""
+        self._running = False
+        self._wake_event.set()
+
+    def run_forever(self):
+        """
+        Thuật toán vòng lặp chính:
+        1. Nạp heap từ DB
+        2. Ngủ tới min(notification gần nhất, chu kỳ kiểm tra data_version)
+        3. Nếu bị wake() hoặc DB đổi -> nạp lại heap
+        4. Nếu có notification đến hạn -> gọi process_fn rồi nạp lại heap
+        """
+        self._running = True
+        self._reload()
+
+        try:
+            while self._running:
+                try:
+                    woken = self._wake_event.wait(self._seconds_until_wakeup())
+                    if not self._running:
+                        break
+
+                    if woken:
+                        self._wake_event.clear()
+
+                    if woken or self._db_changed() or self._resync_due():
+                        self._reload()
+
+                    if self._has_due():
+                        self._dispatch_due()
+
+                except Exception as e:
+                    print(f"❌ Error in dispatcher loop: {e}")
+                    time.sleep(self.change_poll_interval)
+        finally:
+            self._close_watch_connection()
+
+    def _seconds_until_wakeup(self) -> float:
+        """Tính thời gian ngủ: không quá chu kỳ kiểm tra data_version"""
+        timeout = self.change_poll_interval
+        if self._heap:
+            timeout = min(timeout, self._heap[0][0] - time.time())
+        return max(timeout, 0.0)
+
+    def _has_due(self) -> bool:
+        return bool(self._heap) and self._heap[0][0] <= time.time()
+
+    def _resync_due(self) -> bool:
+        return time.time() - self._last_resync >= self.resync_interval
+
+    def _dispatch_due(self):
+        """Gọi hàm xử lý rồi hoãn các notification vẫn còn pending sau khi xử lý"""
+        now = time.time()
+        due_ids = [nid for ts, nid in self._heap if ts <= now]
+
+        self.process_fn()
+        self._reload()
+
+        # Notification đã đến hạn nhưng vẫn pending (vd: format thời gian lạ)
+        # -> hoãn lại để tránh vòng lặp bận
+        still_pending = {nid for ts, nid in self._heap if ts <= time.time()} & set(due_ids)
+        if still_pending:
+            retry_at = time.time() + self.retry_delay
+            for nid in still_pending:
+                self._retry_after[nid] = retry_at
+            print(f"⚠️  {len(still_pending)} due notifications still pending, retry in {self.retry_delay}s")
+            self._reload()
+
+    def _reload(self):
+        """Nạp lại heap với các notification pending gần nhất"""
+        # Cập nhật mốc data_version trước khi đọc để không bỏ sót commit xen giữa
+        self._db_changed()
+
+        with self.db.get_connection() as conn:
+            # Range scan trên idx_notifications_status_epoch (không lẫn dòng NULL)
+            rows = conn.execute("""
+                SELECT notification_id, lease_expires_epoch, scheduled_epoch
+                FROM notifications
+                WHERE status = 'pending' AND scheduled_epoch IS NOT NULL
+                ORDER BY scheduled_epoch
+                LIMIT ?
+            """, (self.heap_size,)).fetchall()
+            # Dòng cũ chưa có scheduled_epoch: scheduler chuẩn hóa (điền epoch hoặc
+            # đánh dấu failed) ở lần claim kế tiếp -> coi như đến hạn ngay
+            legacy = conn.execute("""
+                SELECT notification_id, lease_expires_epoch
+                FROM notifications
+                WHERE status = 'pending' AND scheduled_epoch IS NULL
+                LIMIT ?
+            """, (self.heap_size,)).fetchall()
+
+        now = time.time()
+        entries = [(row[0], row[1], float(row[2])) for row in rows]
+        entries += [(row[0], row[1], now) for row in legacy]
+
+        heap = []
+        seen = set()
+        for nid, lease_expires_epoch, ts in entries:
+            # Đang được runner khác (hoặc chính runner này) giữ -> chờ tới khi hết lease
+            if lease_expires_epoch:
+                ts = max(ts, float(lease_expires_epoch))
+            ts = max(ts, self._retry_after.get(nid, 0.0))
+            heap.append((ts, nid))
+            seen.add(nid)
+        heap = heapq.nsmallest(self.heap_size, heap)
+        heapq.heapify(heap)
+
+        self._heap = heap
+        self._retry_after = {nid: t for nid, t in self._retry_after.items() if nid in seen}
+        self._last_resync = time.time()
+
+        if heap:
+            next_at = datetime.fromtimestamp(heap[0][0]).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"⏰ Next notification due at {next_at} ({len(heap)} queued)")
+
+    def _db_changed(self) -> bool:
+        """Kiểm tra có commit nào từ connection khác không (PRAGMA data_version)"""
+        try:
+            if self._watch_conn is None:
+                self._watch_conn = sqlite3.connect(self.db.db_path)
+                self._data_version = self._watch_conn.execute("PRAGMA data_version").fetchone()[0]
+                return False
+
+            version = self._watch_conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._data_version:
+                self._data_version = version
+                return True
+            return False
+        except sqlite3.Error as e:
+            print(f"⚠️  Error checking data_version: {e}")
+            self._close_watch_connection()
+            return True
+
+    def _close_watch_connection(self):
+        if self._watch_conn is not None:
+            try:
+                self._watch_conn.close()
+            except sqlite3.Error:
+                pass
+            self._watch_conn = None
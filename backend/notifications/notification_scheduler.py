@@ -28,21 +28,31 @@ Ví dụ:
 
 import os
 import sys
-import sqlite3
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+import random
+import socket
+import time
+import uuid
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
 
 # Add parent directory to path
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
-# Import UserSettingsManager để lấy labels
-sys.path.append(os.path.dirname(parent_dir))  # Để import từ shared
-from shared.database.user_settings_manager import UserSettingsManager
+from notifications.delivery_pool import DeliveryPool
+from notifications.status_buffer import NotificationStatusBuffer
+from notifications.user_profile_cache import UserProfileCache
+from utils.date_utils import parse_datetime
+from utils.epoch_utils import to_epoch
 
 class NotificationScheduler:
-    def __init__(self, db, telegram_notifier=None, email_notifier=None, zalo_notifier=None):
+    def __init__(self, db, telegram_notifier=None, email_notifier=None, zalo_notifier=None,
+                 batch_size: int = 500, diagnostic_mode: bool = False, diagnostic_sample_size: int = 20,
+                 max_workers: int = 8, channel_limits: Optional[Dict[str, int]] = None,
+                 status_batch_size: int = 100, status_flush_interval: float = 1.0,
+                 lease_seconds: int = 300, runner_id: Optional[str] = None,
+                 profile_ttl: float = 60):
         """
         Khởi tạo NotificationScheduler
         
@@ -51,11 +61,30 @@ class NotificationScheduler:
             telegram_notifier: TelegramNotifier instance
             email_notifier: EmailNotifier instance
             zalo_notifier: ZaloNotifier instance
+            batch_size: Số notification tối đa lấy mỗi lần xử lý
+            diagnostic_mode: In thông tin chẩn đoán chi tiết mỗi lần xử lý
+            diagnostic_sample_size: Số dòng tối đa in ra mỗi mục chẩn đoán
+            max_workers: Số worker gửi song song
+            channel_limits: Giới hạn gửi đồng thời theo kênh, vd {'telegram': 8}
+            status_batch_size: Số kết quả gửi tối đa gom lại trước khi ghi DB
+            status_flush_interval: Thời gian tối đa (giây) giữ kết quả trước khi ghi DB
+            lease_seconds: Thời gian giữ claim một batch (hết hạn thì runner khác lấy lại)
+            runner_id: Tên runner ghi vào claim_token (mặc định: hostname:pid)
+            profile_ttl: Thời gian cache profile gửi thông báo của user (giây)
         """
         self.db = db
         self.telegram_notifier = telegram_notifier
         self.email_notifier = email_notifier
         self.zalo_notifier = zalo_notifier
+        self.batch_size = batch_size
+        self.diagnostic_mode = diagnostic_mode
+        self.diagnostic_sample_size = diagnostic_sample_size
+        self.delivery_pool = DeliveryPool(max_workers=max_workers, channel_limits=channel_limits)
+        self.status_buffer = NotificationStatusBuffer(db, max_batch=status_batch_size,
+                                                      max_delay=status_flush_interval)
+        self.lease_seconds = lease_seconds
+        self.runner_id = runner_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.profile_cache = UserProfileCache(db, ttl=profile_ttl)
         print("✅ NotificationScheduler initialized")
     
     def process_pending_notifications(self) -> Dict[str, Any]:
@@ -66,7 +95,7 @@ class NotificationScheduler:
             Dict chứa kết quả xử lý
         """
         try:
-            # Lấy notifications cần gửi
+            # Claim notifications cần gửi (runner khác sẽ không lấy trùng)
             pending_notifications = self._get_pending_notifications()
             
             if not pending_notifications:
@@ -75,34 +104,27 @@ class NotificationScheduler:
             processed_count = 0
             success_count = 0
             
-            for notification in pending_notifications:
-                try:
-                    # Gửi thông báo
-                    sent = self._send_notification(notification)
-                    
-                    if sent:
-                        success_count += 1
-                        # Cập nhật trạng thái thành sent
-                        self._update_notification_status(
-                            notification['notification_id'], 
-                            'sent'
-                        )
-                    else:
-                        # Cập nhật trạng thái thành failed
-                        self._update_notification_status(
-                            notification['notification_id'], 
-                            'failed'
-                        )
-                    
-                    processed_count += 1
-                    
-                except Exception as e:
-                    print(f"❌ Error processing notification {notification['notification_id']}: {e}")
-                    self._update_notification_status(
-                        notification['notification_id'], 
-                        'failed'
-                    )
-                    processed_count += 1
+            # Gửi song song cả batch; mỗi kết quả được đưa vào status buffer
+            # (ghi DB theo batch khi đủ số lượng hoặc hết thời gian chờ)
+            outcomes = self.delivery_pool.run_batch(self._deliver_notification, pending_notifications)
+            
+            for notification, result, error in outcomes:
+                if error is not None:
+                    print(f"❌ Error processing notification {notification['notification_id']}: {error}")
+                    sent, reason, sent_at = False, f"error: {error}", None
+                else:
+                    sent, reason, sent_at = result
+                
+                claim_token = notification.get('claim_token')
+                if sent:
+                    success_count += 1
+                    self.status_buffer.add(notification['notification_id'], 'sent',
+                                           sent_at=sent_at, claim_token=claim_token)
+                else:
+                    self.status_buffer.add(notification['notification_id'], 'failed', reason,
+                                           sent_at=sent_at, claim_token=claim_token)
+                
+                processed_count += 1
             
             print(f"✅ Processed {processed_count} notifications, {success_count} sent successfully")
             
@@ -118,160 +140,204 @@ class NotificationScheduler:
             return {'status': 'error', 'error': str(e)}
     
     def _get_pending_notifications(self) -> List[Dict[str, Any]]:
-        """Lấy danh sách notifications cần gửi"""
+        """
+        Claim và lấy danh sách notifications cần gửi
+        
+        Thuật toán:
+        1. Claim batch bằng một UPDATE nguyên tử: gán claim_token + lease_expires_epoch
+           cho các dòng pending đến hạn chưa bị claim hoặc đã hết lease
+        2. Một query trên claim_token, JOIN tasks để lấy owner
+        3. Nạp profile (chat id, label, ...) của mọi owner trong batch bằng một query
+        4. Nếu bật diagnostic_mode thì in thêm thông tin chẩn đoán (có sampling + giới hạn)
+        
+        Nhiều runner chạy song song sẽ nhận các batch rời nhau; runner chết giữa chừng
+        thì batch của nó được runner khác lấy lại khi lease hết hạn.
+        """
         try:
             now = datetime.now()
             current_time = now.strftime('%Y-%m-%d %H:%M:%S')
             
-            print(f"🔍 Looking for notifications scheduled before: {current_time}")
-            
             with self.db.get_connection() as conn:
+                claim_token = self._claim_notifications(conn)
+                if claim_token is None:
+                    if self.diagnostic_mode:
+                        self._print_diagnostics(conn, [], current_time)
+                    return []
+                
                 query = """
-                SELECT n.*, 
+                SELECT n.*,
+                    t.user_id AS user_id,
                     COALESCE(t.title, 'Task đã bị xóa') as title,
                     COALESCE(t.description, '') as description,
                     COALESCE(t.deadline, 'N/A') as deadline,
                     COALESCE(t.priority, 'medium') as priority
                 FROM notifications n
                 LEFT JOIN tasks t ON n.task_id = t.task_id
-                WHERE n.status = 'pending' 
-                AND n.scheduled_time <= ?
-                ORDER BY n.scheduled_time
+                WHERE n.claim_token = ?
+                ORDER BY n.scheduled_epoch
                 """
                 
-                results = self.db.execute_query(conn, query, (current_time,))
-                print(f"Found {len(results)} pending notifications")
-
-                # Debug: In ra chi tiết PENDING notifications với Task name và Telegram ID
-                if len(results) > 0:
-                    print("📋 DETAILED PENDING NOTIFICATIONS:")
-                    for notif in results:
-                        nid = notif.get('notification_id', 'N/A')
-                        task_id = notif.get('task_id', 'N/A')
-                        title = notif.get('title', 'N/A')
-                        scheduled_time = notif.get('scheduled_time', 'N/A')  # Lấy từ notifications.scheduled_time
-                        
-                        # Debug: Kiểm tra tất cả các trường liên quan đến thời gian từ bảng notifications
-                        notif_raw = conn.execute("""
-                            SELECT notification_id, task_id, scheduled_time, status, sent_at, created_at
-                            FROM notifications 
-                            WHERE notification_id = ?
-                        """, (nid,)).fetchone()
-                        
-                        scheduled_from_db = notif_raw[2] if notif_raw and len(notif_raw) > 2 else 'N/A'
-                        sent_at = notif_raw[4] if notif_raw and len(notif_raw) > 4 else None
-                        
-                        # Lấy user_id từ notification hoặc task
-                        user_id = notif.get('user_id')
-                        if not user_id and task_id != 'N/A':
-                            user_row = conn.execute("SELECT user_id FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
-                            user_id = user_row[0] if user_row and user_row[0] else None
-
-                        # Lấy email và telegram_user_id từ users và user_settings
-                        user_email = None
-                        telegram_id = None
-                        if user_id:
-                            # Lấy email từ bảng users
-                            user_info = conn.execute("SELECT email, display_name FROM users WHERE user_id = ?", (user_id,)).fetchone()
-                            if user_info:
-                                user_email = user_info[0]  # email
-                                user_display_name = user_info[1]  # display_name
-                            
-                            # Lấy telegram_user_id từ user_settings
-                            tg_row = conn.execute("""
-                                SELECT setting_value FROM user_settings 
-                                WHERE user_id = ? AND setting_key = 'telegram_user_id' AND tool_id IS NULL
-                                ORDER BY updated_at DESC LIMIT 1
-                            """, (user_id,)).fetchone()
-                            telegram_id = tg_row[0] if tg_row and tg_row[0] else None
-                        
-                        print(f"  📋 PENDING: ID={nid}, Task='{title}' (task_id={task_id})")
-                        print(f"      └─ User: {user_id} ({user_email or 'N/A'}), Telegram: {telegram_id or 'N/A'}")
-                        print(f"      └─ Scheduled Time: {scheduled_time} [Từ cột: notifications.scheduled_time, Raw DB: {scheduled_from_db}]")
-                        print(f"      └─ Status: {notif_raw[3] if notif_raw and len(notif_raw) > 3 else 'N/A'}, Sent At: {sent_at or 'N/A'}")
-                else:
-                    print("📋 No pending notifications found for current time")
-
-                # Debug: In ra các notifications có status='pending' nhưng scheduled_time > now
-                cursor = conn.cursor()
-                future_pending = cursor.execute("""
-                    SELECT notification_id, task_id, scheduled_time 
-                    FROM notifications 
-                    WHERE status = 'pending' AND scheduled_time > ?
-                    ORDER BY scheduled_time
-                """, (current_time,)).fetchall()
-                if future_pending:
-                    print(f"📋 Future pending notifications ({len(future_pending)}):")
-                    for fp in future_pending:
-                        fp_id = fp[0] if isinstance(fp, (tuple, list)) else fp['notification_id']
-                        fp_task = fp[1] if isinstance(fp, (tuple, list)) else fp['task_id']
-                        fp_time = fp[2] if isinstance(fp, (tuple, list)) else fp['scheduled_time']
-                        
-                        # Lấy thông tin chi tiết từ bảng notifications để hiển thị cột cụ thể
-                        notif_detail = conn.execute("""
-                            SELECT scheduled_time, status, created_at
-                            FROM notifications 
-                            WHERE notification_id = ?
-                        """, (fp_id,)).fetchone()
-                        scheduled_raw = notif_detail[0] if notif_detail and len(notif_detail) > 0 else 'N/A'
-                        
-                        # Lấy task title và user email
-                        task_row = conn.execute("SELECT title, user_id FROM tasks WHERE task_id = ?", (fp_task,)).fetchone()
-                        task_title = task_row[0] if task_row and task_row[0] else 'N/A'
-                        fp_user_id = task_row[1] if task_row and len(task_row) > 1 and task_row[1] else None
-                        fp_email = None
-                        if fp_user_id:
-                            email_row = conn.execute("SELECT email FROM users WHERE user_id = ?", (fp_user_id,)).fetchone()
-                            fp_email = email_row[0] if email_row and email_row[0] else None
-                        
-                        print(f"  ⏰ FUTURE: ID={fp_id}, Task='{task_title}', User={fp_user_id} ({fp_email or 'N/A'})")
-                        print(f"      └─ Scheduled Time: {fp_time} [Từ cột: notifications.scheduled_time, Raw DB value: {scheduled_raw}]")
-
-                # Debug: In ra tất cả notifications (giữ nguyên để so sánh)
-                cursor = conn.cursor()
-                cursor.execute("SELECT notification_id, status, scheduled_time FROM notifications ORDER BY scheduled_time")
-                all_notifications = cursor.fetchall()
-                print(f"All notifications in database: {len(all_notifications)}")
-                for notif in all_notifications:
-                    row = dict(notif) if isinstance(notif, sqlite3.Row) else notif
-                    nid = row['notification_id'] if isinstance(row, dict) else row[0]
-                    status = row['status'] if isinstance(row, dict) else row[1]
-                    sched = row['scheduled_time'] if isinstance(row, dict) else row[2]
-                    print(f"  - ID: {nid}, Status: {status}, Scheduled: {sched} (now: {current_time})")
-
-                return results
+                results = self.db.execute_query(conn, query, (claim_token,))
+                if results:
+                    print(f"Claimed {len(results)} pending notifications (before {current_time})")
+                    self.profile_cache.load_many(r['user_id'] for r in results)
+                
+                if self.diagnostic_mode:
+                    self._print_diagnostics(conn, results, current_time)
                 
                 return results
                     
         except Exception as e:
             print(f"❌ Error getting pending notifications: {e}")
             return []
+    
+    def _claim_notifications(self, conn) -> Optional[str]:
+        """
+        Claim tối đa batch_size notifications đến hạn cho runner này
+        
+        UPDATE ... WHERE notification_id IN (SELECT ...) chạy trong một write
+        transaction của SQLite nên hai runner không thể claim cùng một dòng.
+        Lease là epoch UTC nên các runner ở timezone khác nhau (hoặc qua DST)
+        vẫn thấy cùng thời điểm hết hạn.
+        
+        Args:
+            conn: Database connection
+            
+        Returns:
+            claim_token nếu claim được ít nhất một dòng, ngược lại None
+        """
+        now_epoch = int(time.time())
+        claim_token = f"{self.runner_id}:{uuid.uuid4().hex}"
+        
+        self._normalise_pending_epochs(conn)
+        
+        # So sánh trên scheduled_epoch (UTC, đã tính theo timezone của user khi ghi)
+        # với thời điểm hiện tại UTC - không cần đổi timezone từng dòng lúc gửi
+        cursor = conn.execute("""
+            UPDATE notifications
+            SET claim_token = ?, lease_expires_epoch = ?
+            WHERE notification_id IN (
+                SELECT notification_id FROM notifications
+                WHERE status = 'pending'
+                AND scheduled_epoch <= ?
+                AND (lease_expires_epoch IS NULL OR lease_expires_epoch <= ?)
+                ORDER BY scheduled_epoch
+                LIMIT ?
+            )
+        """, (claim_token, now_epoch + self.lease_seconds, now_epoch, now_epoch, self.batch_size))
+        conn.commit()
+        
+        return claim_token if cursor.rowcount > 0 else None
+    
+    def _normalise_pending_epochs(self, conn) -> int:
+        """
+        Điền scheduled_epoch cho các dòng pending còn thiếu (ghi bởi code cũ,
+        hoặc trước khi chạy migration 011), theo timezone của chủ task.
+        Dòng có scheduled_time rỗng / không parse được bị đánh dấu failed
+        (failure_reason = 'invalid_scheduled_time') để lần sau không chọn lại.
+        
+        Returns:
+            Số dòng đã xử lý (điền epoch hoặc đánh dấu failed)
+        """
+        rows = conn.execute("""
+            SELECT n.notification_id, n.scheduled_time, t.user_id FROM notifications n
+            LEFT JOIN tasks t ON t.task_id = n.task_id
+            WHERE n.status = 'pending' AND n.scheduled_epoch IS NULL
+            LIMIT ?
+        """, (self.batch_size,)).fetchall()
+        if not rows:
+            return 0
+        
+        self.profile_cache.load_many(row[2] for row in rows if row[2])
+        filled, invalid = [], []
+        for nid, scheduled_time, user_id in rows:
+            tz_name = self.profile_cache.get(user_id)['timezone'] if user_id else None
+            epoch = to_epoch(scheduled_time, tz_name)
+            if epoch is None:
+                invalid.append((nid,))
+            else:
+                filled.append((epoch, nid))
+        
+        if filled:
+            conn.executemany(
+                "UPDATE notifications SET scheduled_epoch = ? WHERE notification_id = ?",
+                filled
+            )
+            print(f"🔄 Normalised scheduled_epoch for {len(filled)} pending notifications")
+        if invalid:
+            conn.executemany("""
+                UPDATE notifications
+                SET status = 'failed', failure_reason = 'invalid_scheduled_time'
+                WHERE notification_id = ?
+            """, invalid)
+            print(f"⚠️  Marked {len(invalid)} notifications with invalid scheduled_time as failed")
+        return len(rows)
+    
+    def _print_diagnostics(self, conn, due: List[Dict[str, Any]], current_time: str):
+        """
+        In thông tin chẩn đoán (chỉ khi diagnostic_mode=True)
+        
+        Chỉ in tối đa diagnostic_sample_size dòng mỗi loại, các dòng
+        future pending được lấy mẫu bằng LIMIT thay vì quét toàn bảng.
+        """
+        limit = self.diagnostic_sample_size
+        
+        print(f"📋 DIAGNOSTIC: {len(due)} due notifications (showing up to {limit})")
+        for notif in random.sample(due, min(limit, len(due))):
+            print(f"  📋 PENDING: ID={notif.get('notification_id')}, Task='{notif.get('title')}' (task_id={notif.get('task_id')})")
+            print(f"      └─ User: {notif.get('user_id') or 'N/A'}, Telegram: {self._get_user_telegram_id(notif.get('user_id')) or 'N/A'}")
+            print(f"      └─ Scheduled Time: {notif.get('scheduled_time')} [notifications.scheduled_time]")
+        
+        future_pending = conn.execute("""
+            SELECT n.notification_id, n.scheduled_time, t.title, t.user_id
+            FROM notifications n
+            LEFT JOIN tasks t ON n.task_id = t.task_id
+            WHERE n.status = 'pending' AND n.scheduled_epoch > ?
+            ORDER BY n.scheduled_epoch
+            LIMIT ?
+        """, (int(time.time()), limit)).fetchall()
+        if future_pending:
+            print(f"📋 DIAGNOSTIC: next {len(future_pending)} future pending notifications")
+            for fp in future_pending:
+                print(f"  ⏰ FUTURE: ID={fp[0]}, Task='{fp[2] or 'N/A'}', User={fp[3] or 'N/A'}, Scheduled: {fp[1]}")
+        
+        counts = conn.execute(
+            "SELECT status, COUNT(*) FROM notifications GROUP BY status"
+        ).fetchall()
+        print(f"📋 DIAGNOSTIC: notifications by status: {dict((r[0], r[1]) for r in counts)} (now: {current_time})")
 
     def _get_user_telegram_id(self, user_id: str) -> Optional[int]:
+        """Lấy telegram chat id của user từ profile cache"""
+        if not user_id:
+            return None
+        return self._parse_chat_id(self.profile_cache.get(user_id)['telegram_user_id'])
+    
+    def invalidate_user_profile(self, user_id: Optional[str] = None):
+        """Xóa profile cache của user (gọi sau khi user lưu cài đặt)"""
+        self.profile_cache.invalidate(user_id)
+    
+    def _parse_chat_id(self, value) -> Optional[int]:
+        """Chuyển telegram_user_id (TEXT trong user_settings) thành int"""
+        if not value:
+            return None
         try:
-            with self.db.get_connection() as conn:
-                row = conn.execute(
-                    """
-                    SELECT setting_value 
-                    FROM user_settings 
-                    WHERE user_id = ? AND setting_key = 'telegram_user_id' 
-                    AND tool_id IS NULL
-                    ORDER BY updated_at DESC 
-                    LIMIT 1
-                    """,
-                    (user_id,)
-                ).fetchone()
-                if row and row[0]:
-                    try:
-                        return int(str(row[0]).strip())
-                    except:
-                        return None
-        except Exception as e:
-            print(f"❌ Error reading user telegram id: {e}")
-        return None        
+            return int(str(value).strip())
+        except (TypeError, ValueError):
+            return None
     
     def _send_notification(self, notification: Dict[str, Any]) -> bool:
         """Gửi thông báo qua các kênh"""
+        sent, _, _ = self._deliver_notification(notification)
+        return sent
+    
+    def _deliver_notification(self, notification: Dict[str, Any]) -> Tuple[bool, Optional[str], str]:
+        """
+        Gửi thông báo qua các kênh và trả về kết quả chi tiết
+        
+        Returns:
+            (sent, failure_reason, sent_at); failure_reason là None nếu gửi thành công
+        """
+        reason = None
         try:
             print(f"🔍 Debug _send_notification: notification_id={notification.get('notification_id')}, task_id={notification.get('task_id')}")
             message = self._prepare_notification_message(notification)
@@ -300,32 +366,38 @@ class NotificationScheduler:
 
             # Gửi qua Telegram theo setting user
             if self.telegram_notifier and target_user_id:
-                print(f"🔍 Debug: Getting telegram_user_id for user_id={target_user_id}")
+                # Profile đã được nạp theo batch trong _get_pending_notifications
                 chat_id = self._get_user_telegram_id(target_user_id)
                 print(f"🔍 Debug: chat_id={chat_id}")
                 if chat_id:
                     print(f"🔍 Debug: Sending telegram message to chat_id={chat_id}")
-                    if self.telegram_notifier.send_message(chat_id, message):
+                    with self.delivery_pool.channel_slot('telegram'):
+                        delivered = self.telegram_notifier.send_message(chat_id, message)
+                    if delivered:
                         sent = True
                         print(f"✅ Telegram notification sent to {chat_id} for task: {notification.get('title')}")
                     else:
+                        reason = 'telegram_send_failed'
                         print(f"❌ Failed to send telegram message to {chat_id}")
                 else:
+                    reason = 'no_telegram_user_id'
                     print(f"⚠️ No telegram_user_id setting for user {target_user_id}")
             else:
                 if not self.telegram_notifier:
+                    reason = 'telegram_not_configured'
                     print(f"⚠️ Debug: telegram_notifier is None")
                 if not target_user_id:
+                    reason = 'no_task_owner'
                     print(f"⚠️ Debug: target_user_id is None")
 
             # TODO: email / zalo
-            return sent
+            return sent, (None if sent else reason), datetime.now().isoformat()
 
         except Exception as e:
             print(f"❌ Error sending notification: {e}")
             import traceback
             traceback.print_exc()
-            return False
+            return False, f"error: {e}", datetime.now().isoformat()
     
     def _prepare_notification_message(self, notification: Dict[str, Any]) -> str:
         """Chuẩn bị nội dung thông báo"""
@@ -371,61 +443,25 @@ class NotificationScheduler:
                     # Format cũ: notif_task_xxx_timestamp -> không có notif_source, dùng default
                     notif_source = 'notification_time'
 
-            # Lấy label từ user settings
+            # Lấy label từ profile cache (notification_time, notif1-8)
             notif_label = 'Thông báo'  # Default
             if user_id:
                 try:
-                    settings_mgr = UserSettingsManager(self.db.db_path)
-                    if notif_source == 'notification_time':
-                        # notification_time -> dùng label mặc định hoặc lấy từ setting
-                        notif_label = settings_mgr.get_setting(
-                            user_id, 'notification_time_label', tool_id=None,
-                            default='Thông báo chính'
-                        ) or 'Thông báo chính'
-                    elif notif_source.startswith('notif') and len(notif_source) <= 6:
-                        # notif1, notif2, ..., notif8
-                        notif_num = notif_source.replace('notif', '')
-                        # Kiểm tra notif_num là số hợp lệ (1-8)
-                        if notif_num.isdigit() and 1 <= int(notif_num) <= 8:
-                            label_key = f'notif_label_{notif_num}'
-                            notif_label = settings_mgr.get_setting(
-                                user_id, label_key, tool_id=None, 
-                                default=f'Thông báo {notif_num}'
-                            ) or f'Thông báo {notif_num}'
-                        else:
-                            # Không phải số hợp lệ, dùng default
-                            notif_label = 'Thông báo'
-                    else:
-                        # Trường hợp khác, dùng default
-                        notif_label = 'Thông báo'
+                    notif_label = self.profile_cache.get(user_id)['labels'].get(notif_source, 'Thông báo')
                 except Exception as e:
                     print(f"⚠️  Error getting notif label: {e}")
-                    import traceback
-                    traceback.print_exc()
             
             # Format scheduled_time (thời điểm gửi thông báo): "2025-10-31 12:12:00" -> "31/10/2025 - 12:12"
             formatted_time = 'N/A'
             if scheduled_time:
-                try:
-                    # Thử parse nhiều format
-                    if 'T' in scheduled_time:
-                        # Format: 2025-10-31T12:12
-                        dt = datetime.strptime(scheduled_time, '%Y-%m-%dT%H:%M')
-                    elif len(scheduled_time) == 19:
-                        # Format: 2025-10-31 12:12:00
-                        dt = datetime.strptime(scheduled_time, '%Y-%m-%d %H:%M:%S')
-                    elif len(scheduled_time) == 16:
-                        # Format: 2025-10-31 12:12
-                        dt = datetime.strptime(scheduled_time, '%Y-%m-%d %H:%M')
-                    else:
-                        # Format: 2025-10-31
-                        dt = datetime.strptime(scheduled_time, '%Y-%m-%d')
-                    
+                # 2025-10-31T12:12 / 2025-10-31 12:12[:00] / 2025-10-31
+                dt = parse_datetime(scheduled_time, source='scheduled_time')
+                if dt is not None:
                     # Format: 31/10/2025 - 12:12
                     formatted_time = dt.strftime('%d/%m/%Y - %H:%M')
-                except Exception as e:
+                else:
                     # Nếu không parse được, hiển thị nguyên gốc
-                    print(f"⚠️  Error parsing scheduled_time '{scheduled_time}': {e}")
+                    print(f"⚠️  Error parsing scheduled_time '{scheduled_time}'")
                     formatted_time = scheduled_time
             
             # Tạo emoji theo priority
@@ -458,16 +494,29 @@ class NotificationScheduler:
     
     def _update_notification_status(self, notification_id: str, status: str):
         """Cập nhật trạng thái notification"""
-        try:
-            with self.db.get_connection() as conn:
-                query = "UPDATE notifications SET status = ?, sent_at = ? WHERE notification_id = ?"
-                params = (status, datetime.now().isoformat(), notification_id)
-                
-                self.db.execute_update(conn, query, params)
-                conn.commit()
-                
-        except Exception as e:
-            print(f"⚠️  Error updating notification status: {e}")
+        self._update_notification_statuses([(notification_id, status)])
+    
+    def _update_notification_statuses(self, updates: List[Tuple[str, str]]):
+        """
+        Cập nhật trạng thái nhiều notifications trong một transaction (ghi ngay)
+        
+        Args:
+            updates: List (notification_id, status)
+        """
+        if not updates:
+            return
+        for notification_id, status in updates:
+            self.status_buffer.add(notification_id, status)
+        self.status_buffer.flush()
+    
+    def flush_status_updates(self) -> int:
+        """
+        Ghi ngay các kết quả gửi còn trong buffer (gọi trước khi dừng)
+        
+        Returns:
+            Số dòng đã ghi
+        """
+        return self.status_buffer.flush()
 
 # Test function
 def test_notification_scheduler():
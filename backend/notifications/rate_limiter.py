@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+RATE LIMITER MODULE
+==================
+
+Mô tả: Giới hạn tốc độ gửi dùng chung cho Telegram, Zalo và Email
+Cách hoạt động:
+1. Mỗi kênh có một token bucket toàn cục (vd: Telegram ~30 msg/s)
+2. Mỗi người nhận trong kênh có một token bucket riêng (vd: 1 msg/s/chat)
+3. Sender gọi acquire() trước mỗi request, chờ tới khi cả 2 bucket có token
+4. Khi API trả về 429/retry_after, gọi penalize() để chặn bucket tới hết thời gian đó
+
+Thuật toán chính:
+- Token bucket (rate, capacity) với time.monotonic()
+- Một lock chung, ngủ ngoài lock để không chặn các kênh/người nhận khác
+- Dọn bucket người nhận nhàn rỗi để bộ nhớ không tăng mãi
+
+Hướng dẫn sử dụng:
+1. Lấy limiter dùng chung: get_shared_rate_limiter()
+2. Gọi acquire(channel, recipient) trước khi gửi
+3. Gọi penalize(channel, recipient, retry_after) khi bị rate limit / lỗi tạm thời
+
+Ví dụ:
+    limiter = get_shared_rate_limiter()
+    limiter.acquire('telegram', chat_id)
+    response = session.post(...)
+    if response.status_code == 429:
+        limiter.penalize('telegram', chat_id, retry_after)
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# (rate token/giây, capacity) cho bucket toàn cục và bucket theo người nhận
+DEFAULT_LIMITS = {
+    # Telegram: ~30 tin/giây toàn bot, ~1 tin/giây mỗi chat
+    'telegram': {'global': (30.0, 30.0), 'per_recipient': (1.0, 1.0)},
+    'zalo': {'global': (10.0, 10.0), 'per_recipient': (1.0, 1.0)},
+    'email': {'global': (5.0, 5.0), 'per_recipient': (1.0, 2.0)},
+}
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        """
+        Khởi tạo TokenBucket
+
+        Args:
+            rate: Số token được nạp mỗi giây
+            capacity: Số token tối đa (burst)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """Số giây cần chờ để có 1 token (0 nếu có ngay)"""
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, until: float):
+        """Chặn bucket tới thời điểm until (monotonic)"""
+        self.blocked_until = max(self.blocked_until, until)
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+class RateLimiter:
+    def __init__(self, limits: Optional[Dict[str, Dict[str, Tuple[float, float]]]] = None,
+                 max_idle_recipients: int = 1000):
+        """
+        Khởi tạo RateLimiter
+
+        Args:
+            limits: Cấu hình theo kênh, vd {'telegram': {'global': (30, 30), 'per_recipient': (1, 1)}}
+            max_idle_recipients: Số bucket người nhận tối đa trước khi dọn bucket nhàn rỗi
+        """
+        self.limits = {channel: dict(cfg) for channel, cfg in DEFAULT_LIMITS.items()}
+        for channel, cfg in (limits or {}).items():
+            self.limits.setdefault(channel, {}).update(cfg)
+
+        self.max_idle_recipients = max_idle_recipients
+        self._lock = threading.Lock()
+        self._global: Dict[str, TokenBucket] = {}
+        self._recipients: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def _global_bucket(self, channel: str) -> Optional[TokenBucket]:
+        bucket = self._global.get(channel)
+        if bucket is None:
+            cfg = self.limits.get(channel, {}).get('global')
+            if not cfg:
+                return None
+            bucket = self._global[channel] = TokenBucket(*cfg)
+        return bucket
+
+    def _recipient_bucket(self, channel: str, recipient) -> Optional[TokenBucket]:
+        if recipient is None:
+            return None
+        key = (channel, str(recipient))
+        bucket = self._recipients.get(key)
+        if bucket is None:
+            cfg = self.limits.get(channel, {}).get('per_recipient')
+            if not cfg:
+                return None
+            if len(self._recipients) >= self.max_idle_recipients:
+                self._prune(time.monotonic())
+            bucket = self._recipients[key] = TokenBucket(*cfg)
+        return bucket
+
+    def _prune(self, now: float):
+        """Xóa bucket người nhận đã đầy token (không còn ảnh hưởng gì)"""
+        for key in [k for k, b in self._recipients.items() if b.is_idle(now)]:
+            del self._recipients[key]
+
+    def acquire(self, channel: str, recipient=None, timeout: Optional[float] = None) -> bool:
+        """
+        Thuật toán acquire:
+        1. Trong lock: tính thời gian chờ của bucket kênh và bucket người nhận
+        2. Nếu cả hai có token -> lấy token và trả về
+        3. Nếu không -> ngủ ngoài lock rồi thử lại
+
+        Args:
+            channel: Tên kênh (telegram, zalo, email)
+            recipient: ID người nhận (chat_id, user_id, email)
+            timeout: Thời gian chờ tối đa (giây), None = chờ tới khi có
+
+        Returns:
+            True nếu lấy được token, False nếu hết timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                buckets = [b for b in (self._global_bucket(channel),
+                                       self._recipient_bucket(channel, recipient)) if b]
+                wait = max([b.wait_time(now) for b in buckets] + [0.0])
+                if wait <= 0:
+                    for bucket in buckets:
+                        bucket.consume(now)
+                    return True
+
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def penalize(self, channel: str, recipient=None, retry_after: float = 1.0):
+        """
+        Chặn gửi tới người nhận (hoặc cả kênh nếu recipient=None) trong retry_after giây
+
+        Args:
+            channel: Tên kênh
+            recipient: ID người nhận, None = chặn cả kênh
+            retry_after: Số giây cần chờ (theo API trả về hoặc backoff)
+        """
+        with self._lock:
+            until = time.monotonic() + max(0.0, float(retry_after))
+            bucket = (self._recipient_bucket(channel, recipient)
+                      if recipient is not None else self._global_bucket(channel))
+            if bucket:
+                bucket.block(until)
+
+_shared_rate_limiter: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+def get_shared_rate_limiter() -> RateLimiter:
+    """Lấy RateLimiter dùng chung cho mọi notifier trong process"""
+    global _shared_rate_limiter
+    with _shared_lock:
+        if _shared_rate_limiter is None:
+            _shared_rate_limiter = RateLimiter()
+        return _shared_rate_limiter
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+SMTP POOL MODULE
+===============
+
+Mô tả: Giữ các kết nối SMTP đã xác thực để gửi nhiều email trên một kết nối
+Cách hoạt động:
+1. Tạo kết nối SMTP (STARTTLS/SSL + login) khi cần, tối đa max_size kết nối
+2. Sau khi gửi, trả kết nối về pool thay vì QUIT
+3. Trước khi dùng lại, kiểm tra NOOP nếu kết nối nhàn rỗi lâu
+4. Kết nối lỗi / quá số email / quá tuổi sẽ bị đóng và tạo lại
+
+Thuật toán chính:
+- LIFO queue kết nối nhàn rỗi (kết nối "nóng" nhất được dùng trước)
+- BoundedSemaphore giới hạn tổng số kết nối
+- Health check bằng NOOP, reconnect khi SMTPServerDisconnected
+
+Hướng dẫn sử dụng:
+1. Khởi tạo SMTPConnectionPool(host, port, username, password)
+2. Dùng `with pool.connection() as server:` để gửi
+3. Gọi close_all() khi dừng
+
+Ví dụ:
+    pool = SMTPConnectionPool('smtp.gmail.com', 587, 'user', 'pass')
+    with pool.connection() as server:
+        server.sendmail(from_addr, to_addr, message)
+
+    # Test với SMTP server local (không TLS, không login):
+    #   python -m aiosmtpd -n -l localhost:8025
+    pool = SMTPConnectionPool('localhost', 8025, use_tls=False)
+"""
+
+import queue
+import smtplib
+import socket
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+class _PooledConnection:
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.sent_count = 0
+
+class SMTPConnectionPool:
+    def __init__(self, host: str, port: int, username: str = '', password: str = '',
+                 use_tls: bool = True, use_ssl: bool = False, max_size: int = 2,
+                 timeout: float = 30, idle_check_after: float = 30,
+                 max_connection_age: float = 300, max_messages_per_connection: int = 100):
+        """
+        Khởi tạo SMTPConnectionPool
+
+        Args:
+            host: SMTP server
+            port: SMTP port
+            username: Tài khoản SMTP (rỗng = không login)
+            password: Mật khẩu SMTP
+            use_tls: Gọi STARTTLS sau khi kết nối
+            use_ssl: Dùng SMTP_SSL (port 465)
+            max_size: Số kết nối đồng thời tối đa
+            timeout: Socket timeout (seconds)
+            idle_check_after: Nhàn rỗi quá số giây này thì NOOP trước khi dùng lại
+            max_connection_age: Tuổi tối đa của một kết nối (seconds)
+            max_messages_per_connection: Số email tối đa trên một kết nối
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.idle_check_after = idle_check_after
+        self.max_connection_age = max_connection_age
+        self.max_messages_per_connection = max_messages_per_connection
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _create(self) -> smtplib.SMTP:
+        """Mở kết nối mới, STARTTLS và login nếu cấu hình"""
+        context = ssl.create_default_context()
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=context)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.use_tls:
+                server.starttls(context=context)
+        if self.username:
+            server.login(self.username, self.password)
+        return server
+
+    def _is_usable(self, pooled: _PooledConnection) -> bool:
+        """Kiểm tra kết nối nhàn rỗi còn dùng được không"""
+        now = time.monotonic()
+        if now - pooled.created_at > self.max_connection_age:
+            return False
+        if pooled.sent_count >= self.max_messages_per_connection:
+            return False
+        if now - pooled.last_used > self.idle_check_after:
+            try:
+                return pooled.server.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                return False
+        return True
+
+    def _discard(self, pooled: Optional[_PooledConnection]):
+        if pooled is None:
+            return
+        try:
+            pooled.server.quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                pooled.server.close()
+            except Exception:
+                pass
+
+    def _checkout(self) -> _PooledConnection:
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                return _PooledConnection(self._create())
+            if self._is_usable(pooled):
+                return pooled
+            self._discard(pooled)
+
+    @contextmanager
+    def connection(self):
+        """
+        Mượn một kết nối SMTP đã xác thực
+
+        Kết nối được trả lại pool nếu không có lỗi hoặc lỗi chỉ ở mức lệnh
+        (server trả mã lỗi, vd: người nhận bị từ chối); nếu mất kết nối /
+        lỗi socket thì kết nối bị đóng để lần sau tạo lại.
+
+        Yields:
+            smtplib.SMTP
+        """
+        self._slots.acquire()
+        pooled = None
+        try:
+            pooled = self._checkout()
+            yield pooled.server
+            pooled.sent_count += 1
+            pooled.last_used = time.monotonic()
+            self._idle.put(pooled)
+            pooled = None
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError):
+            # SMTPConnectError là SMTPResponseException -> phải bắt trước nhánh dưới
+            self._discard(pooled)
+            pooled = None
+            raise
+        except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+            # Server trả mã lỗi cho lệnh (sender/recipient/data bị từ chối):
+            # phiên SMTP vẫn dùng được -> trả lại pool ở finally
+            raise
+        except (socket.error, ConnectionError):
+            # Lỗi socket / SMTPException còn lại (SMTPException kế thừa OSError)
+            self._discard(pooled)
+            pooled = None
+            raise
+        finally:
+            if pooled is not None:
+                # Lỗi ở mức lệnh hoặc lỗi không liên quan SMTP -> kết nối vẫn tốt, trả lại pool
+                pooled.last_used = time.monotonic()
+                self._idle.put(pooled)
+            self._slots.release()
+
+    def close_all(self):
+        """Đóng toàn bộ kết nối nhàn rỗi"""
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
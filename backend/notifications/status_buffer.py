@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+NOTIFICATION STATUS BUFFER MODULE
+================================
+
+Mô tả: Gom kết quả gửi notification và ghi xuống DB theo batch
+Cách hoạt động:
+1. Mỗi kết quả gửi (sent/failed, thời điểm gửi, lý do lỗi) được add() vào buffer
+2. Khi đủ max_batch dòng -> flush ngay
+3. Nếu chưa đủ, timer flush sau tối đa max_delay giây kể từ dòng đầu tiên
+4. flush() ghi toàn bộ bằng một executemany trong một transaction
+
+Thuật toán chính:
+- Buffer dict theo notification_id (dòng mới ghi đè dòng cũ)
+- Ngưỡng theo số lượng (max_batch) và theo thời gian (threading.Timer)
+- Ghi lỗi thì giữ lại các dòng để flush lần sau
+- Chỉ ghi dòng còn đúng claim_token (lease chưa bị runner khác lấy lại),
+  đồng thời xóa claim_token / lease_expires_epoch
+
+Hướng dẫn sử dụng:
+1. Khởi tạo NotificationStatusBuffer(db)
+2. Gọi add(notification_id, status, reason)
+3. Gọi flush() khi cần ghi ngay (vd: trước khi dừng)
+
+Ví dụ:
+    buffer = NotificationStatusBuffer(db, max_batch=100, max_delay=1.0)
+    buffer.add('notif_1', 'sent')
+    buffer.add('notif_2', 'failed', 'no_telegram_user_id')
+    buffer.flush()
+"""
+
+import atexit
+import os
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.epoch_utils import to_epoch
+
+class NotificationStatusBuffer:
+    def __init__(self, db, max_batch: int = 100, max_delay: float = 1.0):
+        """
+        Khởi tạo NotificationStatusBuffer
+
+        Args:
+            db: DatabaseManager instance
+            max_batch: Số dòng tối đa trước khi flush
+            max_delay: Thời gian tối đa (giây) một dòng nằm trong buffer
+        """
+        self.db = db
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._rows: Dict[str, Tuple[str, str, Optional[str], Optional[str]]] = {}
+        self._timer: Optional[threading.Timer] = None
+
+        atexit.register(self.flush)
+
+    def add(self, notification_id: str, status: str, reason: Optional[str] = None,
+            sent_at: Optional[str] = None, claim_token: Optional[str] = None):
+        """
+        Ghi nhận kết quả gửi của một notification
+
+        Args:
+            notification_id: ID notification
+            status: Trạng thái mới (sent, failed)
+            reason: Lý do lỗi (chỉ khi failed)
+            sent_at: Thời điểm gửi (mặc định: bây giờ)
+            claim_token: Token claim của runner (None = ghi không điều kiện)
+        """
+        row = (status, sent_at or datetime.now().isoformat(), reason, claim_token)
+        with self._lock:
+            self._rows[notification_id] = row
+            size = len(self._rows)
+            if size < self.max_batch and self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if size >= self.max_batch:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Ghi toàn bộ buffer xuống DB trong một transaction
+
+        Returns:
+            Số dòng đã ghi
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows = self._rows
+                self._rows = {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+
+            if not rows:
+                return 0
+
+            try:
+                with self.db.get_connection() as conn:
+                    conn.executemany(
+                        """
+                        UPDATE notifications
+                        SET status = ?, sent_at = ?, sent_at_epoch = ?, failure_reason = ?,
+                            claim_token = NULL, lease_expires_epoch = NULL
+                        WHERE notification_id = ?
+                        AND (? IS NULL OR claim_token = ?)
+                        """,
+                        [(status, sent_at, to_epoch(sent_at), reason, nid, token, token)
+                         for nid, (status, sent_at, reason, token) in rows.items()]
+                    )
+                    conn.commit()
+                return len(rows)
+
+            except Exception as e:
+                print(f"⚠️  Error flushing notification statuses ({len(rows)} rows): {e}")
+                # Giữ lại để flush lần sau (không ghi đè kết quả mới hơn)
+                with self._lock:
+                    for nid, row in rows.items():
+                        self._rows.setdefault(nid, row)
+                    if self._timer is None:
+                        self._timer = threading.Timer(self.max_delay, self.flush)
+                        self._timer.daemon = True
+                        self._timer.start()
+                return 0
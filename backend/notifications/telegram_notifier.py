@@ -11,10 +11,10 @@ Cách hoạt động:
 4. Xử lý lỗi và retry
 
 Thuật toán chính:
-- Sử dụng Telegram Bot API
+- Sử dụng Telegram Bot API qua Session keep-alive có connection pool
 - Format message theo template
 - Retry mechanism cho failed messages
-- Rate limiting để tránh spam
+- Rate limiting dùng chung (token bucket toàn bot + theo chat, tôn trọng retry_after)
 - Logging cho debugging
 
 Hướng dẫn sử dụng:
@@ -28,23 +28,40 @@ Ví dụ:
     notifier.send_message("user_id", "Hello World!")
 """
 
+import os
+import sys
 import requests
 import json
-import time
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 
+# Add parent directory to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from notifications.rate_limiter import get_shared_rate_limiter
+from notifications.http_session import create_http_session
+
 class TelegramNotifier:
-    def __init__(self, bot_token: str):
+    def __init__(self, bot_token: str, rate_limiter=None, pool_size: int = 10,
+                 connect_timeout: float = 5, read_timeout: float = 30):
         """
         Khởi tạo TelegramNotifier
         
         Args:
             bot_token: Telegram Bot Token
+            rate_limiter: RateLimiter instance (mặc định: limiter dùng chung)
+            pool_size: Số connection keep-alive tối đa tới api.telegram.org
+            connect_timeout: Timeout kết nối (seconds)
+            read_timeout: Timeout đọc response (seconds)
         """
         self.bot_token = bot_token
         self.api_url = f"https://api.telegram.org/bot{bot_token}"
-        self.rate_limit_delay = 1  # Delay giữa các request (seconds)
+        self.session = create_http_session(pool_size=pool_size)
+        self.timeout = (connect_timeout, read_timeout)
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter()
+        self.rate_limit_delay = 1  # Backoff cơ sở khi lỗi tạm thời (seconds)
         self.max_retries = 3
         
         # Test connection
@@ -59,7 +76,7 @@ class TelegramNotifier:
             True nếu kết nối thành công
         """
         try:
-            response = requests.get(f"{self.api_url}/getMe", timeout=10)
+            response = self.session.get(f"{self.api_url}/getMe", timeout=self.timeout)
             if response.status_code == 200:
                 bot_info = response.json()
                 if bot_info.get('ok'):
@@ -103,13 +120,14 @@ class TelegramNotifier:
                 'parse_mode': parse_mode
             }
             
-            # Bước 4: Retry mechanism
+            # Bước 4: Retry mechanism (chờ trên rate limiter thay vì sleep cố định)
             for attempt in range(self.max_retries):
+                self.rate_limiter.acquire('telegram', user_id)
                 try:
-                    response = requests.post(
+                    response = self.session.post(
                         f"{self.api_url}/sendMessage",
                         json=payload,
-                        timeout=30
+                        timeout=self.timeout
                     )
                     
                     if response.status_code == 200:
@@ -119,15 +137,20 @@ class TelegramNotifier:
                             return True
                         else:
                             print(f"❌ Telegram API error: {result.get('description')}")
+                    elif response.status_code == 429:
+                        retry_after = self._get_retry_after(response)
+                        print(f"⚠️  Telegram rate limited for {user_id}, retry after {retry_after}s")
+                        self.rate_limiter.penalize('telegram', user_id, retry_after)
+                        continue
                     else:
                         print(f"❌ HTTP error: {response.status_code}")
                     
                 except requests.exceptions.RequestException as e:
                     print(f"❌ Request error (attempt {attempt + 1}): {e}")
                 
-                # Delay trước khi retry
+                # Backoff trước khi retry
                 if attempt < self.max_retries - 1:
-                    time.sleep(self.rate_limit_delay * (attempt + 1))
+                    self.rate_limiter.penalize('telegram', user_id, self.rate_limit_delay * (attempt + 1))
             
             return False
             
@@ -173,10 +196,11 @@ class TelegramNotifier:
                 'caption': caption
             }
             
-            response = requests.post(
+            self.rate_limiter.acquire('telegram', user_id)
+            response = self.session.post(
                 f"{self.api_url}/sendPhoto",
                 json=payload,
-                timeout=30
+                timeout=self.timeout
             )
             
             if response.status_code == 200:
@@ -184,6 +208,8 @@ class TelegramNotifier:
                 if result.get('ok'):
                     print(f"✅ Telegram media sent to {user_id}")
                     return True
+            elif response.status_code == 429:
+                self.rate_limiter.penalize('telegram', user_id, self._get_retry_after(response))
             
             return False
             
@@ -191,6 +217,27 @@ class TelegramNotifier:
             print(f"❌ Media message error: {e}")
             return False
     
+    def _get_retry_after(self, response) -> float:
+        """
+        Lấy retry_after (giây) từ response 429 của Telegram
+        
+        Args:
+            response: requests.Response
+            
+        Returns:
+            Số giây cần chờ
+        """
+        try:
+            retry_after = response.json().get('parameters', {}).get('retry_after')
+            if retry_after is not None:
+                return float(retry_after)
+        except (ValueError, AttributeError):
+            pass
+        try:
+            return float(response.headers.get('Retry-After', self.rate_limit_delay))
+        except (TypeError, ValueError):
+            return float(self.rate_limit_delay)
+    
     def _format_message(self, message: str) -> str:
         """
         Format message với footer (không thêm header)
@@ -261,10 +308,10 @@ Hãy tập trung hoàn thành ngay! 🔥
             Chat info dict hoặc None
         """
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.api_url}/getChat",
                 params={'chat_id': user_id},
-                timeout=10
+                timeout=self.timeout
             )
             
             if response.status_code == 200:
@@ -278,6 +325,10 @@ Hãy tập trung hoàn thành ngay! 🔥
             print(f"❌ Get chat info error: {e}")
             return None
 
+    def close(self):
+        """Đóng các connection keep-alive"""
+        self.session.close()
+
 # Test function
 def test_telegram_notifier():
     """Test function để kiểm tra TelegramNotifier hoạt động đúng"""
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+USER PROFILE CACHE MODULE
+========================
+
+Mô tả: Cache thông tin gửi thông báo của từng user (chat id, kênh, label, timezone)
+Cách hoạt động:
+1. Trước khi gửi một batch, load_many() nạp profile của mọi owner trong batch cùng một lần
+2. Khi render / gửi từng message, get() lấy profile từ cache (không query DB)
+3. Profile hết hạn sau ttl giây, hoặc bị xóa ngay khi gọi invalidate(user_id)
+4. Mỗi poll_interval giây đọc settings_change_log (migration 008) để bỏ profile
+   của user vừa đổi settings ở process khác (web app)
+
+Thuật toán chính:
+- Dict user_id -> (expires_at, profile)
+- Bulk load: một query user_settings (global, chỉ các key cần cho gửi thông báo)
+  và một query users (email) cho cả batch
+- Giá trị cập nhật sau cùng (updated_at) được ưu tiên, giống UserSettingsManager.get_setting
+
+Hướng dẫn sử dụng:
+1. Khởi tạo UserProfileCache(db, ttl)
+2. Gọi load_many(user_ids) cho cả batch
+3. Gọi get(user_id) khi cần profile
+4. Gọi invalidate(user_id) sau khi user lưu cài đặt
+
+Ví dụ:
+    cache = UserProfileCache(db, ttl=60)
+    cache.load_many(['user_1', 'user_2'])
+    profile = cache.get('user_1')
+    chat_id = profile['telegram_user_id']
+    label = profile['labels']['notif1']
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Để import từ shared
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.database.settings_change_log import poll_changes
+
+DEFAULT_TIMEZONE = 'Asia/Ho_Chi_Minh'
+
+# Label mặc định theo nguồn notification (notification_time, notif1-8)
+DEFAULT_LABELS = {'notification_time': 'Thông báo chính'}
+DEFAULT_LABELS.update({f'notif{i}': f'Thông báo {i}' for i in range(1, 9)})
+
+# Key trong user_settings -> nguồn notification
+LABEL_KEYS = {'notification_time_label': 'notification_time'}
+LABEL_KEYS.update({f'notif_label_{i}': f'notif{i}' for i in range(1, 9)})
+
+# Kênh gửi: key -> mặc định (giống trang /profile/settings)
+CHANNEL_FLAGS = {
+    'notify_via_telegram': True,
+    'notify_via_zalo': False,
+    'notify_via_email': False,
+}
+
+PROFILE_KEYS = (
+    ['telegram_user_id', 'zalo_user_id', 'email_alt', 'timezone']
+    + list(CHANNEL_FLAGS) + list(LABEL_KEYS)
+)
+
+class UserProfileCache:
+    def __init__(self, db, ttl: float = 60, max_users: int = 10000, poll_interval: float = 5):
+        """
+        Khởi tạo UserProfileCache
+
+        Args:
+            db: DatabaseManager instance
+            ttl: Thời gian sống của một profile (giây)
+            max_users: Số profile tối đa giữ trong cache
+            poll_interval: Khoảng cách giữa hai lần đọc settings_change_log (giây)
+        """
+        self.db = db
+        self.ttl = ttl
+        self.max_users = max_users
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._profiles: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._change_seq: Optional[int] = None
+        self._next_poll = 0.0
+
+    def get(self, user_id: str) -> Dict[str, Any]:
+        """
+        Lấy profile của user (nạp từ DB nếu chưa có hoặc đã hết hạn)
+
+        Args:
+            user_id: ID user
+
+        Returns:
+            Dict profile (xem _build_profile)
+        """
+        self._sync_changes()
+        profile = self._get_cached(user_id)
+        if profile is None:
+            self.load_many([user_id])
+            profile = self._get_cached(user_id) or self._build_profile(user_id, {}, None)
+        return profile
+
+    def load_many(self, user_ids: Iterable[str]) -> int:
+        """
+        Nạp profile cho nhiều user cùng lúc (bỏ qua user đã có trong cache)
+
+        Args:
+            user_ids: Danh sách user_id
+
+        Returns:
+            Số profile đã nạp từ DB
+        """
+        self._sync_changes()
+        missing = sorted({uid for uid in user_ids if uid and self._get_cached(uid) is None})
+        if not missing:
+            return 0
+
+        settings: Dict[str, Dict[str, Any]] = {uid: {} for uid in missing}
+        emails: Dict[str, Optional[str]] = {}
+
+        try:
+            user_marks = ','.join('?' * len(missing))
+            key_marks = ','.join('?' * len(PROFILE_KEYS))
+            with self.db.get_connection() as conn:
+                rows = conn.execute(f"""
+                    SELECT user_id, setting_key, setting_value
+                    FROM user_settings
+                    WHERE user_id IN ({user_marks})
+                    AND setting_key IN ({key_marks})
+                    AND (tool_id IS NULL OR tool_id = 'None')
+                    ORDER BY updated_at
+                """, (*missing, *PROFILE_KEYS)).fetchall()
+
+                # ORDER BY updated_at tăng dần -> giá trị mới nhất ghi đè giá trị cũ
+                for user_id, key, value in rows:
+                    if value is not None:
+                        settings[user_id][key] = value
+
+                try:
+                    for user_id, email in conn.execute(
+                        f"SELECT user_id, email FROM users WHERE user_id IN ({user_marks})",
+                        missing
+                    ).fetchall():
+                        emails[user_id] = email
+                except Exception as e:
+                    print(f"⚠️  Error loading user emails: {e}")
+        except Exception as e:
+            print(f"⚠️  Error loading user profiles: {e}")
+            return 0
+
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if len(self._profiles) + len(missing) > self.max_users:
+                self._prune()
+            for user_id in missing:
+                self._profiles[user_id] = (
+                    expires_at,
+                    self._build_profile(user_id, settings[user_id], emails.get(user_id))
+                )
+        return len(missing)
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """
+        Xóa profile khỏi cache
+
+        Args:
+            user_id: ID user, None = xóa toàn bộ
+        """
+        with self._lock:
+            if user_id is None:
+                self._profiles.clear()
+            else:
+                self._profiles.pop(user_id, None)
+
+    def _sync_changes(self):
+        """Bỏ profile của các user có settings thay đổi (đọc settings_change_log, có giới hạn tần suất)"""
+        now = time.monotonic()
+        with self._lock:
+            if self._next_poll > now:
+                return
+            self._next_poll = now + self.poll_interval
+            since = self._change_seq
+
+        try:
+            with self.db.get_connection() as conn:
+                seq, changed = poll_changes(conn, since)
+        except Exception as e:
+            print(f"⚠️  Error polling settings_change_log: {e}")
+            return
+
+        with self._lock:
+            self._change_seq = seq
+            if changed is None and since is not None:
+                self._profiles.clear()
+            for user_id in changed or ():
+                self._profiles.pop(user_id, None)
+
+    def _get_cached(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._profiles.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._profiles[user_id]
+                return None
+            return entry[1]
+
+    def _prune(self):
+        """Xóa profile hết hạn; nếu vẫn đầy thì xóa toàn bộ"""
+        now = time.monotonic()
+        for user_id in [uid for uid, (exp, _) in self._profiles.items() if exp <= now]:
+            del self._profiles[user_id]
+        if len(self._profiles) >= self.max_users:
+            self._profiles.clear()
+
+    def _build_profile(self, user_id: str, settings: Dict[str, Any], email: Optional[str]) -> Dict[str, Any]:
+        """
+        Tạo profile từ các setting đã đọc
+
+        Returns:
+            {
+                'user_id', 'telegram_user_id', 'zalo_user_id', 'email', 'timezone',
+                'channels': {'telegram': bool, 'zalo': bool, 'email': bool},
+                'labels': {'notification_time': str, 'notif1': str, ...}
+            }
+        """
+        labels = dict(DEFAULT_LABELS)
+        for key, source in LABEL_KEYS.items():
+            if settings.get(key):
+                labels[source] = settings[key]
+
+        channels = {}
+        for key, default in CHANNEL_FLAGS.items():
+            value = settings.get(key)
+            channels[key.replace('notify_via_', '')] = default if value in (None, '') else value == '1'
+
+        return {
+            'user_id': user_id,
+            'telegram_user_id': settings.get('telegram_user_id') or None,
+            'zalo_user_id': settings.get('zalo_user_id') or None,
+            'email': email or settings.get('email_alt') or None,
+            'timezone': settings.get('timezone') or DEFAULT_TIMEZONE,
+            'channels': channels,
+            'labels': labels,
+        }
@@ -11,11 +11,11 @@ Cách hoạt động:
 4. Xử lý lỗi và retry
 
 Thuật toán chính:
-- Sử dụng Zalo Official Account API
+- Sử dụng Zalo Official Account API qua Session keep-alive có connection pool
 - OAuth2 authentication
 - Template message support
 - Retry mechanism
-- Rate limiting
+- Rate limiting dùng chung (token bucket theo OA + theo người nhận)
 
 Hướng dẫn sử dụng:
 1. Cấu hình Zalo OA credentials
@@ -28,25 +28,42 @@ Ví dụ:
     notifier.send_message("user_id", "Hello World!")
 """
 
+import os
+import sys
 import requests
 import json
-import time
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 
+# Add parent directory to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from notifications.rate_limiter import get_shared_rate_limiter
+from notifications.http_session import create_http_session
+
 class ZaloNotifier:
-    def __init__(self, access_token: str, oa_id: str):
+    def __init__(self, access_token: str, oa_id: str, rate_limiter=None, pool_size: int = 10,
+                 connect_timeout: float = 5, read_timeout: float = 30):
         """
         Khởi tạo ZaloNotifier
         
         Args:
             access_token: Zalo OA Access Token
             oa_id: Zalo OA ID
+            rate_limiter: RateLimiter instance (mặc định: limiter dùng chung)
+            pool_size: Số connection keep-alive tối đa tới openapi.zalo.me
+            connect_timeout: Timeout kết nối (seconds)
+            read_timeout: Timeout đọc response (seconds)
         """
         self.access_token = access_token
         self.oa_id = oa_id
         self.api_url = "https://openapi.zalo.me/v2.0/oa"
-        self.rate_limit_delay = 2  # Delay giữa các request (seconds)
+        self.session = create_http_session(pool_size=pool_size)
+        self.timeout = (connect_timeout, read_timeout)
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter()
+        self.rate_limit_delay = 2  # Backoff cơ sở khi lỗi tạm thời (seconds)
         self.max_retries = 3
         
         # Test connection
@@ -101,17 +118,18 @@ class ZaloNotifier:
                 'message': {'text': formatted_message}
             }
             
-            # Bước 4: Retry mechanism
+            # Bước 4: Retry mechanism (chờ trên rate limiter thay vì sleep cố định)
             for attempt in range(self.max_retries):
+                self.rate_limiter.acquire('zalo', user_id)
                 try:
-                    response = requests.post(
+                    response = self.session.post(
                         f"{self.api_url}/message",
                         headers={
                             'access_token': self.access_token,
                             'Content-Type': 'application/json'
                         },
                         json=payload,
-                        timeout=30
+                        timeout=self.timeout
                     )
                     
                     if response.status_code == 200:
@@ -121,15 +139,20 @@ class ZaloNotifier:
                             return True
                         else:
                             print(f"❌ Zalo API error: {result.get('message')}")
+                    elif response.status_code == 429:
+                        retry_after = self._get_retry_after(response)
+                        print(f"⚠️  Zalo rate limited for {user_id}, retry after {retry_after}s")
+                        self.rate_limiter.penalize('zalo', user_id, retry_after)
+                        continue
                     else:
                         print(f"❌ HTTP error: {response.status_code}")
                     
                 except requests.exceptions.RequestException as e:
                     print(f"❌ Request error (attempt {attempt + 1}): {e}")
                 
-                # Delay trước khi retry
+                # Backoff trước khi retry
                 if attempt < self.max_retries - 1:
-                    time.sleep(self.rate_limit_delay * (attempt + 1))
+                    self.rate_limiter.penalize('zalo', user_id, self.rate_limit_delay * (attempt + 1))
             
             return False
             
@@ -186,16 +209,20 @@ class ZaloNotifier:
                 }
             }
             
-            response = requests.post(
+            self.rate_limiter.acquire('zalo', user_id)
+            response = self.session.post(
                 f"{self.api_url}/message",
                 headers={
                     'access_token': self.access_token,
                     'Content-Type': 'application/json'
                 },
                 json=payload,
-                timeout=30
+                timeout=self.timeout
             )
             
+            if response.status_code == 429:
+                self.rate_limiter.penalize('zalo', user_id, self._get_retry_after(response))
+            
             if response.status_code == 200:
                 result = response.json()
                 if result.get('error') == 0:
@@ -208,6 +235,21 @@ class ZaloNotifier:
             print(f"❌ Media message error: {e}")
             return False
     
+    def _get_retry_after(self, response) -> float:
+        """
+        Lấy thời gian chờ (giây) từ header Retry-After của response 429
+        
+        Args:
+            response: requests.Response
+            
+        Returns:
+            Số giây cần chờ
+        """
+        try:
+            return float(response.headers.get('Retry-After', self.rate_limit_delay))
+        except (TypeError, ValueError):
+            return float(self.rate_limit_delay)
+    
     def _format_message(self, message: str) -> str:
         """
         Format message với header và footer
@@ -278,13 +320,13 @@ Hãy tập trung hoàn thành ngay! 🔥
             User info dict hoặc None
         """
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.api_url}/getprofile",
                 params={
                     'access_token': self.access_token,
                     'data': json.dumps({'user_id': user_id})
                 },
-                timeout=10
+                timeout=self.timeout
             )
             
             if response.status_code == 200:
@@ -298,6 +340,10 @@ Hãy tập trung hoàn thành ngay! 🔥
             print(f"❌ Get user info error: {e}")
             return None
 
+    def close(self):
+        """Đóng các connection keep-alive"""
+        self.session.close()
+
 # Test function
 def test_zalo_notifier():
     """Test function để kiểm tra ZaloNotifier hoạt động đúng"""
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+REMINDER REPORT MODULE
+=====================
+
+Mô tả: Báo cáo "tasks có lịch nhắc trong [từ, đến]" cho /reports/tasks
+Cách hoạt động:
+1. Lấy các slot nhắc trong khoảng bằng một range scan trên
+   idx_task_reminder_slots_user_epoch (bảng task_reminder_slots)
+2. Gom theo task trong SQL: slot sớm nhất, danh sách slot trúng khoảng (hits)
+   và slot trúng trước mốc khẩn (urgent)
+3. JOIN tasks để lọc status / category / từ khóa và lấy thông tin hiển thị
+4. Phân trang keyset theo (first_fire, task_id), trả về cursor trang kế tiếp
+
+Thuật toán chính:
+- Cờ hit / urgent tính bằng group_concat(CASE ...) trong SQL, không parse lại
+  chuỗi thời gian trong Python
+- Keyset thay vì OFFSET: trang sau không phải bỏ qua các dòng trang trước
+
+Hướng dẫn sử dụng:
+1. Khởi tạo ReminderReport(db)
+2. Gọi query(user_id, start, end, urgent_until, ...) với datetime
+3. Truyền lại next_cursor để lấy trang kế tiếp
+
+Ví dụ:
+    report = ReminderReport(db)
+    page = report.query('user_1', now, now + timedelta(days=7), now + timedelta(days=3))
+    for task in page['tasks']:
+        print(task['title'], task['_hits'], task['_urgent'])
+    next_page = report.query(..., cursor=page['next_cursor'])
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+class ReminderReport:
+    def __init__(self, db, page_size: int = 100):
+        """
+        Khởi tạo ReminderReport
+
+        Args:
+            db: DatabaseManager instance
+            page_size: Số tasks mỗi trang mặc định
+        """
+        self.db = db
+        self.page_size = page_size
+
+    def query(self, user_id: str, start: datetime, end: datetime, urgent_until: datetime,
+              status: str = None, category: str = None, search: str = None,
+              cursor: str = None, limit: int = None) -> Dict[str, Any]:
+        """
+        Lấy một trang tasks có slot nhắc trong [start, end]
+
+        Args:
+            user_id: ID user
+            start, end: Khoảng thời gian (datetime naive, giờ local)
+            urgent_until: Slot trúng khoảng và <= mốc này được đánh dấu khẩn
+            status, category, search: Bộ lọc tùy chọn
+            cursor: Cursor từ trang trước (None = trang đầu)
+            limit: Số tasks mỗi trang (mặc định page_size)
+
+        Returns:
+            {
+                'tasks': List dict task (kèm '_hits', '_urgent' là set tên slot),
+                'next_cursor': str hoặc None,
+                'total': Tổng số tasks khớp (mọi trang)
+            }
+        """
+        limit = limit or self.page_size
+
+        params = {
+            'uid': user_id,
+            'start': int(start.timestamp()),
+            'end': int(end.timestamp()),
+            'urgent': int(urgent_until.timestamp()),
+        }
+
+        filters = ["t.user_id = :uid"]
+        if status:
+            filters.append("t.status = :status")
+            params['status'] = status
+        if category:
+            filters.append("t.category = :category")
+            params['category'] = category
+        if search:
+            filters.append("(t.title LIKE :search OR t.description LIKE :search)")
+            params['search'] = f"%{search}%"
+        filter_sql = " AND ".join(filters)
+
+        window_sql = """
+            SELECT task_id,
+                   MIN(fire_at_epoch) AS first_fire,
+                   group_concat(slot) AS hit_slots,
+                   group_concat(CASE WHEN fire_at_epoch <= :urgent THEN slot END) AS urgent_slots
+            FROM task_reminder_slots
+            WHERE user_id = :uid AND fire_at_epoch BETWEEN :start AND :end
+            GROUP BY task_id
+        """
+
+        after = self._decode_cursor(cursor) if cursor else None
+        page_sql = ""
+        if after:
+            page_sql = " AND (w.first_fire, t.task_id) > (:after_fire, :after_id)"
+            params['after_fire'], params['after_id'] = after
+
+        try:
+            with self.db.get_connection() as conn:
+                total = conn.execute(f"""
+                    SELECT COUNT(*)
+                    FROM ({window_sql}) w
+                    JOIN tasks t ON t.task_id = w.task_id
+                    WHERE {filter_sql}
+                """, params).fetchone()[0]
+
+                params['limit'] = limit + 1
+                rows = conn.execute(f"""
+                    SELECT t.*, w.first_fire, w.hit_slots, w.urgent_slots
+                    FROM ({window_sql}) w
+                    JOIN tasks t ON t.task_id = w.task_id
+                    WHERE {filter_sql}{page_sql}
+                    ORDER BY w.first_fire ASC, t.task_id ASC
+                    LIMIT :limit
+                """, params).fetchall()
+                tasks = [dict(r) for r in rows]
+        except Exception as e:
+            print(f"❌ Report query error: {e}")
+            return {'tasks': [], 'next_cursor': None, 'total': 0}
+
+        for task in tasks:
+            task['_hits'] = set((task.pop('hit_slots') or '').split(',')) - {''}
+            task['_urgent'] = set((task.pop('urgent_slots') or '').split(',')) - {''}
+
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            last = tasks[-1]
+            next_cursor = self._encode_cursor(last['first_fire'], last['task_id'])
+
+        return {'tasks': tasks, 'next_cursor': next_cursor, 'total': total}
+
+    @staticmethod
+    def _encode_cursor(first_fire: int, task_id: str) -> str:
+        raw = json.dumps([first_fire, task_id]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Optional[Tuple[int, str]]:
+        try:
+            first_fire, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return int(first_fire), str(task_id)
+        except Exception:
+            print(f"⚠️  Invalid report cursor: {cursor}")
+            return None
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+REMINDER SLOTS MODULE
+====================
+
+Mô tả: Bảng task_reminder_slots - mỗi thời điểm nhắc (notification_time, notif1..notif8)
+       của task là một dòng, thời điểm đã chuẩn hóa và có epoch để query theo khoảng
+Cách hoạt động:
+1. SimpleTaskManager ghi tasks.notif* như cũ và gọi sync_task_slots() trong cùng transaction
+2. Giá trị nhiều format ('YYYY-MM-DDTHH:MM', 'YYYY-MM-DD HH:MM:SS', ...) được parse một lần
+   khi ghi, lưu fire_at ('YYYY-MM-DD HH:MM:SS', giờ của user) và fire_at_epoch (UTC,
+   tính theo timezone của user)
+3. Query theo khoảng thời gian chỉ cần một range scan trên index
+   (user_id, fire_at_epoch) thay vì datetime(replace(...)) trên 9 cột
+4. View task_reminder_columns trả lại dạng cột cũ (notification_time, notif1..notif8)
+
+Thuật toán chính:
+- Sync theo slot: xóa dòng của slot rồi chèn lại nếu giá trị parse được
+- Backfill theo lô (keyset trên task_id) để không nạp toàn bộ bảng tasks vào bộ nhớ
+- ensure_reminder_slots() tạo bảng/index/view nếu chưa có và backfill khi bảng mới tạo
+
+Hướng dẫn sử dụng:
+1. ensure_reminder_slots(conn) khi khởi tạo (SimpleTaskManager làm sẵn)
+2. sync_task_slots(conn, task_id, user_id, {'notif1': '2025-01-01T09:00'})
+3. delete_task_slots(conn, task_id) khi xóa task
+
+Ví dụ:
+    with db.get_connection() as conn:
+        ensure_reminder_slots(conn)
+        sync_task_slots(conn, 'task_abc', 'user_1', {'notification_time': '2025-01-01T09:00'})
+        rows = conn.execute(
+            "SELECT task_id FROM task_reminder_slots WHERE user_id = ? AND fire_at_epoch BETWEEN ? AND ?",
+            ('user_1', start_epoch, end_epoch)
+        ).fetchall()
+"""
+
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from utils.date_utils import DEFAULT_TIMEZONE, parse_datetime
+from utils.epoch_utils import to_epoch, user_timezones
+
+# Các cột thời điểm nhắc của tasks (thứ tự hiển thị)
+SLOT_COLUMNS = ['notification_time'] + [f'notif{i}' for i in range(1, 9)]
+
+# Format chuẩn của fire_at (giống notifications.scheduled_time)
+FIRE_AT_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Số tasks mỗi lô khi backfill
+_BACKFILL_BATCH = 500
+
+def parse_reminder_time(value: Any) -> Optional[datetime]:
+    """
+    Parse thời điểm nhắc từ tasks.notif* (None nếu rỗng / không hợp lệ)
+
+    Args:
+        value: 'YYYY-MM-DDTHH:MM', 'YYYY-MM-DD HH:MM[:SS]', ...
+
+    Returns:
+        datetime (naive, giờ local) hoặc None
+    """
+    if not value:
+        return None
+    return parse_datetime(value, source='reminder_slots')
+
+def ensure_reminder_slots(conn: sqlite3.Connection) -> bool:
+    """
+    Tạo bảng / index / view nếu chưa có; backfill từ tasks khi bảng vừa được tạo
+
+    Returns:
+        True nếu vừa tạo bảng (và đã backfill)
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_reminder_slots'"
+    ).fetchone() is not None
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS task_reminder_slots (
+            task_id TEXT NOT NULL,
+            slot TEXT NOT NULL,
+            user_id TEXT,
+            fire_at TEXT NOT NULL,
+            fire_at_epoch INTEGER NOT NULL,
+            PRIMARY KEY (task_id, slot)
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_task_reminder_slots_epoch ON task_reminder_slots (fire_at_epoch)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_task_reminder_slots_user_epoch ON task_reminder_slots (user_id, fire_at_epoch)"
+    )
+
+    # View tương thích: slots -> dạng cột cũ (notification_time, notif1..notif8)
+    columns = ",\n            ".join(
+        f"MAX(CASE WHEN slot = '{col}' THEN fire_at END) AS {col}" for col in SLOT_COLUMNS
+    )
+    conn.execute(f"""
+        CREATE VIEW IF NOT EXISTS task_reminder_columns AS
+        SELECT task_id, user_id,
+            {columns}
+        FROM task_reminder_slots
+        GROUP BY task_id, user_id
+    """)
+
+    if not exists:
+        count = backfill_reminder_slots(conn)
+        print(f"✅ Created task_reminder_slots ({count} slots backfilled)")
+    return not exists
+
+def sync_task_slots(conn: sqlite3.Connection, task_id: str, user_id: Optional[str],
+                    values: Dict[str, Any], tz_name: Optional[str] = None) -> int:
+    """
+    Ghi lại các slot có trong values (slot rỗng / không parse được thì bị xóa)
+
+    Args:
+        conn: Connection đang giữ transaction ghi tasks
+        task_id: ID task
+        user_id: Chủ task
+        values: {cột: giá trị} - chỉ các cột trong SLOT_COLUMNS được xét
+        tz_name: Timezone của user (None = giờ local của server)
+
+    Returns:
+        Số slot đang có giá trị sau khi ghi
+    """
+    slots = [col for col in SLOT_COLUMNS if col in values]
+    if not slots:
+        return 0
+
+    conn.executemany(
+        "DELETE FROM task_reminder_slots WHERE task_id = ? AND slot = ?",
+        [(task_id, slot) for slot in slots]
+    )
+
+    rows = []
+    for slot in slots:
+        dt = parse_reminder_time(values[slot])
+        if dt is not None:
+            rows.append((task_id, slot, user_id, dt.strftime(FIRE_AT_FORMAT), to_epoch(dt, tz_name)))
+    conn.executemany(
+        "INSERT INTO task_reminder_slots (task_id, slot, user_id, fire_at, fire_at_epoch) VALUES (?, ?, ?, ?, ?)",
+        rows
+    )
+    return len(rows)
+
+def delete_task_slots(conn: sqlite3.Connection, task_ids: Iterable[str]) -> None:
+    conn.executemany(
+        "DELETE FROM task_reminder_slots WHERE task_id = ?",
+        [(task_id,) for task_id in task_ids]
+    )
+
+def backfill_reminder_slots(conn: sqlite3.Connection, batch_size: int = _BACKFILL_BATCH) -> int:
+    """
+    Tính lại toàn bộ task_reminder_slots từ tasks.notif* (theo lô, epoch theo timezone
+    của từng user - đọc một lần cho mọi user)
+
+    Returns:
+        Số slot đã ghi
+    """
+    conn.execute("DELETE FROM task_reminder_slots")
+    select = f"""
+        SELECT task_id, user_id, {', '.join(SLOT_COLUMNS)}
+        FROM tasks
+        WHERE task_id > ?
+        ORDER BY task_id
+        LIMIT ?
+    """
+    timezones = user_timezones(conn)
+    total = 0
+    last_id = ''
+    while True:
+        rows = conn.execute(select, (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            total += sync_task_slots(conn, row[0], row[1], dict(zip(SLOT_COLUMNS, row[2:])),
+                                     timezones.get(row[1], DEFAULT_TIMEZONE))
+        last_id = rows[-1][0]
+    return total
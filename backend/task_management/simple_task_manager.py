@@ -19,7 +19,7 @@ Thuật toán chính:
 Hướng dẫn sử dụng:
 1. Khởi tạo SimpleTaskManager
 2. Gọi create_task() để tạo task mới
-3. Gọi get_tasks() để lấy danh sách
+3. Gọi get_tasks() để lấy danh sách (get_tasks_page() để phân trang theo cursor)
 4. Gọi update_task_status() để cập nhật
 
 Ví dụ:
@@ -28,9 +28,11 @@ Ví dụ:
     tasks = manager.get_tasks()
 """
 
+import base64
+import json
 import os
 import sys
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 import uuid
 
@@ -39,6 +41,13 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
+from task_management.reminder_slots import (
+    FIRE_AT_FORMAT, delete_task_slots, ensure_reminder_slots, parse_reminder_time, sync_task_slots
+)
+from notifications.user_profile_cache import UserProfileCache
+from utils.date_utils import DEFAULT_TIMEZONE
+from utils.epoch_utils import to_epoch
+
 class SimpleTaskManager:
     def __init__(self, db):
         """
@@ -48,8 +57,24 @@ class SimpleTaskManager:
             db: DatabaseManager instance
         """
         self.db = db
+        # Timezone của từng user (tự bỏ khi user đổi settings, qua settings_change_log)
+        self.profile_cache = UserProfileCache(db, ttl=300)
+        
+        # Bảng task_reminder_slots (tạo + backfill nếu chưa có)
+        try:
+            with self.db.get_connection() as conn:
+                ensure_reminder_slots(conn)
+        except Exception as e:
+            print(f"⚠️  Could not prepare task_reminder_slots: {e}")
+        
         print("✅ SimpleTaskManager initialized")
     
+    def _user_timezone(self, user_id: Optional[str]) -> str:
+        """Timezone của user (giờ user nhập được đổi sang UTC theo zone này)"""
+        if not user_id:
+            return DEFAULT_TIMEZONE
+        return self.profile_cache.get(user_id)['timezone']
+    
     def create_task(self, task_data: Dict[str, Any]) -> str:
         """
         Thuật toán tạo task mới:
@@ -116,10 +141,16 @@ class SimpleTaskManager:
                 INSERT INTO tasks 
                 (task_id, user_id, title, description, start_date, end_date, deadline,
                 notification_time, category, priority, status, created_at, last_modified,
-                notif1, notif2, notif3, notif4, notif5, notif6, notif7, notif8)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                notif1, notif2, notif3, notif4, notif5, notif6, notif7, notif8,
+                deadline_epoch, created_at_epoch)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """
                 
+                # Giờ user nhập -> UTC theo timezone của user; created_at là giờ server
+                tz_name = self._user_timezone(task_record['user_id'])
+                deadline_epoch = to_epoch(task_record['deadline'], tz_name)
+                created_at_epoch = to_epoch(now)
+                
                 params = (
                     task_record['task_id'],
                     task_record['user_id'],
@@ -135,19 +166,23 @@ class SimpleTaskManager:
                     task_record['created_at'],
                     task_record['last_modified'],
                     task_record['notif1'], task_record['notif2'], task_record['notif3'], task_record['notif4'],
-                    task_record['notif5'], task_record['notif6'], task_record['notif7'], task_record['notif8']
+                    task_record['notif5'], task_record['notif6'], task_record['notif7'], task_record['notif8'],
+                    deadline_epoch, created_at_epoch
                 )
                 
                 self.db.execute_insert(conn, query, params)
                 
+                # Thời điểm nhắc đã chuẩn hóa (cùng transaction)
+                sync_task_slots(conn, task_id, task_record['user_id'], task_record, tz_name)
+                
                 # Bước 5: Tạo calendar event
                 event_id = f"event_{task_id}"
                 event_query = """
                 INSERT INTO calendar_events 
                 (event_id, task_id, user_id, title, description, start_date, end_date, 
                 deadline, notification_time, category, priority, status, 
-                source, created_at, last_modified)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                source, created_at, last_modified, deadline_epoch, created_at_epoch)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """
                 
                 event_params = (
@@ -165,7 +200,9 @@ class SimpleTaskManager:
                     task_record['status'],
                     'manual',
                     now,
-                    now
+                    now,
+                    deadline_epoch,
+                    created_at_epoch
                 )
                 
                 self.db.execute_insert(conn, event_query, event_params)
@@ -175,13 +212,13 @@ class SimpleTaskManager:
             # Bước 6: Schedule notifications nếu có (sau khi commit)
             # Tạo notification từ notification_time
             if task_data.get('notification_time'):
-                self._schedule_notification_after_commit(task_id, event_id, task_data['notification_time'], 'notification_time')
+                self._schedule_notification_after_commit(task_id, event_id, task_data['notification_time'], 'notification_time', tz_name)
 
             # Tạo notifications từ notif1-8
             for i in range(1, 9):
                 notif_key = f'notif{i}'
                 if task_data.get(notif_key):
-                    self._schedule_notification_after_commit(task_id, event_id, task_data[notif_key], notif_key)
+                    self._schedule_notification_after_commit(task_id, event_id, task_data[notif_key], notif_key, tz_name)
             
             print(f"✅ Task created successfully: {task_id}")
             return task_id
@@ -190,49 +227,20 @@ class SimpleTaskManager:
             print(f"❌ Error creating task: {e}")
             raise
 
-    def _schedule_notification_after_commit(self, task_id: str, event_id: str, notification_time: str, notif_source: str = 'notification_time'):
+    def _schedule_notification_after_commit(self, task_id: str, event_id: str, notification_time: str,
+                                            notif_source: str = 'notification_time', tz_name: Optional[str] = None):
         """
         Lên lịch thông báo sau khi commit task
         """
         try:
-            notification_id = f"notif_{task_id}_{int(datetime.now().timestamp())}"
-            
-            # Sửa format thời gian từ YYYY-MM-DDTHH:MM thành YYYY-MM-DD HH:MM:SS
-            try:
-                if 'T' in notification_time:
-                    # Convert từ 2025-10-17T23:45 thành 2025-10-17 23:45:00
-                    dt = datetime.strptime(notification_time, '%Y-%m-%dT%H:%M')
-                    formatted_time = dt.strftime('%Y-%m-%d %H:%M:%S')
-                else:
-                    formatted_time = notification_time
-            except:
-                formatted_time = notification_time
-            
-            # Sử dụng connection riêng để tránh lock
-            import sqlite3
-            conn = sqlite3.connect(self.db.db_path)
-            cursor = conn.cursor()
-            
-            query = """
-            INSERT INTO notifications 
-            (notification_id, task_id, event_id, notification_type, 
-            scheduled_time, status, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """
+            # Kèm notif_source để các nguồn tạo cùng giây không trùng ID
+            notification_id = f"notif_{task_id}_{notif_source}_{int(datetime.now().timestamp())}"
             
-            params = (
-                notification_id,
-                task_id,
-                event_id,
-                'reminder',
-                formatted_time,  # Sử dụng formatted_time
-                'pending',
-                datetime.now().isoformat()
-            )
-            
-            cursor.execute(query, params)
-            conn.commit()
-            conn.close()
+            # Connection từ pool (đóng/trả lại kể cả khi lỗi)
+            with self.db.get_connection() as conn:
+                formatted_time = self._insert_notification(conn, notification_id, task_id, event_id,
+                                                           notification_time, tz_name)
+                conn.commit()
             
             print(f"✅ Notification scheduled for {formatted_time}")
             
@@ -282,6 +290,175 @@ class SimpleTaskManager:
             print(f"❌ Error getting tasks: {e}")
             return []
     
+    def get_task(self, task_id: str, user_id: str = None, include_offsets: bool = False,
+                 include_notifications: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Lấy một task theo task_id (tra primary key, không quét danh sách)
+        
+        Args:
+            task_id: ID task
+            user_id: Chỉ trả về nếu task thuộc user này (None = không kiểm tra)
+            include_offsets: Kèm 'offsets' {column_name: offset_value} từ task_datetime_offsets
+            include_notifications: Kèm 'notifications' là các notification đang pending của task
+        
+        Returns:
+            Dict task hoặc None nếu không tìm thấy
+        """
+        try:
+            with self.db.get_connection() as conn:
+                query = "SELECT * FROM tasks WHERE task_id = ?"
+                params = [task_id]
+                if user_id:
+                    query += " AND user_id = ?"
+                    params.append(user_id)
+                rows = self.db.execute_query(conn, query, tuple(params))
+                if not rows:
+                    return None
+                task = rows[0]
+                
+                if include_offsets:
+                    try:
+                        offset_rows = conn.execute(
+                            "SELECT column_name, offset_value FROM task_datetime_offsets WHERE task_id = ?",
+                            (task_id,)
+                        ).fetchall()
+                        task['offsets'] = {r[0]: r[1] for r in offset_rows}
+                    except Exception:
+                        # Chưa chạy migration 005
+                        task['offsets'] = {}
+                
+                if include_notifications:
+                    task['notifications'] = self.db.execute_query(
+                        conn,
+                        "SELECT * FROM notifications WHERE task_id = ? AND status = 'pending' ORDER BY scheduled_time",
+                        (task_id,)
+                    )
+                
+                return task
+                
+        except Exception as e:
+            print(f"❌ Error getting task {task_id}: {e}")
+            return None
+    
+    def get_task_stats(self, user_id: str) -> Dict[str, Any]:
+        """
+        Đếm tasks của user theo trạng thái
+        
+        Đọc bảng task_status_counts (trigger duy trì, migration 009) nếu có - O(1)
+        theo số tasks; nếu chưa có thì COUNT(*) GROUP BY status trên index
+        idx_tasks_user_status.
+        
+        Args:
+            user_id: ID user
+        
+        Returns:
+            {'total_tasks', 'completed_tasks', 'pending_tasks', 'overdue_tasks',
+             'by_status': {status: count}}
+        """
+        by_status = {}
+        try:
+            with self.db.get_connection() as conn:
+                try:
+                    rows = conn.execute(
+                        "SELECT status, count FROM task_status_counts WHERE user_id = ? AND count > 0",
+                        (user_id or '',)
+                    ).fetchall()
+                except Exception:
+                    rows = conn.execute(
+                        "SELECT COALESCE(status, ''), COUNT(*) FROM tasks WHERE user_id = ? GROUP BY status",
+                        (user_id,)
+                    ).fetchall()
+                by_status = {r[0]: r[1] for r in rows}
+        except Exception as e:
+            print(f"❌ Error getting task stats: {e}")
+        
+        return {
+            'total_tasks': sum(by_status.values()),
+            'completed_tasks': by_status.get('completed', 0),
+            'pending_tasks': by_status.get('pending', 0),
+            'overdue_tasks': by_status.get('overdue', 0),
+            'by_status': by_status,
+        }
+    
+    def get_tasks_page(self, user_id: str = None, status: str = None, category: str = None,
+                       search: str = None, cursor: str = None, limit: int = 50) -> Dict[str, Any]:
+        """
+        Lấy một trang tasks theo keyset (created_at, task_id), kèm cursor trang kế tiếp
+        
+        Không dùng OFFSET: mỗi trang là một lần seek trên index
+        idx_tasks_user_created, nên thời gian / kích thước response không
+        phụ thuộc số tasks đã có.
+        
+        Args:
+            user_id: Lọc theo user_id (nếu None thì lấy tất cả)
+            status: Lọc theo trạng thái
+            category: Lọc theo category
+            search: Tìm trong tiêu đề / mô tả
+            cursor: Cursor trả về từ trang trước (None = trang đầu)
+            limit: Số tasks mỗi trang
+        
+        Returns:
+            {'tasks': List tasks, 'next_cursor': str hoặc None nếu hết}
+        """
+        conditions = []
+        params = []
+        
+        if user_id:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if category:
+            conditions.append("category = ?")
+            params.append(category)
+        if search:
+            conditions.append("(title LIKE ? OR description LIKE ?)")
+            params.extend([f"%{search}%", f"%{search}%"])
+        
+        after = self._decode_cursor(cursor) if cursor else None
+        if after:
+            created_at, task_id = after
+            if created_at is None:
+                # created_at NULL đứng đầu khi sắp tăng dần
+                conditions.append("((created_at IS NULL AND task_id > ?) OR created_at IS NOT NULL)")
+                params.append(task_id)
+            else:
+                conditions.append("(created_at, task_id) > (?, ?)")
+                params.extend([created_at, task_id])
+        
+        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+        query = f"SELECT * FROM tasks{where_clause} ORDER BY created_at ASC, task_id ASC LIMIT ?"
+        params.append(limit + 1)
+        
+        try:
+            with self.db.get_connection() as conn:
+                tasks = self.db.execute_query(conn, query, tuple(params))
+        except Exception as e:
+            print(f"❌ Error getting tasks page: {e}")
+            return {'tasks': [], 'next_cursor': None}
+        
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            last = tasks[-1]
+            next_cursor = self._encode_cursor(last.get('created_at'), last['task_id'])
+        return {'tasks': tasks, 'next_cursor': next_cursor}
+    
+    @staticmethod
+    def _encode_cursor(created_at: Optional[str], task_id: str) -> str:
+        raw = json.dumps([created_at, task_id]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Optional[Tuple[Optional[str], str]]:
+        try:
+            created_at, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return created_at, str(task_id)
+        except Exception:
+            print(f"⚠️  Invalid tasks cursor: {cursor}")
+            return None
+    
     def update_task_status(self, task_id: str, status: str) -> bool:
         """
         Cập nhật trạng thái task
@@ -336,11 +513,21 @@ class SimpleTaskManager:
 
             set_strs.append("last_modified = ?")
             params.append(datetime.now().isoformat())
-            params.append(task_id)
 
-            sql = f"UPDATE tasks SET {', '.join(set_strs)} WHERE task_id = ?"
-            
             with self.db.get_connection() as conn:
+                # Chủ task + timezone (giờ user nhập -> UTC)
+                owner_row = conn.execute(
+                    "SELECT user_id FROM tasks WHERE task_id = ?", (task_id,)
+                ).fetchone()
+                owner_id = owner_row[0] if owner_row else None
+                tz_name = self._user_timezone(owner_id)
+                
+                if 'deadline' in updates:
+                    set_strs.append("deadline_epoch = ?")
+                    params.append(to_epoch(updates['deadline'], tz_name))
+                params.append(task_id)
+                
+                sql = f"UPDATE tasks SET {', '.join(set_strs)} WHERE task_id = ?"
                 cur = conn.cursor()
                 cur.execute(sql, tuple(params))
                 conn.commit()
@@ -357,6 +544,10 @@ class SimpleTaskManager:
                     ).fetchone()
                     event_id = event_row[0] if event_row else f"event_{task_id}"
                     
+                    # Đồng bộ task_reminder_slots với các cột vừa đổi
+                    sync_task_slots(conn, task_id, owner_id,
+                                    {f: updates[f] for f in notification_fields_changed}, tz_name)
+                    
                     # Xóa notifications pending cũ cho task này
                     conn.execute("""
                         DELETE FROM notifications 
@@ -381,29 +572,9 @@ class SimpleTaskManager:
                     # Tạo notifications mới
                     for notif_source, notif_time in notification_times:
                         try:
-                            # Format thời gian
-                            if 'T' in notif_time:
-                                dt = datetime.strptime(notif_time, '%Y-%m-%dT%H:%M')
-                                formatted_time = dt.strftime('%Y-%m-%d %H:%M:%S')
-                            else:
-                                formatted_time = notif_time
-                            
                             notification_id = f"notif_{task_id}_{notif_source}_{int(datetime.now().timestamp())}"
-                            
-                            conn.execute("""
-                                INSERT INTO notifications 
-                                (notification_id, task_id, event_id, notification_type, 
-                                scheduled_time, status, created_at)
-                                VALUES (?, ?, ?, ?, ?, ?, ?)
-                            """, (
-                                notification_id,
-                                task_id,
-                                event_id,
-                                'reminder',
-                                formatted_time,
-                                'pending',
-                                datetime.now().isoformat()
-                            ))
+                            formatted_time = self._insert_notification(conn, notification_id, task_id, event_id,
+                                                                       notif_time, tz_name)
                             print(f"✅ Created notification from {notif_source}: {formatted_time}")
                         except Exception as e:
                             print(f"⚠️  Error creating notification from {notif_source}: {e}")
@@ -416,36 +587,39 @@ class SimpleTaskManager:
             print(f"❌ Error updating task {task_id}: {e}")
             return False
 
-        def delete_task(self, task_id: str) -> bool:
-            """
-            Xóa task và các dữ liệu liên quan
+    def delete_task(self, task_id: str) -> bool:
+        """
+        Xóa task và các dữ liệu liên quan
+        
+        Args:
+            task_id: ID của task cần xóa
             
-            Args:
-                task_id: ID của task cần xóa
+        Returns:
+            bool: True nếu xóa thành công
+        """
+        try:
+            with self.db.get_connection() as conn:
+                # Xóa notifications trước
+                conn.execute("DELETE FROM notifications WHERE task_id = ?", (task_id,))
                 
-            Returns:
-                bool: True nếu xóa thành công
-            """
-            try:
-                with self.db.get_connection() as conn:
-                    # Xóa notifications trước
-                    conn.execute("DELETE FROM notifications WHERE task_id = ?", (task_id,))
-                    
-                    # Xóa calendar events
-                    conn.execute("DELETE FROM calendar_events WHERE task_id = ?", (task_id,))
-                    
-                    # Xóa task
-                    cur = conn.cursor()
-                    cur.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
-                    conn.commit()
-                    
-                    return cur.rowcount > 0
-            except Exception as e:
-                print(f"❌ Error deleting task {task_id}: {e}")
-                import traceback
-                traceback.print_exc()
-                return False
-    
+                # Xóa thời điểm nhắc đã chuẩn hóa
+                delete_task_slots(conn, [task_id])
+                
+                # Xóa calendar events
+                conn.execute("DELETE FROM calendar_events WHERE task_id = ?", (task_id,))
+                
+                # Xóa task
+                cur = conn.cursor()
+                cur.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+                conn.commit()
+                
+                return cur.rowcount > 0
+        except Exception as e:
+            print(f"❌ Error deleting task {task_id}: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
     def _schedule_notification(self, task_id: str, event_id: str, notification_time: str):
         """
         Lên lịch thông báo
@@ -458,38 +632,59 @@ class SimpleTaskManager:
         try:
             notification_id = f"notif_{task_id}_{int(datetime.now().timestamp())}"
             
-            # Sử dụng connection riêng để tránh lock
-            import sqlite3
-            conn = sqlite3.connect(self.db.db_path)
-            cursor = conn.cursor()
-            
-            query = """
-            INSERT INTO notifications 
-            (notification_id, task_id, event_id, notification_type, 
-            scheduled_time, status, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """
-            
-            params = (
-                notification_id,
-                task_id,
-                event_id,
-                'reminder',
-                notification_time,
-                'pending',
-                datetime.now().isoformat()
-            )
-            
-            cursor.execute(query, params)
-            conn.commit()
-            conn.close()
+            # Connection từ pool (đóng/trả lại kể cả khi lỗi)
+            with self.db.get_connection() as conn:
+                owner_row = conn.execute("SELECT user_id FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+                tz_name = self._user_timezone(owner_row[0] if owner_row else None)
+                formatted_time = self._insert_notification(conn, notification_id, task_id, event_id,
+                                                           notification_time, tz_name)
+                conn.commit()
             
-            print(f"✅ Notification scheduled for {notification_time}")
+            print(f"✅ Notification scheduled for {formatted_time}")
             
         except Exception as e:
             print(f"⚠️  Error scheduling notification: {e}")
             # Không raise exception để không ảnh hưởng đến việc tạo task
 
+    def _insert_notification(self, conn, notification_id: str, task_id: str, event_id: str,
+                             notification_time: str, tz_name: Optional[str] = None) -> str:
+        """
+        Chèn một notification pending (chưa commit), kèm cột epoch
+        
+        Args:
+            conn: Connection đang giữ transaction
+            notification_id: ID notification
+            task_id: ID task
+            event_id: ID event
+            notification_time: Thời điểm gửi (nhiều format, giờ của user)
+            tz_name: Timezone của user (scheduled_epoch là UTC theo zone này)
+            
+        Returns:
+            scheduled_time đã chuẩn hóa (YYYY-MM-DD HH:MM:SS)
+        """
+        # Chuẩn hóa format thời gian (YYYY-MM-DDTHH:MM -> YYYY-MM-DD HH:MM:SS)
+        dt = parse_reminder_time(notification_time)
+        formatted_time = dt.strftime(FIRE_AT_FORMAT) if dt else notification_time
+        created_at = datetime.now()
+        
+        conn.execute("""
+            INSERT INTO notifications 
+            (notification_id, task_id, event_id, notification_type, 
+            scheduled_time, status, created_at, scheduled_epoch, created_at_epoch)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            notification_id,
+            task_id,
+            event_id,
+            'reminder',
+            formatted_time,
+            'pending',
+            created_at.isoformat(),
+            to_epoch(dt or notification_time, tz_name),
+            to_epoch(created_at)
+        ))
+        return formatted_time
+
 # Test function
 def test_simple_task_manager():
     """Test function để kiểm tra SimpleTaskManager hoạt động đúng"""
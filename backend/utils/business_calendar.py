@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+BUSINESS CALENDAR MODULE
+=======================
+
+Mô tả: Lịch ngày làm việc có tính ngày nghỉ lễ (cấu hình trong config.json)
+Cách hoạt động:
+1. Ngày nghỉ = cuối tuần (weekend) + ngày lễ cố định hằng năm (recurring_holidays, 'MM-DD')
+   + ngày lễ theo năm (holidays, 'YYYY-MM-DD', vd: Tết, Giỗ tổ theo âm lịch, ngày nghỉ bù)
+2. working_days ('YYYY-MM-DD') là ngày cuối tuần phải đi làm bù
+3. Mỗi năm được build một lần (lazy): bitmap theo ngày trong năm + mảng
+   ordinal các ngày làm việc đã sắp xếp
+
+Thuật toán chính:
+- is_working_day(): tra bitmap - O(1)
+- next / previous working day: bisect trên mảng ordinal của năm - O(log n)
+- add_working_days(n): bisect để lấy vị trí, cộng chỉ số trong mảng; vượt năm
+  thì trừ số ngày làm việc của cả năm (không duyệt từng ngày)
+
+Hướng dẫn sử dụng:
+1. get_business_calendar() lấy lịch từ config/config.json (section business_calendar)
+2. Hoặc tự tạo BusinessCalendar(holidays=[...], recurring_holidays=[...])
+3. roll() để dời một thời điểm (vd: giờ nhắc) rơi vào ngày nghỉ sang ngày làm việc
+
+Ví dụ:
+    cal = get_business_calendar()
+    cal.is_working_day(date(2025, 9, 2))                # False (Quốc khánh)
+    cal.next_working_day(date(2025, 4, 29))             # date(2025, 5, 5)
+    cal.add_working_days(date(2025, 1, 24), 1)          # date(2025, 2, 3) (qua Tết)
+    cal.roll(datetime(2025, 5, 1, 9, 0), 'previous')    # datetime(2025, 4, 29, 9, 0)
+"""
+
+import os
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+DateLike = Union[date, datetime]
+
+# Thứ 7, Chủ nhật (date.weekday(): 0=Monday, 6=Sunday)
+DEFAULT_WEEKEND = (5, 6)
+
+# Giới hạn số năm tìm kiếm (tránh lặp vô hạn nếu cấu hình nghỉ cả năm)
+_MAX_YEAR_SPAN = 10
+
+_DEFAULT_CONFIG = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'config', 'config.json'
+)
+
+def _as_date(value: DateLike) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+def _parse_day(value) -> date:
+    if isinstance(value, date):
+        return _as_date(value)
+    return datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
+
+class BusinessCalendar:
+    def __init__(self, holidays: Iterable = (), recurring_holidays: Iterable[str] = (),
+                 working_days: Iterable = (), weekend: Iterable[int] = DEFAULT_WEEKEND):
+        """
+        Khởi tạo BusinessCalendar
+
+        Args:
+            holidays: Ngày nghỉ cụ thể ('YYYY-MM-DD' hoặc date)
+            recurring_holidays: Ngày nghỉ cố định hằng năm ('MM-DD')
+            working_days: Ngày cuối tuần làm bù ('YYYY-MM-DD' hoặc date)
+            weekend: Các weekday nghỉ (0=Monday, 6=Sunday)
+        """
+        self.weekend = frozenset(weekend)
+        self.holidays = frozenset(_parse_day(d) for d in holidays)
+        self.recurring_holidays = tuple(
+            (int(md[:2]), int(md[3:5])) for md in (str(v).strip() for v in recurring_holidays)
+        )
+        self.working_days = frozenset(_parse_day(d) for d in working_days)
+        # year -> (bitmap theo ngày trong năm, ordinal các ngày làm việc tăng dần)
+        self._years: Dict[int, Tuple[bytearray, List[int]]] = {}
+
+    @classmethod
+    def from_config(cls, section: Optional[dict]) -> 'BusinessCalendar':
+        """Tạo lịch từ section business_calendar của config (None = chỉ nghỉ cuối tuần)"""
+        section = section or {}
+        return cls(
+            holidays=section.get('holidays', ()),
+            recurring_holidays=section.get('recurring_holidays', ()),
+            working_days=section.get('working_days', ()),
+            weekend=section.get('weekend', DEFAULT_WEEKEND),
+        )
+
+    def _year(self, year: int) -> Tuple[bytearray, List[int]]:
+        """Bitmap + mảng ngày làm việc của một năm (build lần đầu dùng)"""
+        cached = self._years.get(year)
+        if cached is not None:
+            return cached
+
+        first = date(year, 1, 1)
+        days = (date(year + 1, 1, 1) - first).days
+        bitmap = bytearray(1 if (first + timedelta(days=i)).weekday() not in self.weekend else 0
+                           for i in range(days))
+
+        closed = [d for d in self.holidays if d.year == year]
+        for month, day in self.recurring_holidays:
+            try:
+                closed.append(date(year, month, day))
+            except ValueError:
+                # 02-29 ở năm không nhuận
+                continue
+        for d in closed:
+            bitmap[d.timetuple().tm_yday - 1] = 0
+        for d in self.working_days:
+            if d.year == year:
+                bitmap[d.timetuple().tm_yday - 1] = 1
+
+        base = first.toordinal()
+        ordinals = [base + i for i, flag in enumerate(bitmap) if flag]
+        self._years[year] = (bitmap, ordinals)
+        return bitmap, ordinals
+
+    def is_working_day(self, value: DateLike) -> bool:
+        d = _as_date(value)
+        return bool(self._year(d.year)[0][d.timetuple().tm_yday - 1])
+
+    def next_working_day(self, value: DateLike, include_self: bool = False) -> date:
+        """
+        Ngày làm việc kế tiếp (sau value, hoặc chính value nếu include_self và là ngày làm việc)
+        """
+        d = _as_date(value)
+        ordinal = d.toordinal()
+        for year in range(d.year, d.year + _MAX_YEAR_SPAN):
+            ordinals = self._year(year)[1]
+            idx = bisect_left(ordinals, ordinal) if include_self else bisect_right(ordinals, ordinal)
+            if idx < len(ordinals):
+                return date.fromordinal(ordinals[idx])
+        raise ValueError(f"No working day within {_MAX_YEAR_SPAN} years after {d}")
+
+    def previous_working_day(self, value: DateLike, include_self: bool = False) -> date:
+        """
+        Ngày làm việc liền trước (trước value, hoặc chính value nếu include_self và là ngày làm việc)
+        """
+        d = _as_date(value)
+        ordinal = d.toordinal()
+        for year in range(d.year, d.year - _MAX_YEAR_SPAN, -1):
+            ordinals = self._year(year)[1]
+            idx = bisect_right(ordinals, ordinal) if include_self else bisect_left(ordinals, ordinal)
+            if idx > 0:
+                return date.fromordinal(ordinals[idx - 1])
+        raise ValueError(f"No working day within {_MAX_YEAR_SPAN} years before {d}")
+
+    def add_working_days(self, value: DateLike, n: int) -> date:
+        """
+        Cộng n ngày làm việc (n âm = lùi lại); n = 0 trả về chính ngày đó nếu là
+        ngày làm việc, ngược lại ngày làm việc kế tiếp
+
+        Args:
+            value: Ngày gốc
+            n: Số ngày làm việc
+
+        Returns:
+            date
+        """
+        d = _as_date(value)
+        if n == 0:
+            return self.next_working_day(d, include_self=True)
+
+        ordinal = d.toordinal()
+        year = d.year
+        ordinals = self._year(year)[1]
+        step = 1 if n > 0 else -1
+        # idx: vị trí đích trong mảng của năm hiện tại (tính từ ngày làm việc sau / trước d)
+        idx = bisect_right(ordinals, ordinal) + n - 1 if n > 0 else bisect_left(ordinals, ordinal) + n
+        empty_years = 0
+        while not 0 <= idx < len(ordinals):
+            if n > 0:
+                idx -= len(ordinals)
+            year += step
+            ordinals = self._year(year)[1]
+            if n < 0:
+                idx += len(ordinals)
+            # Năm không có ngày làm việc nào liên tiếp quá nhiều -> cấu hình sai
+            empty_years = empty_years + 1 if not ordinals else 0
+            if empty_years >= _MAX_YEAR_SPAN:
+                raise ValueError(f"No working day within {_MAX_YEAR_SPAN} years from {d}")
+        return date.fromordinal(ordinals[idx])
+
+    def count_working_days(self, start: DateLike, end: DateLike) -> int:
+        """Số ngày làm việc trong [start, end)"""
+        start_d, end_d = _as_date(start), _as_date(end)
+        if end_d <= start_d:
+            return 0
+        total = 0
+        for year in range(start_d.year, end_d.year + 1):
+            ordinals = self._year(year)[1]
+            total += (bisect_left(ordinals, end_d.toordinal())
+                      - bisect_left(ordinals, start_d.toordinal()))
+        return total
+
+    def roll(self, value: DateLike, direction: str = 'previous') -> DateLike:
+        """
+        Dời value sang ngày làm việc gần nhất nếu đang rơi vào ngày nghỉ
+        (giữ nguyên giờ nếu value là datetime)
+
+        Args:
+            value: date hoặc datetime
+            direction: 'previous' (nhắc sớm hơn) hoặc 'next'
+
+        Returns:
+            Cùng kiểu với value
+        """
+        d = _as_date(value)
+        if self.is_working_day(d):
+            return value
+        target = self.previous_working_day(d) if direction == 'previous' else self.next_working_day(d)
+        return value + timedelta(days=target.toordinal() - d.toordinal())
+
+_calendars: Dict[str, BusinessCalendar] = {}
+
+def get_business_calendar(config_file: str = _DEFAULT_CONFIG) -> BusinessCalendar:
+    """
+    BusinessCalendar theo section business_calendar của config (cache theo file)
+    Không đọc được config thì dùng lịch chỉ nghỉ cuối tuần.
+    """
+    calendar = _calendars.get(config_file)
+    if calendar is None:
+        try:
+            from utils.config_loader import ConfigLoader
+            section = ConfigLoader(config_file).get_value('business_calendar', {})
+        except Exception as e:
+            print(f"⚠️  Cannot load business calendar from {config_file}: {e}")
+            section = {}
+        calendar = BusinessCalendar.from_config(section)
+        _calendars[config_file] = calendar
+    return calendar
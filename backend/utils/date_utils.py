@@ -21,28 +21,230 @@ Hướng dẫn sử dụng:
 2. Gọi format_date() để format datetime thành string
 3. Gọi calculate_difference() để tính khoảng thời gian
 4. Gọi get_reminder_times() để lấy thời điểm nhắc nhở
+5. Gọi parse_datetime() (hàm module, không cần pytz) để parse chuỗi thời gian
+   lưu trong DB / form: fast path cho các dạng ISO, nhớ format theo nguồn, LRU cache
+6. Gọi reminder_epochs() (deadline đã ở dạng epoch, vd: cột deadline_epoch) hoặc
+   get_reminder_times_bulk(..., as_epochs=True) để tính nhắc nhở cho nhiều deadline
+   một lượt (offsets được compile một lần, mỗi deadline chỉ cần một bisect);
+   chỉ đổi sang datetime ở chỗ thật sự cần hiển thị
+7. Ngày làm việc / ngày lễ: is_working_day(), get_next_working_day(), add_working_days()
+   dùng BusinessCalendar (utils/business_calendar.py, cấu hình business_calendar trong config)
+8. Gọi get_timezone(name) để lấy zone object (resolve một lần cho mỗi tên, dùng chung)
 
 Ví dụ:
     date_utils = DateUtils()
     dt = date_utils.parse_date("2024-01-01 10:00:00")
+    dt = parse_datetime("2025-10-31T12:12", source='scheduler')  # naive, giờ local
+    offsets = compile_reminder_offsets(["1_day_before", "2_hours_before"])
+    per_task = reminder_epochs(deadline_epochs, offsets)         # epoch, nhanh nhất
+    per_task = date_utils.get_reminder_times_bulk(deadlines, offsets)  # datetime
     formatted = date_utils.format_date(dt, "%d/%m/%Y %H:%M")
     diff = date_utils.calculate_difference(dt, datetime.now())
 """
 
+from bisect import bisect_left
 from datetime import datetime, timedelta
-import pytz
-from typing import Optional, List, Dict, Any
+from functools import lru_cache
+import time
+from typing import Optional, List, Dict, Any, Tuple
 import re
 
+from utils.business_calendar import BusinessCalendar, get_business_calendar
+
+DEFAULT_TIMEZONE = "Asia/Ho_Chi_Minh"
+
+# Các format ngoài dạng ISO mà parse_datetime() thử (theo thứ tự)
+DEFAULT_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y",
+    "%d-%m-%Y %H:%M:%S",
+    "%d-%m-%Y %H:%M",
+    "%d-%m-%Y",
+)
+
+# Format khớp gần nhất theo nguồn gọi (thử trước ở lần sau)
+_format_memo: Dict[str, str] = {}
+
+def _parse_iso_fixed(text: str) -> Optional[datetime]:
+    """
+    Fast path cho các dạng ISO cố định độ dài (không gọi strptime):
+    YYYY-MM-DD, YYYY-MM-DD[T ]HH:MM, YYYY-MM-DD[T ]HH:MM:SS, YYYY-MM-DD[T ]HH:MM:SS.ffffff
+    """
+    n = len(text)
+    if n not in (10, 16, 19, 26) or text[4] != '-' or text[7] != '-':
+        return None
+    try:
+        if n == 10:
+            return datetime(int(text[0:4]), int(text[5:7]), int(text[8:10]))
+        if text[10] not in ' T' or text[13] != ':':
+            return None
+        if n == 16:
+            return datetime(int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                            int(text[11:13]), int(text[14:16]))
+        if text[16] != ':':
+            return None
+        if n == 19:
+            return datetime(int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                            int(text[11:13]), int(text[14:16]), int(text[17:19]))
+        if text[19] != '.':
+            return None
+        return datetime(int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                        int(text[11:13]), int(text[14:16]), int(text[17:19]), int(text[20:26]))
+    except ValueError:
+        return None
+
+@lru_cache(maxsize=4096)
+def _parse_text(text: str, formats: Tuple[str, ...], source: str) -> Optional[datetime]:
+    # datetime là immutable nên dùng chung kết quả cache được
+    dt = _parse_iso_fixed(text)
+    if dt is not None:
+        return dt
+
+    memo = _format_memo.get(source)
+    if memo is not None:
+        try:
+            return datetime.strptime(text, memo)
+        except ValueError:
+            pass
+
+    for fmt in formats:
+        if fmt == memo:
+            continue
+        try:
+            dt = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        _format_memo[source] = fmt
+        return dt
+
+    # Dạng ISO khác (có offset, microsecond ngắn, ...)
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return None
+
+_REMINDER_PATTERN = re.compile(r"(\d+)_(day|hour|minute)s?_before")
+_UNIT_SECONDS = {"day": 86400, "hour": 3600, "minute": 60}
+
+@lru_cache(maxsize=256)
+def _reminder_offset_seconds(setting: str) -> Optional[int]:
+    # "2_hours_before" -> 7200 (None nếu không đúng cú pháp)
+    match = _REMINDER_PATTERN.match(setting)
+    if not match:
+        return None
+    return int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+
+def compile_reminder_offsets(reminder_settings) -> Tuple[int, ...]:
+    """
+    Compile danh sách setting nhắc nhở thành bảng offset (giây, tăng dần, không trùng)
+
+    Args:
+        reminder_settings: Danh sách setting (vd: ["1_day_before", "2_hours_before"])
+                           hoặc bảng offset đã compile (trả lại nguyên)
+
+    Returns:
+        Tuple offset giây tăng dần
+    """
+    if isinstance(reminder_settings, tuple) and all(isinstance(o, int) for o in reminder_settings):
+        return reminder_settings
+    offsets = {_reminder_offset_seconds(setting) for setting in reminder_settings}
+    offsets.discard(None)
+    return tuple(sorted(offsets))
+
+def reminder_epochs(deadline_epochs, offsets: Tuple[int, ...], now_epoch: Optional[float] = None) -> List[List[int]]:
+    """
+    Thời điểm nhắc (epoch) còn ở tương lai cho từng deadline - API bulk chính
+
+    Trả về epoch (không tạo datetime): với batch lớn, datetime.fromtimestamp() cho
+    từng thời điểm nhắc tốn nhiều hơn toàn bộ phần bisect, nên chỉ đổi sang
+    datetime ở nơi cần hiển thị.
+
+    Thuật toán:
+    - Nhắc deadline - off còn ở tương lai <=> off < deadline - now, nên với offsets
+      tăng dần các offset hợp lệ là đoạn đầu offsets[:k], k = bisect_left(offsets, deadline - now)
+    - Đảo đoạn đó để các thời điểm nhắc tăng dần
+
+    Args:
+        deadline_epochs: Iterable epoch deadline (None = bỏ qua, trả về [])
+        offsets: Bảng offset từ compile_reminder_offsets()
+        now_epoch: Mốc hiện tại (mặc định: time.time(), tính một lần cho cả batch)
+
+    Returns:
+        List (cùng thứ tự input) các list epoch nhắc nhở tăng dần
+    """
+    now_epoch = time.time() if now_epoch is None else now_epoch
+    result = []
+    for deadline in deadline_epochs:
+        if deadline is None:
+            result.append([])
+            continue
+        k = bisect_left(offsets, deadline - now_epoch)
+        result.append([deadline - off for off in reversed(offsets[:k])])
+    return result
+
+@lru_cache(maxsize=None)
+def get_timezone(name: Optional[str] = None):
+    """
+    Zone pytz theo tên (cache: mỗi tên chỉ resolve một lần cho cả process)
+
+    Args:
+        name: Tên zone IANA (None / rỗng = DEFAULT_TIMEZONE)
+
+    Returns:
+        pytz timezone; tên không hợp lệ -> DEFAULT_TIMEZONE
+    """
+    import pytz
+    try:
+        return pytz.timezone(name or DEFAULT_TIMEZONE)
+    except pytz.UnknownTimeZoneError:
+        print(f"⚠️  Unknown timezone '{name}', using {DEFAULT_TIMEZONE}")
+        return pytz.timezone(DEFAULT_TIMEZONE)
+
+def parse_datetime(value: Any, source: str = 'default',
+                   formats: Tuple[str, ...] = DEFAULT_FORMATS) -> Optional[datetime]:
+    """
+    Parse chuỗi thời gian (None nếu rỗng / không hợp lệ)
+
+    Thuật toán:
+    1. Dạng ISO cố định độ dài ('T' hoặc space) -> cắt chuỗi, không dùng strptime
+    2. Thử format đã khớp lần trước của cùng source
+    3. Thử lần lượt formats (nhớ format khớp), cuối cùng datetime.fromisoformat
+    Kết quả được LRU cache theo (chuỗi, formats, source).
+
+    Args:
+        value: str hoặc datetime
+        source: Tên nơi gọi (memo format riêng cho từng nguồn dữ liệu)
+        formats: Các format strptime cần thử
+
+    Returns:
+        datetime (naive = giờ local, aware nếu chuỗi có offset) hoặc None
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value
+    text = str(value).strip()
+    if not text:
+        return None
+    return _parse_text(text, tuple(formats), source)
+
 class DateUtils:
-    def __init__(self, default_timezone: str = "Asia/Ho_Chi_Minh"):
+    def __init__(self, default_timezone: str = DEFAULT_TIMEZONE,
+                 business_calendar: Optional[BusinessCalendar] = None):
         """
         Khởi tạo DateUtils
         
         Args:
             default_timezone: Timezone mặc định
+            business_calendar: Lịch ngày làm việc (mặc định: theo config/config.json)
         """
-        self.default_timezone = pytz.timezone(default_timezone)
+        # Zone được cache theo tên (không resolve lại mỗi lần khởi tạo)
+        self.default_timezone = get_timezone(default_timezone)
+        self.business_calendar = business_calendar or get_business_calendar()
         self.supported_formats = [
             "%Y-%m-%d %H:%M:%S",
             "%Y-%m-%d %H:%M",
@@ -81,13 +283,12 @@ class DateUtils:
             except ValueError:
                 raise ValueError(f"Cannot parse '{date_string}' with format '{format}'")
         
-        # Bước 2: Thử tất cả supported formats
-        for fmt in self.supported_formats:
-            try:
-                dt = datetime.strptime(date_string, fmt)
-                return self.default_timezone.localize(dt)
-            except ValueError:
-                continue
+        # Bước 2: Thử tất cả supported formats (fast path ISO + memo format + cache)
+        dt = parse_datetime(date_string, source='DateUtils', formats=tuple(self.supported_formats))
+        if dt is not None:
+            if dt.tzinfo is not None:
+                return dt.astimezone(self.default_timezone)
+            return self.default_timezone.localize(dt)
         
         # Bước 3: Nếu tất cả đều fail
         raise ValueError(f"Cannot parse date string: '{date_string}'. Supported formats: {self.supported_formats}")
@@ -197,19 +398,62 @@ class DateUtils:
         Returns:
             List các thời điểm nhắc nhở
         """
-        reminder_times = []
+        return self.get_reminder_times_bulk([deadline], reminder_settings)[0]
+    
+    def get_reminder_times_bulk(self, deadlines, reminder_settings, now: Optional[datetime] = None,
+                                skip_holidays: bool = False, as_epochs: bool = False) -> List[List[Any]]:
+        """
+        Tính thời điểm nhắc nhở cho nhiều deadline một lượt
+        
+        Thuật toán:
+        1. Compile reminder_settings một lần thành bảng offset (giây)
+        2. Đổi mỗi deadline sang epoch một lần (naive = timezone mặc định)
+        3. reminder_epochs(): một bisect trên bảng offset cho mỗi deadline
+        4. Đổi kết quả về datetime theo timezone mặc định (bỏ qua nếu as_epochs)
+        5. skip_holidays: nhắc rơi vào ngày nghỉ được dời về ngày làm việc liền trước
+           (cùng giờ), bỏ nếu đã qua; trùng nhau thì giữ một
         
-        for setting in reminder_settings:
-            # Parse setting thành timedelta
-            delta = self._parse_reminder_setting(setting)
-            if delta:
-                reminder_time = deadline - delta
-                
-                # Chỉ thêm nếu chưa qua
-                if reminder_time > datetime.now(self.default_timezone):
-                    reminder_times.append(reminder_time)
+        Bước 4 (datetime.fromtimestamp cho từng thời điểm nhắc) chiếm phần lớn thời
+        gian với batch lớn: dùng as_epochs=True (hoặc gọi thẳng reminder_epochs())
+        khi không cần datetime.
         
-        return sorted(reminder_times)
+        Args:
+            deadlines: Danh sách deadline (datetime, chuỗi thời gian hoặc epoch; None được bỏ qua)
+            reminder_settings: Danh sách setting hoặc bảng offset từ compile_reminder_offsets()
+            now: Mốc hiện tại (mặc định: bây giờ)
+            skip_holidays: Dời nhắc khỏi ngày nghỉ theo business_calendar
+            as_epochs: Trả về epoch giây thay vì datetime
+            
+        Returns:
+            List (cùng thứ tự deadlines) các list thời điểm nhắc nhở tăng dần
+        """
+        offsets = compile_reminder_offsets(reminder_settings)
+        now_epoch = self._to_epoch(now) if now is not None else time.time()
+        per_deadline = reminder_epochs((self._to_epoch(d) for d in deadlines), offsets, now_epoch)
+        if as_epochs and not skip_holidays:
+            return per_deadline
+        tz = self.default_timezone
+        result = [[datetime.fromtimestamp(e, tz) for e in epochs] for epochs in per_deadline]
+        if skip_holidays:
+            calendar = self.business_calendar
+            result = [
+                sorted({r for r in (calendar.roll(t, 'previous') for t in times) if r.timestamp() > now_epoch})
+                for times in result
+            ]
+            if as_epochs:
+                result = [[int(t.timestamp()) for t in times] for times in result]
+        return result
+    
+    def _to_epoch(self, value) -> Optional[float]:
+        """datetime / chuỗi / epoch -> epoch giây (naive = timezone mặc định)"""
+        if value is None or isinstance(value, (int, float)):
+            return value
+        dt = parse_datetime(value, source='DateUtils', formats=tuple(self.supported_formats))
+        if dt is None:
+            return None
+        if dt.tzinfo is None:
+            dt = self.default_timezone.localize(dt)
+        return dt.timestamp()
     
     def _parse_reminder_setting(self, setting: str) -> Optional[timedelta]:
         """
@@ -221,24 +465,8 @@ class DateUtils:
         Returns:
             timedelta object hoặc None
         """
-        # Regex để parse setting
-        pattern = r"(\d+)_(day|hour|minute)s?_before"
-        match = re.match(pattern, setting)
-        
-        if not match:
-            return None
-        
-        value = int(match.group(1))
-        unit = match.group(2)
-        
-        if unit == "day":
-            return timedelta(days=value)
-        elif unit == "hour":
-            return timedelta(hours=value)
-        elif unit == "minute":
-            return timedelta(minutes=value)
-        
-        return None
+        seconds = _reminder_offset_seconds(setting)
+        return timedelta(seconds=seconds) if seconds is not None else None
     
     def is_working_day(self, dt: datetime) -> bool:
         """
@@ -250,8 +478,8 @@ class DateUtils:
         Returns:
             True nếu là ngày làm việc
         """
-        # Thứ 2-6 là ngày làm việc (0=Monday, 6=Sunday)
-        return dt.weekday() < 5
+        # Cuối tuần + ngày lễ theo business_calendar (tra bitmap)
+        return self.business_calendar.is_working_day(dt)
     
     def get_next_working_day(self, dt: datetime) -> datetime:
         """
@@ -263,10 +491,22 @@ class DateUtils:
         Returns:
             Ngày làm việc tiếp theo
         """
-        next_day = dt + timedelta(days=1)
-        while not self.is_working_day(next_day):
-            next_day += timedelta(days=1)
-        return next_day
+        target = self.business_calendar.next_working_day(dt)
+        return dt + timedelta(days=target.toordinal() - dt.toordinal())
+    
+    def add_working_days(self, dt: datetime, days: int) -> datetime:
+        """
+        Cộng (hoặc trừ, nếu days âm) số ngày làm việc, giữ nguyên giờ
+        
+        Args:
+            dt: datetime object
+            days: Số ngày làm việc
+            
+        Returns:
+            datetime sau khi cộng
+        """
+        target = self.business_calendar.add_working_days(dt, days)
+        return dt + timedelta(days=target.toordinal() - dt.toordinal())
 
 # Test function
 def test_date_utils():
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+EPOCH UTILS MODULE
+=================
+
+Mô tả: Cột epoch (INTEGER, giây UTC) song song với các cột thời gian TEXT
+       của tasks / calendar_events / notifications
+Cách hoạt động:
+1. Các cột TEXT cũ giữ nguyên (nhiều format: ISO có 'T', có/không giây, có microsecond)
+2. Mỗi cột có một cột *_epoch INTEGER được ghi cùng lúc ở write path
+3. So sánh / range scan dùng cột epoch (đúng thứ tự thời gian, dùng được index)
+4. Migration 011 backfill dữ liệu cũ theo lô (stream theo rowid)
+
+Thuật toán chính:
+- parse_db_time(): dùng parse_datetime() của date_utils (fast path ISO, memo format, LRU)
+- Thời điểm do user nhập (deadline, scheduled_time, thời điểm nhắc) là giờ theo
+  timezone của user: to_epoch(value, tz_name) localize bằng zone đã cache (get_timezone)
+- Thời điểm do server sinh (created_at, sent_at) là giờ local của server: to_epoch(value)
+- Giá trị có offset được đổi đúng sang UTC
+- User đổi timezone: rebase_user_epochs() tính lại epoch các dòng của user theo lô
+- Backfill keyset theo rowid, executemany mỗi lô, commit theo lô
+
+Hướng dẫn sử dụng:
+1. to_epoch(value) khi ghi một cột thời gian
+2. epoch_params(table, values) để lấy các cặp (cột epoch, giá trị) cho INSERT/UPDATE
+3. backfill_epoch_columns(conn, table) cho dữ liệu cũ
+4. rebase_user_epochs(conn, user_id, tz_name) khi timezone của user thay đổi
+
+Ví dụ:
+    to_epoch('2025-10-17T23:45')           # -> 1760719500 (server ở Asia/Ho_Chi_Minh)
+    to_epoch('2025-10-17 23:45:00')        # -> cùng giá trị
+    epoch_params('tasks', {'deadline': '2025-10-20T17:00'})  # -> {'deadline_epoch': ...}
+    to_epoch('2025-10-17T23:45', 'Asia/Tokyo')  # -> 1760712300
+"""
+
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from utils.date_utils import DEFAULT_TIMEZONE, get_timezone, parse_datetime
+
+# Cột TEXT -> cột epoch theo bảng
+EPOCH_COLUMNS = {
+    'tasks': {
+        'deadline': 'deadline_epoch',
+        'created_at': 'created_at_epoch',
+    },
+    'calendar_events': {
+        'deadline': 'deadline_epoch',
+        'created_at': 'created_at_epoch',
+    },
+    'notifications': {
+        'scheduled_time': 'scheduled_epoch',
+        'sent_at': 'sent_at_epoch',
+        'created_at': 'created_at_epoch',
+    },
+}
+
+# Cột giờ do user nhập (theo timezone của user) - các cột còn lại là giờ server
+USER_TIME_COLUMNS = {'deadline', 'scheduled_time'}
+
+# Số dòng mỗi lô khi backfill
+_BACKFILL_BATCH = 1000
+
+def parse_db_time(value: Any) -> Optional[datetime]:
+    """
+    Parse giá trị thời gian lưu trong DB (None nếu rỗng / không hợp lệ)
+
+    Args:
+        value: str nhiều format hoặc datetime
+
+    Returns:
+        datetime (naive = giờ local, hoặc aware nếu chuỗi có offset)
+    """
+    return parse_datetime(value, source='epoch_utils')
+
+def to_epoch(value: Any, tz_name: Optional[str] = None) -> Optional[int]:
+    """
+    Giá trị thời gian -> epoch giây (UTC), None nếu không parse được
+
+    Args:
+        value: str / datetime
+        tz_name: Timezone của giá trị naive (None = giờ local của server)
+    """
+    dt = parse_db_time(value)
+    if dt is None:
+        return None
+    if tz_name and dt.tzinfo is None:
+        dt = get_timezone(tz_name).localize(dt)
+    return int(dt.timestamp())
+
+def user_timezones(conn: sqlite3.Connection, user_ids: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """
+    Timezone (setting global 'timezone', giá trị mới nhất) của các user trong một query
+
+    Args:
+        conn: Connection database
+        user_ids: Danh sách user (None = mọi user có setting)
+
+    Returns:
+        {user_id: tz_name} - user không có setting thì không có trong dict
+    """
+    where, params = "", []
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        where = f" AND user_id IN ({','.join('?' * len(user_ids))})"
+        params = user_ids
+    try:
+        rows = conn.execute(f"""
+            SELECT user_id, setting_value FROM user_settings
+            WHERE setting_key = 'timezone' AND (tool_id IS NULL OR tool_id = 'None'){where}
+            ORDER BY updated_at
+        """, params).fetchall()
+    except sqlite3.OperationalError:
+        # Chưa có bảng user_settings
+        return {}
+    # ORDER BY updated_at tăng dần -> giá trị mới nhất ghi đè giá trị cũ
+    return {row[0]: row[1] for row in rows if row[1]}
+
+def epoch_params(table: str, values: Dict[str, Any], tz_name: Optional[str] = None) -> Dict[str, Optional[int]]:
+    """
+    Các cột epoch tương ứng với các cột thời gian có trong values
+
+    Args:
+        table: Tên bảng (key của EPOCH_COLUMNS)
+        values: {cột: giá trị} sắp ghi
+        tz_name: Timezone của user (áp dụng cho USER_TIME_COLUMNS)
+
+    Returns:
+        {cột_epoch: epoch}
+    """
+    return {
+        epoch_col: to_epoch(values[text_col], tz_name if text_col in USER_TIME_COLUMNS else None)
+        for text_col, epoch_col in EPOCH_COLUMNS[table].items()
+        if text_col in values
+    }
+
+def ensure_epoch_columns(conn: sqlite3.Connection, table: str) -> list:
+    """Thêm các cột epoch còn thiếu vào bảng (bỏ qua nếu bảng chưa có)"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+    if not existing:
+        return []
+    added = []
+    for text_col, epoch_col in EPOCH_COLUMNS[table].items():
+        if text_col in existing and epoch_col not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {epoch_col} INTEGER")
+            added.append(epoch_col)
+    return added
+
+def backfill_epoch_columns(conn: sqlite3.Connection, table: str, batch_size: int = _BACKFILL_BATCH,
+                           only_missing: bool = True, commit_each_batch: bool = True) -> int:
+    """
+    Tính cột epoch cho dữ liệu cũ, từng lô theo rowid (không nạp cả bảng vào bộ nhớ)
+
+    Args:
+        conn: Connection database
+        table: Tên bảng
+        batch_size: Số dòng mỗi lô
+        only_missing: Chỉ tính dòng có cột epoch đang NULL
+        commit_each_batch: Commit sau mỗi lô (giữ transaction / WAL nhỏ)
+
+    Returns:
+        Số dòng đã cập nhật
+    """
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+    pairs = [(t, e) for t, e in EPOCH_COLUMNS[table].items() if t in existing and e in existing]
+    if not pairs:
+        return 0
+
+    text_cols = ", ".join(t for t, _ in pairs)
+    set_sql = ", ".join(f"{e} = ?" for _, e in pairs)
+    missing_sql = " OR ".join(f"({e} IS NULL AND {t} IS NOT NULL AND {t} != '')" for t, e in pairs)
+    where_missing = f" AND ({missing_sql})" if only_missing else ""
+
+    updated = 0
+    last_rowid = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT rowid, {text_cols} FROM {table} WHERE rowid > ?{where_missing} ORDER BY rowid LIMIT ?",
+            (last_rowid, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        conn.executemany(
+            f"UPDATE {table} SET {set_sql} WHERE rowid = ?",
+            [tuple(to_epoch(v) for v in row[1:]) + (row[0],) for row in rows]
+        )
+        updated += len(rows)
+        last_rowid = rows[-1][0]
+        if commit_each_batch:
+            conn.commit()
+    return updated
+
+# Các dòng có giờ do user nhập: (SELECT rowid, giá trị theo user, UPDATE cột epoch)
+_USER_EPOCH_SOURCES = (
+    ("SELECT rowid, deadline FROM tasks WHERE user_id = ? AND rowid > ? ORDER BY rowid LIMIT ?",
+     "UPDATE tasks SET deadline_epoch = ? WHERE rowid = ?"),
+    ("SELECT rowid, deadline FROM calendar_events WHERE user_id = ? AND rowid > ? ORDER BY rowid LIMIT ?",
+     "UPDATE calendar_events SET deadline_epoch = ? WHERE rowid = ?"),
+    ("""SELECT n.rowid, n.scheduled_time FROM notifications n
+        JOIN tasks t ON t.task_id = n.task_id
+        WHERE t.user_id = ? AND n.status = 'pending' AND n.rowid > ? ORDER BY n.rowid LIMIT ?""",
+     "UPDATE notifications SET scheduled_epoch = ? WHERE rowid = ?"),
+    ("SELECT rowid, fire_at FROM task_reminder_slots WHERE user_id = ? AND rowid > ? ORDER BY rowid LIMIT ?",
+     "UPDATE task_reminder_slots SET fire_at_epoch = ? WHERE rowid = ?"),
+)
+
+def rebase_user_epochs(conn: sqlite3.Connection, user_id: str, tz_name: Optional[str],
+                       batch_size: int = _BACKFILL_BATCH) -> int:
+    """
+    Tính lại epoch các giờ do user nhập (deadline, notification pending, thời điểm nhắc)
+    theo timezone tz_name - gọi khi user đổi timezone. Không commit.
+
+    Args:
+        conn: Connection database
+        user_id: ID user
+        tz_name: Timezone mới của user (None = DEFAULT_TIMEZONE)
+        batch_size: Số dòng mỗi lô
+
+    Returns:
+        Số dòng đã cập nhật
+    """
+    tz_name = tz_name or DEFAULT_TIMEZONE
+    updated = 0
+    for select_sql, update_sql in _USER_EPOCH_SOURCES:
+        last_rowid = 0
+        while True:
+            try:
+                rows = conn.execute(select_sql, (user_id, last_rowid, batch_size)).fetchall()
+            except sqlite3.OperationalError:
+                # Bảng / cột chưa có (chưa chạy migration)
+                break
+            if not rows:
+                break
+            batch = [(to_epoch(row[1], tz_name), row[0]) for row in rows]
+            # fire_at_epoch NOT NULL: bỏ dòng không parse được
+            conn.executemany(update_sql, [b for b in batch if b[0] is not None])
+            updated += len(rows)
+            last_rowid = rows[-1][0]
+    return updated
@@ -10,6 +10,8 @@ import json
 import os
 from pathlib import Path
 
+from shared.auth.effective_permissions import refresh_effective_access
+
 # Lấy đường dẫn database từ config
 config_path = Path(__file__).parent / "config" / "config.json"
 with open(config_path, 'r', encoding='utf-8') as f:
@@ -56,6 +58,9 @@ if members_in_member_group:
     cursor.execute("DELETE FROM user_group_memberships WHERE group_id = 'member'")
     deleted = cursor.rowcount
     print(f"   ✅ Đã xóa {deleted} memberships với group 'member'")
+
+    # Cập nhật quyền hiệu lực của các user vừa đổi group
+    refresh_effective_access(conn, user_ids=[row['user_id'] for row in members_in_member_group])
 else:
     print("   ✅ Không có users trong group 'member'")
 
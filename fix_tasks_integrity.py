@@ -67,6 +67,12 @@ if tasks_no_user:
         cursor.execute(f"DELETE FROM calendar_events WHERE task_id IN ({placeholders})", task_ids)
         deleted_events = cursor.rowcount
         
+        # Xóa task_reminder_slots liên quan (nếu đã có bảng)
+        try:
+            cursor.execute(f"DELETE FROM task_reminder_slots WHERE task_id IN ({placeholders})", task_ids)
+        except sqlite3.OperationalError:
+            pass
+        
         # Xóa tasks
         cursor.execute(f"DELETE FROM tasks WHERE task_id IN ({placeholders})", task_ids)
         deleted_tasks = cursor.rowcount
@@ -109,6 +115,16 @@ if tasks_no_user:
                 """, [selected_user_id] + task_ids)
                 updated_events = cursor.rowcount
                 
+                # Gán user_id cho task_reminder_slots tương ứng (nếu đã có bảng)
+                try:
+                    cursor.execute(f"""
+                        UPDATE task_reminder_slots
+                        SET user_id = ?
+                        WHERE task_id IN ({placeholders})
+                    """, [selected_user_id] + task_ids)
+                except sqlite3.OperationalError:
+                    pass
+                
                 conn.commit()
                 print(f"   ✅ Đã gán user_id '{selected_user_id}' cho:")
                 print(f"      - {updated_tasks} tasks")
@@ -46,15 +46,20 @@ sys.path.append(backend_dir)
 # Import backend modules
 from core.database_manager import DatabaseManager
 from task_management.simple_task_manager import SimpleTaskManager
+from task_management.reminder_report import ReminderReport
 from notifications.telegram_notifier import TelegramNotifier
 from notifications.notification_scheduler import NotificationScheduler
 from utils.config_loader import ConfigLoader
+from utils.date_utils import DEFAULT_TIMEZONE
+from utils.epoch_utils import rebase_user_epochs
 
 # Import Firebase Auth (sau khi thêm module)
 from auth.firebase_auth import FirebaseAuth
 
 from shared.middleware.auth_middleware import require_login, require_tool_access, require_permission
-from shared.database.user_settings_manager import UserSettingsManager
+from shared.middleware.auth_middleware import get_effective_access
+from shared.database.user_settings_manager import CachedUserSettingsManager
+from shared.database.connection_pool import get_pool
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -100,9 +105,19 @@ db = DatabaseManager(db_path)
 
 app.config["DB_PATH"] = db_path
 
+def get_db_connection(row_factory=None):
+    """Mượn connection từ pool dùng chung (dùng với `with`, tự commit/trả lại pool)"""
+    return get_pool(app.config.get("DB_PATH", "database/calendar_tools.db")).connection(row_factory=row_factory)
+
 # Initialize task manager
 task_manager = SimpleTaskManager(db)
 
+# Số tasks mỗi trang của /tasks (các trang sau tải qua /api/tasks/page)
+TASKS_PAGE_SIZE = 50
+
+# Báo cáo /reports/tasks (slot nhắc theo khoảng thời gian, phân trang keyset)
+reminder_report = ReminderReport(db, page_size=100)
+
 # Initialize Telegram notifier
 try:
     if config:
@@ -159,6 +174,7 @@ def require_login(f):
     return decorated_function
 
 from shared.auth.permission_checker import PermissionChecker
+from shared.auth.effective_permissions import refresh_effective_access
 @app.context_processor
 def inject_perms_and_tools():
     """Inject permissions và tools menu vào templates"""
@@ -167,33 +183,19 @@ def inject_perms_and_tools():
     # Initialize result dict
     result = {}
     
-    # Load tools menu nếu user đã login
+    # Load tools menu nếu user đã login (một query JOIN, cache tới khi quyền/tools đổi)
     tools_menu = []
     if uid:
         try:
-            conn = sqlite3.connect(app.config.get("DB_PATH", "database/calendar_tools.db"))
-            conn.row_factory = sqlite3.Row
-            
-            # Get active tools
-            tools = conn.execute("""
-                SELECT tool_id, tool_name, icon, base_url 
-                FROM tools 
-                WHERE is_active = 1 
-                ORDER BY tool_name
-            """).fetchall()
-            
-            # Check user access
             pc = PermissionChecker(app.config.get("DB_PATH", "database/calendar_tools.db"))
-            for tool in tools:
-                if pc.has_tool_access(uid, tool['tool_id']):
-                    tools_menu.append({
-                        'id': tool['tool_id'],
-                        'name': tool['tool_name'],
-                        'icon': tool['icon'] or 'fas fa-circle',
-                        'url': tool['base_url'] or f'/{tool["tool_id"]}'
-                    })
+            for tool in pc.get_accessible_tools(uid):
+                tools_menu.append({
+                    'id': tool['tool_id'],
+                    'name': tool['tool_name'],
+                    'icon': tool['icon'] or 'fas fa-circle',
+                    'url': tool['base_url'] or f'/{tool["tool_id"]}'
+                })
             
-            conn.close()
         except Exception as e:
             print(f"⚠️ Error loading tools menu: {e}")
     
@@ -203,10 +205,9 @@ def inject_perms_and_tools():
     if not uid:
         result.update(dict(can=lambda p: False, is_admin=lambda: False))
     else:
-        pc = PermissionChecker(app.config.get("DB_PATH", "database/calendar_tools.db"))
-        def can(p): return pc.has_permission(uid, p)
+        def can(p): return p in get_effective_access(uid)['permissions']
         def is_admin():
-            groups = pc.get_user_groups(uid)
+            groups = get_effective_access(uid)['groups']
             return any(g in ('super_admin', 'admin') for g in groups)
         result.update(dict(can=can, is_admin=is_admin))
     
@@ -243,12 +244,11 @@ def login():
                 session['id_token'] = user.get('id_token') or user.get('idToken') or None
 
                 # Upsert hồ sơ user vào bảng users
-                db_path = app.config.get("DB_PATH", "database/calendar_tools.db")
                 uid = user.get('uid') or user.get('localId')
                 email_val = user.get('email', '')
                 display_name = (email_val.split('@')[0] if email_val else uid)
 
-                with sqlite3.connect(db_path) as conn:
+                with get_db_connection() as conn:
                     conn.execute("""
                         INSERT INTO users (user_id, display_name, email, phone_number, created_at, updated_at)
                         VALUES (?, ?, ?, ?, datetime('now'), datetime('now'))
@@ -316,12 +316,11 @@ def register():
             session['id_token'] = user.get('id_token') or user.get('idToken') or None
 
             # Upsert hồ sơ user vào bảng users
-            db_path = app.config.get("DB_PATH", "database/calendar_tools.db")
             uid = user.get('localId') or user.get('uid')
             email_val = user.get('email', '')
             display_name = (email_val.split('@')[0] if email_val else uid)
             
-            with sqlite3.connect(db_path) as conn:
+            with get_db_connection() as conn:
                 conn.execute("""
                     INSERT INTO users (user_id, display_name, email, phone_number, created_at, updated_at)
                     VALUES (?, ?, ?, ?, datetime('now'), datetime('now'))
@@ -334,7 +333,7 @@ def register():
                 conn.commit()
             
             # Assign user to 'user' group
-            with sqlite3.connect(db_path) as conn:
+            with get_db_connection() as conn:
                 conn.execute("""
                     INSERT OR IGNORE INTO user_group_memberships (user_id, group_id)
                     VALUES (?, 'user')
@@ -342,7 +341,7 @@ def register():
                 conn.commit()
             
             # Grant calendar-tools access
-            with sqlite3.connect(db_path) as conn:
+            with get_db_connection() as conn:
                 conn.execute("""
                     INSERT OR IGNORE INTO user_tool_access (user_id, tool_id)
                     VALUES (?, 'calendar-tools')
@@ -355,12 +354,13 @@ def register():
                 'calendar-tools:task.create',
                 'calendar-tools:notification.send'
             ]
-            with sqlite3.connect(db_path) as conn:
+            with get_db_connection() as conn:
                 for perm_id in default_perms:
                     conn.execute("""
                         INSERT OR IGNORE INTO user_permissions (user_id, permission_id)
                         VALUES (?, ?)
                     """, (uid, perm_id))
+                refresh_effective_access(conn, user_ids=[uid])
                 conn.commit()
             
             flash('Đăng ký thành công! Đang chuyển hướng...', 'success')
@@ -425,7 +425,7 @@ def create_simple_task():
 @require_login
 def profile_settings():
     user_id = session.get('user_id')
-    settings_mgr = UserSettingsManager(app.config.get("DB_PATH", "database/calendar_tools.db"))
+    settings_mgr = CachedUserSettingsManager(app.config.get("DB_PATH", "database/calendar_tools.db"))
 
     # Các key global
     global_keys = [
@@ -456,22 +456,22 @@ def profile_settings():
         print(f"🔍 Debug: user_id = {user_id}")
         print(f"🔍 Debug: form data = {dict(request.form)}")
         
-        # Lưu global settings
+        # Gom global settings
+        global_values = {}
         for key in global_keys:
             val = request.form.get(key)
             # xử lý checkbox: nếu không có trong form -> off
             if key in ["notify_via_telegram","notify_via_zalo","notify_via_email",
                     "quiet_hours_enabled","daily_digest_enabled","2fa_enabled"]:
                 val = "1" if request.form.get(key) == "on" else "0"
-            settings_mgr.set_setting(user_id, key, val, tool_id=None)
+            global_values[key] = val
         
         # Đồng bộ display_name, phone_number vào bảng users (luôn sync)
-        db_path = app.config.get("DB_PATH", "database/calendar_tools.db")
         display_name_val = request.form.get('display_name', '').strip()
         phone_number_val = request.form.get('phone_number', '').strip()
 
         # Luôn sync với users table (kể cả empty)
-        with sqlite3.connect(db_path) as conn:
+        with get_db_connection() as conn:
             conn.execute("""
                 UPDATE users 
                 SET display_name = ?,
@@ -486,7 +486,7 @@ def profile_settings():
             conn.commit()
         
         if display_name_val or phone_number_val:
-            with sqlite3.connect(db_path) as conn:
+            with get_db_connection() as conn:
                 # Lấy giá trị hiện tại từ users table
                 user_row = conn.execute("SELECT display_name, phone_number FROM users WHERE user_id = ?", (user_id,)).fetchone()
                 current_display_name = user_row[0] if user_row and user_row[0] else None
@@ -507,22 +507,43 @@ def profile_settings():
                     ))
                     conn.commit()
 
-        # Lưu calendar-tools settings
+        # Gom calendar-tools settings
+        calendar_values = {}
         for key in calendar_keys:
             val = request.form.get(key)
             if key in ["auto_add_telegram_reminder"]:
                 val = "1" if request.form.get(key) == "on" else "0"
-            settings_mgr.set_setting(user_id, key, val, tool_id=calendar_tool_id)
+            calendar_values[key] = val
+
+        previous_timezone = settings_mgr.get_settings_bulk(user_id)[None].get('timezone') or DEFAULT_TIMEZONE
+
+        # Lưu toàn bộ trong một transaction
+        settings_mgr.set_settings_bulk(user_id, {
+            None: global_values,
+            calendar_tool_id: calendar_values,
+        })
+
+        # Chat id / label / kênh / timezone có thể đã đổi -> bỏ profile đã cache
+        notification_scheduler.invalidate_user_profile(user_id)
+        task_manager.profile_cache.invalidate(user_id)
+
+        # Đổi timezone: tính lại epoch (UTC) các giờ user đã nhập, một lần lúc ghi
+        new_timezone = global_values.get('timezone') or DEFAULT_TIMEZONE
+        if new_timezone != previous_timezone:
+            with get_db_connection() as conn:
+                rebased = rebase_user_epochs(conn, user_id, new_timezone)
+                conn.commit()
+            print(f"🌐 Timezone {previous_timezone} -> {new_timezone}: rebased {rebased} rows")
 
         print(f"🔍 Debug: Settings saved successfully")
         flash('Đã lưu cài đặt cá nhân', 'success')
         return redirect(url_for('profile_settings'))
 
-    # GET: load settings hiện tại
+    # GET: load settings hiện tại (một query cho mọi key)
+    all_settings = settings_mgr.get_settings_bulk(user_id)
+
     def get_val(key, tool_id=None, default=""):
-        val = settings_mgr.get_setting(user_id, key, tool_id=tool_id, default=default) or ""
-        print(f"🔍 Debug: get_val({key}, {tool_id}) = {val}")
-        return val
+        return all_settings.get(tool_id, {}).get(key, default) or ""
 
     current = {
         # Global
@@ -587,25 +608,72 @@ def view_tasks():
     """Xem danh sách tasks"""
     try:
         user_id = session.get('user_id')
-        settings_mgr = UserSettingsManager(app.config.get("DB_PATH","database/calendar_tools.db"))
-        notif_labels = []
-        for i in range(1,9):
-            notif_labels.append(settings_mgr.get_setting(user_id, f'notif_label_{i}', tool_id=None, default=f'Thông báo {i}') or f'Thông báo {i}')
+        notif_labels = load_notif_labels(user_id)
+        filters = get_task_filters()
         
-        tasks = task_manager.get_tasks(user_id=user_id)
+        # Trang đầu; các trang sau tải qua /api/tasks/page
+        page = task_manager.get_tasks_page(user_id=user_id, limit=TASKS_PAGE_SIZE, **filters)
+        tasks = page['tasks']
         task_ids = [task['task_id'] for task in tasks]
         task_offsets = load_task_offsets(task_ids)
         
         return render_template('tasks_list_adminlte.html', 
                              tasks=tasks, 
                              notif_labels=notif_labels,
-                             task_offsets=task_offsets)
+                             task_offsets=task_offsets,
+                             start_index=0,
+                             next_cursor=page['next_cursor'],
+                             filters={'q': filters['search'], 'status': filters['status'], 'category': filters['category']})
     except Exception as e:
         print(f"❌ Error getting tasks: {e}")
         import traceback
         traceback.print_exc()
         flash(f'Lỗi lấy danh sách tasks: {str(e)}', 'error')
-        return render_template('tasks_list_adminlte.html', tasks=[], notif_labels=[], task_offsets={})
+        return render_template('tasks_list_adminlte.html', tasks=[], notif_labels=[], task_offsets={},
+                             start_index=0, next_cursor=None, filters={})
+
+@app.route('/api/tasks/page')
+@require_login
+@require_tool_access('calendar-tools')
+@require_permission('calendar-tools:task.view')
+def api_tasks_page():
+    """Trang tasks kế tiếp theo cursor (HTML các dòng bảng + cursor mới)"""
+    try:
+        user_id = session.get('user_id')
+        page = task_manager.get_tasks_page(
+            user_id=user_id,
+            cursor=request.args.get('cursor') or None,
+            limit=TASKS_PAGE_SIZE,
+            **get_task_filters()
+        )
+        tasks = page['tasks']
+        html = render_template('_task_rows.html',
+                               tasks=tasks,
+                               task_offsets=load_task_offsets([t['task_id'] for t in tasks]),
+                               start_index=request.args.get('start', 0, type=int))
+        return jsonify({
+            'status': 'success',
+            'html': html,
+            'count': len(tasks),
+            'next_cursor': page['next_cursor']
+        })
+    except Exception as e:
+        print(f"❌ Error getting tasks page: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def get_task_filters():
+    """Bộ lọc danh sách tasks từ query string (q, status, category)"""
+    return {
+        'search': request.args.get('q', '').strip() or None,
+        'status': request.args.get('status', '').strip() or None,
+        'category': request.args.get('category', '').strip() or None,
+    }
+
+def load_notif_labels(user_id):
+    """Nhãn 8 cột thông báo của user (một query settings)"""
+    settings_mgr = CachedUserSettingsManager(app.config.get("DB_PATH","database/calendar_tools.db"))
+    global_settings = settings_mgr.get_settings_bulk(user_id)[None]
+    return [global_settings.get(f'notif_label_{i}') or f'Thông báo {i}' for i in range(1, 9)]
 
 def load_task_offsets(task_ids):
     """Load offsets từ database"""
@@ -614,15 +682,13 @@ def load_task_offsets(task_ids):
     if not task_ids:
         return {}
     
-    db_path = app.config.get("DB_PATH", "database/calendar_tools.db")
     offsets_map = {}
     
     print(f"🔍 DEBUG load_task_offsets:")
     print(f"  - Querying {len(task_ids)} task IDs")
     
     try:
-        with sqlite3.connect(db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with get_db_connection(sqlite3.Row) as conn:
             placeholders = ','.join(['?'] * len(task_ids))
             query = f"""
                 SELECT task_id, column_name, offset_value
@@ -661,8 +727,7 @@ def load_task_offsets(task_ids):
 def view_task_detail(task_id):
     """Xem chi tiết task"""
     try:
-        tasks = task_manager.get_tasks(user_id=session.get('user_id'))
-        task = next((t for t in tasks if t['task_id'] == task_id), None)
+        task = task_manager.get_task(task_id, user_id=session.get('user_id'), include_notifications=True)
         
         if not task:
             flash('Không tìm thấy task', 'error')
@@ -695,10 +760,8 @@ def update_task_status(task_id):
 @require_permission('calendar-tools:task.view')
 def report_tasks():
     from datetime import datetime, timedelta
-    import sqlite3
 
     user_id = session.get('user_id')
-    db_path = app.config.get("DB_PATH","database/calendar_tools.db")
 
     # Lấy tham số lọc
     days = int(request.args.get('days', 7))  # mặc định 7 ngày tới
@@ -709,88 +772,18 @@ def report_tasks():
     now = datetime.now()
     end = now + timedelta(days=days)
 
-    # Các cột thời điểm thông báo cần xét
-    time_cols = ["notification_time","notif1","notif2","notif3","notif4","notif5","notif6","notif7","notif8"]
-
-    # Điều kiện: cột có giá trị, >= now, <= end
-    win_cond = " OR ".join([
-        f"({c} IS NOT NULL AND {c} != '' AND datetime(replace({c}, 'T',' ')) >= ? AND datetime(replace({c}, 'T',' ')) <= ?)"
-        for c in time_cols
-    ])
-
-    where = ["user_id = ?"]
-    params = [user_id]
-
-    # Bổ sung lọc tùy chọn (đặt trước)
-    if status:
-        where.append("status = ?")
-        params.append(status)
-    if category:
-        where.append("category = ?")
-        params.append(category)
-    if keyword:
-        where.append("(title LIKE ? OR description LIKE ?)")
-        params.extend([f"%{keyword}%", f"%{keyword}%"])
-
-    # Tham số cho các cột notification/time
-    now_s = now.strftime('%Y-%m-%d %H:%M:%S')
-    end_s = end.strftime('%Y-%m-%d %H:%M:%S')
-    for _ in time_cols:
-        params.extend([now_s, end_s])
-
-    sql = f"""
-    SELECT *
-    FROM tasks
-    WHERE {" AND ".join(where)} AND ({win_cond})
-    ORDER BY datetime(replace(COALESCE(notification_time, notif1, notif2, notif3, notif4, notif5, notif6, notif7, notif8), 'T',' ')) ASC
-    LIMIT 500
-    """
-
     # Lấy nhãn 8 cột từ settings (dùng lại như /tasks)
-    settings_mgr = UserSettingsManager(app.config.get("DB_PATH","database/calendar_tools.db"))
-    notif_labels = []
-    for i in range(1,9):
-        lbl = settings_mgr.get_setting(user_id, f'notif_label_{i}', tool_id=None, default=f'Thông báo {i}') or f'Thông báo {i}'
-        notif_labels.append(lbl)
-
-    # Query
-    try:
-        with sqlite3.connect(db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            rows = conn.execute(sql, tuple(params)).fetchall()
-            tasks = [dict(r) for r in rows]
-    except Exception as e:
-        print(f"❌ Report query error: {e}")
-        tasks = []
-
-    from datetime import datetime
-
-    def parse_dt(s):
-        if not s:
-            return None
-        s = str(s).strip().replace('T', ' ')
-        # thử nhiều format phổ biến
-        for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M"):
-            try:
-                return datetime.strptime(s, fmt)
-            except:
-                pass
-        return None
-
-    hit_cols = ["notification_time","notif1","notif2","notif3","notif4","notif5","notif6","notif7","notif8"]
-    now_dt = now
-    end_dt = end
-    urgent_dt = now + timedelta(days=3)
-
-    for t in tasks:
-        t["_hits"] = set()
-        t["_urgent"] = set()
-        for col in hit_cols:
-            dt = parse_dt(t.get(col))
-            if dt and now_dt <= dt <= end_dt:
-                t["_hits"].add(col)
-                if dt <= urgent_dt:
-                    t["_urgent"].add(col)    
+    notif_labels = load_notif_labels(user_id)
+
+    # Slot trong [now, end] từ index epoch; cờ hit / urgent (<= 3 ngày) tính trong SQL
+    page = reminder_report.query(
+        user_id, now, end, now + timedelta(days=3),
+        status=status or None,
+        category=category or None,
+        search=keyword or None,
+        cursor=request.args.get('cursor') or None
+    )
+    tasks = page['tasks']
 
     return render_template('report_tasks_adminlte.html',
                         tasks=tasks,
@@ -798,7 +791,10 @@ def report_tasks():
                         days=days,
                         q=keyword,
                         status=status,
-                        category=category)
+                        category=category,
+                        total=page['total'],
+                        next_cursor=page['next_cursor'],
+                        start_index=request.args.get('start', 0, type=int))
 
 @app.route('/process_notifications')
 def process_notifications():
@@ -820,9 +816,8 @@ def process_notifications():
 def test_notification(task_id):
     """Test gửi thông báo cho task cụ thể"""
     try:
-        # Lấy thông tin task
-        tasks = task_manager.get_tasks()
-        task = next((t for t in tasks if t['task_id'] == task_id), None)
+        # Lấy thông tin task (không lọc theo owner, giống trước)
+        task = task_manager.get_task(task_id)
         
         if not task:
             flash('Không tìm thấy task', 'error')
@@ -944,14 +939,13 @@ def save_task_offsets(task_id, offsets):
     """Lưu offsets vào database"""
     import sqlite3
     
-    db_path = app.config.get("DB_PATH", "database/calendar_tools.db")
     
     print(f"🔍 DEBUG save_task_offsets:")
     print(f"  - task_id: {task_id}")
     print(f"  - offsets: {offsets}")
     
     try:
-        with sqlite3.connect(db_path) as conn:
+        with get_db_connection() as conn:
             # Kiểm tra task_id có tồn tại không
             cursor = conn.execute("SELECT task_id FROM tasks WHERE task_id = ?", (task_id,))
             if not cursor.fetchone():
@@ -1004,8 +998,7 @@ def api_test_notification(task_id):
     try:
         # copy toàn bộ logic từ test_notification ở trên
         # nhưng thay vì flash + redirect, trả về JSON trạng thái
-        tasks = task_manager.get_tasks()
-        task = next((t for t in tasks if t['task_id'] == task_id), None)
+        task = task_manager.get_task(task_id)
         if not task:
             return jsonify(status='error', message='Không tìm thấy task'), 404
         notification = {
@@ -1040,7 +1033,7 @@ def test_telegram():
 
     try:
         # Lấy chat_id từ setting của user hiện tại
-        settings_mgr = UserSettingsManager(app.config.get("DB_PATH", "database/calendar_tools.db"))
+        settings_mgr = CachedUserSettingsManager(app.config.get("DB_PATH", "database/calendar_tools.db"))
         current_user = session.get('user_id')
         chat_id = None
         if current_user:
@@ -1098,14 +1091,7 @@ def calendar_tools_home():
             return redirect(url_for('login'))
         
         # Lấy thống kê từ database (filter theo user_id)
-        tasks = task_manager.get_tasks(user_id=user_id)
-        
-        stats = {
-            'total_tasks': len(tasks),
-            'completed_tasks': len([t for t in tasks if t.get('status') == 'completed']),
-            'pending_tasks': len([t for t in tasks if t.get('status') == 'pending']),
-            'overdue_tasks': len([t for t in tasks if t.get('status') == 'overdue'])
-        }
+        stats = task_manager.get_task_stats(user_id)
         
         return render_template('calendar_tools_home_adminlte.html', stats=stats)
     except Exception as e:
@@ -1119,16 +1105,14 @@ def calendar_tools_home():
 @require_login
 @require_permission('calendar-tools:task.view')
 def admin_list_users():
-    db_path = app.config.get("DB_PATH", "database/calendar_tools.db")
-    conn = sqlite3.connect(db_path); conn.row_factory = sqlite3.Row
-    users = conn.execute("SELECT * FROM users").fetchall()
-    user_infos = []
-    for u in users:
-        # Kiểm tra trả về name/email/sdt hoặc user_id
-        uname = u['display_name'] or u['email'] or u['phone_number'] or u['user_id']
-        perms = [r[0] for r in conn.execute("SELECT permission_id FROM user_permissions WHERE user_id=?", (u['user_id'],))]
-        user_infos.append({'user_id': u['user_id'], 'name': uname, 'perms': perms})
-    conn.close()
+    with get_db_connection(sqlite3.Row) as conn:
+        users = conn.execute("SELECT * FROM users").fetchall()
+        user_infos = []
+        for u in users:
+            # Kiểm tra trả về name/email/sdt hoặc user_id
+            uname = u['display_name'] or u['email'] or u['phone_number'] or u['user_id']
+            perms = [r[0] for r in conn.execute("SELECT permission_id FROM user_permissions WHERE user_id=?", (u['user_id'],))]
+            user_infos.append({'user_id': u['user_id'], 'name': uname, 'perms': perms})
     return render_template('admin_users_adminlte.html', users=user_infos)
 
 @app.route('/admin/groups')
@@ -1136,61 +1120,58 @@ def admin_list_users():
 @require_permission('calendar-tools:task.view')
 def admin_list_groups():
     import sqlite3
-    db_path = app.config.get("DB_PATH", "database/calendar_tools.db")
-    conn = sqlite3.connect(db_path); conn.row_factory = sqlite3.Row
-
-    groups = conn.execute("SELECT group_id, group_name FROM user_groups ORDER BY group_id").fetchall()
-    group_infos = []
-    for g in groups:
-        members = conn.execute("""
-            SELECT m.user_id,
-                    COALESCE(u.display_name, u.email, u.phone_number, m.user_id) AS label,
-                    u.email, u.phone_number
-            FROM user_group_memberships m
-            LEFT JOIN users u ON u.user_id = m.user_id
-            WHERE m.group_id=?
-            ORDER BY label
-        """, (g['group_id'],)).fetchall()
-        member_labels = [
-            (
-                (m['label'] if m['label'] else m['user_id'])
-                + (f" ({m['email']})" if m['email'] else '')
-                + (f" [{m['phone_number']}]" if m['phone_number'] else '')
-            ).strip()
-            for m in members
-            ]
-        group_infos.append({
-            'group_id': g['group_id'],
-            'group_name': g['group_name'],
-            'users': member_labels
-        })
-    conn.close()
+    with get_db_connection(sqlite3.Row) as conn:
+        groups = conn.execute("SELECT group_id, group_name FROM user_groups ORDER BY group_id").fetchall()
+        group_infos = []
+        for g in groups:
+            members = conn.execute("""
+                SELECT m.user_id,
+                        COALESCE(u.display_name, u.email, u.phone_number, m.user_id) AS label,
+                        u.email, u.phone_number
+                FROM user_group_memberships m
+                LEFT JOIN users u ON u.user_id = m.user_id
+                WHERE m.group_id=?
+                ORDER BY label
+            """, (g['group_id'],)).fetchall()
+            member_labels = [
+                (
+                    (m['label'] if m['label'] else m['user_id'])
+                    + (f" ({m['email']})" if m['email'] else '')
+                    + (f" [{m['phone_number']}]" if m['phone_number'] else '')
+                ).strip()
+                for m in members
+                ]
+            group_infos.append({
+                'group_id': g['group_id'],
+                'group_name': g['group_name'],
+                'users': member_labels
+            })
     return render_template('admin_groups_adminlte.html', groups=group_infos)
 
 @app.route('/admin/user/<user_id>/rights', methods=['GET', 'POST'])
 @require_login
 @require_permission('calendar-tools:task.view')  # hoặc quyền admin
 def admin_edit_user_rights(user_id):
-    db_path = app.config.get("DB_PATH", "database/calendar_tools.db")
-    conn = sqlite3.connect(db_path); conn.row_factory = sqlite3.Row
-    # lấy danh sách tool
-    tools = conn.execute("SELECT * FROM tools").fetchall()
-    # lấy danh sách quyền
-    permissions = conn.execute("SELECT * FROM permissions").fetchall()
-    # quyền hiện tại user có (trực tiếp)
-    has_perms = set([r[0] for r in conn.execute("SELECT permission_id FROM user_permissions WHERE user_id=?", (user_id,))])
-    if request.method == "POST":
-        ticked = set(request.form.getlist("perms"))
-        all_perm_ids = set([p["permission_id"] for p in permissions])
-        # Xoá hết quyền cũ
-        conn.execute("DELETE FROM user_permissions WHERE user_id=?", (user_id,))
-        # Thêm lại quyền theo tick
-        for pid in ticked:
-            if pid in all_perm_ids:
-                conn.execute("INSERT OR IGNORE INTO user_permissions (user_id, permission_id) VALUES (?,?)", (user_id, pid))
-        conn.commit()
-        return redirect(url_for('admin_list_users'))
-    conn.close()
+    with get_db_connection(sqlite3.Row) as conn:
+        # lấy danh sách tool
+        tools = conn.execute("SELECT * FROM tools").fetchall()
+        # lấy danh sách quyền
+        permissions = conn.execute("SELECT * FROM permissions").fetchall()
+        # quyền hiện tại user có (trực tiếp)
+        has_perms = set([r[0] for r in conn.execute("SELECT permission_id FROM user_permissions WHERE user_id=?", (user_id,))])
+        if request.method == "POST":
+            ticked = set(request.form.getlist("perms"))
+            all_perm_ids = set([p["permission_id"] for p in permissions])
+            # Xoá hết quyền cũ
+            conn.execute("DELETE FROM user_permissions WHERE user_id=?", (user_id,))
+            # Thêm lại quyền theo tick
+            for pid in ticked:
+                if pid in all_perm_ids:
+                    conn.execute("INSERT OR IGNORE INTO user_permissions (user_id, permission_id) VALUES (?,?)", (user_id, pid))
+            refresh_effective_access(conn, user_ids=[user_id])
+            conn.commit()
+            PermissionChecker.invalidate(user_id)  # quyền đã đổi -> bỏ cache
+            return redirect(url_for('admin_list_users'))
     # group by tool
     tools_by_id = {t['tool_id']: t for t in tools}
     permissions_by_tool = {}
@@ -1202,66 +1183,66 @@ def admin_edit_user_rights(user_id):
 @require_login
 @require_permission('calendar-tools:task.view')  # hoặc quyền admin
 def admin_edit_user_tools(user_id):
-    db_path = app.config.get("DB_PATH", "database/calendar_tools.db")
-    conn = sqlite3.connect(db_path); conn.row_factory = sqlite3.Row
-    tools = conn.execute("SELECT * FROM tools").fetchall()
-    has_tools = set([r[0] for r in conn.execute("SELECT tool_id FROM user_tool_access WHERE user_id=?", (user_id,))])
-    if request.method == "POST":
-        ticked = set(request.form.getlist("tools"))
-        all_tool_ids = set([t["tool_id"] for t in tools])
-        # Xoá cũ
-        conn.execute("DELETE FROM user_tool_access WHERE user_id=?", (user_id,))
-        for tid in ticked:
-            if tid in all_tool_ids:
-                conn.execute("INSERT OR IGNORE INTO user_tool_access (user_id, tool_id) VALUES (?,?)", (user_id, tid))
-        conn.commit()
-        return redirect(url_for('admin_list_users'))
-    conn.close()
+    with get_db_connection(sqlite3.Row) as conn:
+        tools = conn.execute("SELECT * FROM tools").fetchall()
+        has_tools = set([r[0] for r in conn.execute("SELECT tool_id FROM user_tool_access WHERE user_id=?", (user_id,))])
+        if request.method == "POST":
+            ticked = set(request.form.getlist("tools"))
+            all_tool_ids = set([t["tool_id"] for t in tools])
+            # Xoá cũ
+            conn.execute("DELETE FROM user_tool_access WHERE user_id=?", (user_id,))
+            for tid in ticked:
+                if tid in all_tool_ids:
+                    conn.execute("INSERT OR IGNORE INTO user_tool_access (user_id, tool_id) VALUES (?,?)", (user_id, tid))
+            refresh_effective_access(conn, user_ids=[user_id])
+            conn.commit()
+            PermissionChecker.invalidate(user_id)  # quyền đã đổi -> bỏ cache
+            return redirect(url_for('admin_list_users'))
     return render_template('admin_user_tools_matrix_adminlte.html', user_id=user_id, tools=tools, has_tools=has_tools)
 
 @app.route('/admin/group/<group_id>/tools', methods=['GET', 'POST'])
 @require_login
 @require_permission('calendar-tools:task.view')
 def admin_edit_group_tools(group_id):
-    db_path = app.config.get("DB_PATH", "database/calendar_tools.db")
-    conn = sqlite3.connect(db_path); conn.row_factory = sqlite3.Row
-    tools = conn.execute("SELECT * FROM tools").fetchall()
-    has_tools = set([r[0] for r in conn.execute("SELECT tool_id FROM group_tool_access WHERE group_id=?", (group_id,))])
-    if request.method == "POST":
-        ticked = set(request.form.getlist("tools"))
-        all_tool_ids = set([t["tool_id"] for t in tools])
-        conn.execute("DELETE FROM group_tool_access WHERE group_id=?", (group_id,))
-        for tid in ticked:
-            if tid in all_tool_ids:
-                conn.execute("INSERT OR IGNORE INTO group_tool_access (group_id, tool_id) VALUES (?,?)", (group_id, tid))
-        conn.commit()
-        return redirect(url_for('admin_list_groups'))
-    conn.close()
+    with get_db_connection(sqlite3.Row) as conn:
+        tools = conn.execute("SELECT * FROM tools").fetchall()
+        has_tools = set([r[0] for r in conn.execute("SELECT tool_id FROM group_tool_access WHERE group_id=?", (group_id,))])
+        if request.method == "POST":
+            ticked = set(request.form.getlist("tools"))
+            all_tool_ids = set([t["tool_id"] for t in tools])
+            conn.execute("DELETE FROM group_tool_access WHERE group_id=?", (group_id,))
+            for tid in ticked:
+                if tid in all_tool_ids:
+                    conn.execute("INSERT OR IGNORE INTO group_tool_access (group_id, tool_id) VALUES (?,?)", (group_id, tid))
+            refresh_effective_access(conn, group_ids=[group_id])
+            conn.commit()
+            PermissionChecker.invalidate()  # quyền đã đổi -> bỏ cache
+            return redirect(url_for('admin_list_groups'))
     return render_template('admin_group_tools_matrix_adminlte.html', group_id=group_id, tools=tools, has_tools=has_tools)
 
 @app.route('/admin/group/<group_id>/rights', methods=['GET', 'POST'])
 @require_login
 @require_permission('calendar-tools:task.view')  # hoặc quyền admin
 def admin_edit_group_rights(group_id):
-    db_path = app.config.get("DB_PATH", "database/calendar_tools.db")
-    conn = sqlite3.connect(db_path); conn.row_factory = sqlite3.Row
-    # Lấy danh sách tool và perm
-    tools = conn.execute("SELECT * FROM tools").fetchall()
-    permissions = conn.execute("SELECT * FROM permissions").fetchall()
-    # Quyền hiện tại group đang có
-    has_perms = set([r[0] for r in conn.execute("SELECT permission_id FROM group_permissions WHERE group_id=?", (group_id,))])
-    if request.method == "POST":
-        ticked = set(request.form.getlist("perms"))
-        all_perm_ids = set([p["permission_id"] for p in permissions])
-        # Xóa quyền cũ
-        conn.execute("DELETE FROM group_permissions WHERE group_id=?", (group_id,))
-        # Thêm lại quyền theo tick
-        for pid in ticked:
-            if pid in all_perm_ids:
-                conn.execute("INSERT OR IGNORE INTO group_permissions (group_id, permission_id) VALUES (?,?)", (group_id, pid))
-        conn.commit()
-        return redirect(url_for('admin_list_groups'))
-    conn.close()
+    with get_db_connection(sqlite3.Row) as conn:
+        # Lấy danh sách tool và perm
+        tools = conn.execute("SELECT * FROM tools").fetchall()
+        permissions = conn.execute("SELECT * FROM permissions").fetchall()
+        # Quyền hiện tại group đang có
+        has_perms = set([r[0] for r in conn.execute("SELECT permission_id FROM group_permissions WHERE group_id=?", (group_id,))])
+        if request.method == "POST":
+            ticked = set(request.form.getlist("perms"))
+            all_perm_ids = set([p["permission_id"] for p in permissions])
+            # Xóa quyền cũ
+            conn.execute("DELETE FROM group_permissions WHERE group_id=?", (group_id,))
+            # Thêm lại quyền theo tick
+            for pid in ticked:
+                if pid in all_perm_ids:
+                    conn.execute("INSERT OR IGNORE INTO group_permissions (group_id, permission_id) VALUES (?,?)", (group_id, pid))
+            refresh_effective_access(conn, group_ids=[group_id])
+            conn.commit()
+            PermissionChecker.invalidate()  # quyền đã đổi -> bỏ cache
+            return redirect(url_for('admin_list_groups'))
     permissions_by_tool = {}
     for p in permissions:
         permissions_by_tool.setdefault(p["tool_id"], []).append(p)
@@ -1272,39 +1253,38 @@ def admin_edit_group_rights(group_id):
 @require_permission('calendar-tools:task.view')
 def admin_edit_group_members(group_id):
     import sqlite3
-    db_path = app.config.get("DB_PATH", "database/calendar_tools.db")
-    conn = sqlite3.connect(db_path); conn.row_factory = sqlite3.Row
-
-    # Lấy danh sách users (id, display_name, email, phone_number)
-    users = conn.execute("""
-        SELECT user_id, 
-               COALESCE(display_name, '') AS display_name,
-               COALESCE(email, '') AS email,
-               COALESCE(phone_number, '') AS phone_number
-        FROM users
-        ORDER BY COALESCE(display_name, email, phone_number, user_id)
-    """).fetchall()
-
-    # Thành viên hiện có trong nhóm
-    has_users = set(r[0] for r in conn.execute(
-        "SELECT user_id FROM user_group_memberships WHERE group_id=?", (group_id,)
-    ).fetchall())
-
-    if request.method == "POST":
-        ticked = set(request.form.getlist("users"))  # danh sách user_id được tick
-        all_user_ids = set(u["user_id"] for u in users)
-        conn.execute("DELETE FROM user_group_memberships WHERE group_id=?", (group_id,))
-        for uid in ticked:
-            if uid in all_user_ids:
-                conn.execute(
-                    "INSERT OR IGNORE INTO user_group_memberships (user_id, group_id) VALUES (?,?)",
-                    (uid, group_id)
-                )
-        conn.commit()
-        conn.close()
-        return redirect(url_for('admin_list_groups'))
+    with get_db_connection(sqlite3.Row) as conn:
+        # Lấy danh sách users (id, display_name, email, phone_number)
+        users = conn.execute("""
+            SELECT user_id, 
+                   COALESCE(display_name, '') AS display_name,
+                   COALESCE(email, '') AS email,
+                   COALESCE(phone_number, '') AS phone_number
+            FROM users
+            ORDER BY COALESCE(display_name, email, phone_number, user_id)
+        """).fetchall()
+
+        # Thành viên hiện có trong nhóm
+        has_users = set(r[0] for r in conn.execute(
+            "SELECT user_id FROM user_group_memberships WHERE group_id=?", (group_id,)
+        ).fetchall())
+
+        if request.method == "POST":
+            ticked = set(request.form.getlist("users"))  # danh sách user_id được tick
+            all_user_ids = set(u["user_id"] for u in users)
+            conn.execute("DELETE FROM user_group_memberships WHERE group_id=?", (group_id,))
+            for uid in ticked:
+                if uid in all_user_ids:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO user_group_memberships (user_id, group_id) VALUES (?,?)",
+                        (uid, group_id)
+                    )
+            # Thành viên cũ và mới đều bị ảnh hưởng
+            refresh_effective_access(conn, user_ids=has_users | ticked)
+            conn.commit()
+            PermissionChecker.invalidate()  # quyền đã đổi -> bỏ cache
+            return redirect(url_for('admin_list_groups'))
 
-    conn.close()
     return render_template('admin_group_members_matrix_adminlte.html',
                            group_id=group_id, users=users, has_users=has_users)
 
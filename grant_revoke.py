@@ -1,5 +1,7 @@
 import sqlite3, sys
 
+from shared.auth.effective_permissions import refresh_effective_access
+
 db = 'database/calendar_tools.db'
 conn = sqlite3.connect(db)
 cur = conn.cursor()
@@ -7,6 +9,9 @@ cur = conn.cursor()
 action = sys.argv[1] if len(sys.argv) > 1 else None
 
 def done():
+    # Cập nhật quyền hiệu lực + permission_version để web app bỏ cache
+    if action and len(sys.argv) > 2:
+        refresh_effective_access(conn, user_ids=[sys.argv[2]])
     conn.commit(); conn.close()
 
 if action == 'grant_group':
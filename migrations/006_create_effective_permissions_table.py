@@ -0,0 +1,56 @@
+"""
+Migration 006: Tạo bảng quyền hiệu lực đã tính sẵn (user_effective_permissions)
+và bộ đếm permission_version, rồi backfill cho toàn bộ user
+"""
+import sqlite3
+import os
+import sys
+
+# Để import từ shared
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.auth.effective_permissions import rebuild_all
+
+def run_migration(db_path):
+    """Tạo bảng user_effective_permissions + permission_version và tính lại toàn bộ"""
+    try:
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS user_effective_permissions (
+                    user_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (user_id, kind, value)
+                )
+            """)
+
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS permission_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Backfill từ user_permissions / group_permissions / *_tool_access / memberships
+            rebuild_all(conn)
+
+            count = conn.execute("SELECT COUNT(*) FROM user_effective_permissions").fetchone()[0]
+            conn.commit()
+            print(f"✅ Created user_effective_permissions table ({count} rows)")
+            return True
+    except Exception as e:
+        print(f"❌ Error creating table: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'database/calendar_tools.db'
+
+    # Đảm bảo thư mục database tồn tại
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+
+    success = run_migration(db_path)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,48 @@
+"""
+Migration 007: Trigger trên bảng tools tăng permission_version
+(menu tools được cache theo permission_version, xem PermissionChecker.get_accessible_tools)
+"""
+import sqlite3
+import os
+import sys
+
+def run_migration(db_path):
+    """Tạo trigger INSERT / UPDATE / DELETE trên tools"""
+    try:
+        with sqlite3.connect(db_path) as conn:
+            # Đảm bảo có dòng version (migration 006 đã tạo bảng)
+            conn.execute("""
+                INSERT OR IGNORE INTO permission_version (id, version, updated_at)
+                VALUES (1, 0, CURRENT_TIMESTAMP)
+            """)
+
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                conn.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_tools_{event.lower()}_bump_version
+                    AFTER {event} ON tools
+                    BEGIN
+                        UPDATE permission_version
+                        SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = 1;
+                    END
+                """)
+
+            conn.commit()
+            print("✅ Created tools version triggers")
+            return True
+    except Exception as e:
+        print(f"❌ Error creating triggers: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'database/calendar_tools.db'
+
+    # Đảm bảo thư mục database tồn tại
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+
+    success = run_migration(db_path)
+    sys.exit(0 if success else 1)
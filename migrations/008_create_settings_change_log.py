@@ -0,0 +1,54 @@
+"""
+Migration 008: Bảng settings_change_log + trigger trên user_settings
+(cache settings / profile của web app và notification runner poll bảng này để bỏ cache,
+xem CachedUserSettingsManager)
+"""
+import sqlite3
+import os
+import sys
+
+# Số dòng log giữ lại (trigger tự xóa dòng cũ hơn)
+KEEP_ROWS = 10000
+
+def run_migration(db_path):
+    """Tạo bảng settings_change_log và trigger INSERT / UPDATE / DELETE trên user_settings"""
+    try:
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS settings_change_log (
+                    seq INTEGER PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+                conn.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_user_settings_{event.lower()}_log
+                    AFTER {event} ON user_settings
+                    BEGIN
+                        INSERT INTO settings_change_log (user_id) VALUES ({row}.user_id);
+                        DELETE FROM settings_change_log
+                        WHERE seq <= (SELECT MAX(seq) FROM settings_change_log) - {KEEP_ROWS};
+                    END
+                """)
+
+            conn.commit()
+            print("✅ Created settings_change_log table and triggers")
+            return True
+    except Exception as e:
+        print(f"❌ Error creating settings_change_log: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'database/calendar_tools.db'
+
+    # Đảm bảo thư mục database tồn tại
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+
+    success = run_migration(db_path)
+    sys.exit(0 if success else 1)
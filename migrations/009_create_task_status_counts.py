@@ -0,0 +1,82 @@
+"""
+Migration 009: Bảng task_status_counts (số tasks theo user + trạng thái) do trigger
+trên tasks duy trì, dùng cho thống kê dashboard (xem SimpleTaskManager.get_task_stats)
+"""
+import sqlite3
+import os
+import sys
+
+def _bump(row, delta):
+    # Cộng delta vào bộ đếm của (user_id, status) của dòng NEW / OLD
+    return f"""
+        INSERT INTO task_status_counts (user_id, status, count)
+        VALUES (COALESCE({row}.user_id, ''), COALESCE({row}.status, ''), {delta})
+        ON CONFLICT(user_id, status) DO UPDATE SET count = count + ({delta});
+    """
+
+def run_migration(db_path):
+    """Tạo bảng task_status_counts, trigger trên tasks và backfill"""
+    try:
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS task_status_counts (
+                    user_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_id, status)
+                )
+            """)
+
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_tasks_insert_status_count
+                AFTER INSERT ON tasks
+                BEGIN
+                    {_bump('NEW', 1)}
+                END
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_tasks_delete_status_count
+                AFTER DELETE ON tasks
+                BEGIN
+                    {_bump('OLD', -1)}
+                END
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_tasks_update_status_count
+                AFTER UPDATE OF user_id, status ON tasks
+                WHEN OLD.user_id IS NOT NEW.user_id OR OLD.status IS NOT NEW.status
+                BEGIN
+                    {_bump('OLD', -1)}
+                    {_bump('NEW', 1)}
+                END
+            """)
+
+            # Backfill (chạy lại migration thì tính lại từ đầu)
+            conn.execute("DELETE FROM task_status_counts")
+            conn.execute("""
+                INSERT INTO task_status_counts (user_id, status, count)
+                SELECT COALESCE(user_id, ''), COALESCE(status, ''), COUNT(*)
+                FROM tasks
+                GROUP BY COALESCE(user_id, ''), COALESCE(status, '')
+            """)
+
+            total = conn.execute("SELECT COALESCE(SUM(count), 0) FROM task_status_counts").fetchone()[0]
+            conn.commit()
+            print(f"✅ Created task_status_counts table ({total} tasks counted)")
+            return True
+    except Exception as e:
+        print(f"❌ Error creating task_status_counts: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'database/calendar_tools.db'
+
+    # Đảm bảo thư mục database tồn tại
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+
+    success = run_migration(db_path)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,40 @@
+"""
+Migration 010: Bảng task_reminder_slots (thời điểm nhắc đã chuẩn hóa + epoch, index theo
+fire_at_epoch) và view tương thích task_reminder_columns, backfill từ tasks.notif*
+"""
+import sqlite3
+import os
+import sys
+
+# Để import từ backend
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+from task_management.reminder_slots import backfill_reminder_slots, ensure_reminder_slots
+
+def run_migration(db_path):
+    """Tạo task_reminder_slots / view và tính lại toàn bộ từ tasks"""
+    try:
+        with sqlite3.connect(db_path) as conn:
+            # Bảng mới thì ensure đã backfill; bảng có sẵn thì tính lại cho chắc
+            if not ensure_reminder_slots(conn):
+                count = backfill_reminder_slots(conn)
+                print(f"✅ Rebuilt task_reminder_slots ({count} slots)")
+
+            conn.commit()
+            print("✅ task_reminder_slots ready")
+            return True
+    except Exception as e:
+        print(f"❌ Error creating task_reminder_slots: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'database/calendar_tools.db'
+
+    # Đảm bảo thư mục database tồn tại
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+
+    success = run_migration(db_path)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,56 @@
+"""
+Migration 011: Cột epoch INTEGER (UTC) song song với các cột thời gian TEXT của
+tasks / calendar_events / notifications, backfill theo lô và index cho scheduler
+"""
+import sqlite3
+import os
+import sys
+
+# Để import từ backend
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+from utils.epoch_utils import EPOCH_COLUMNS, backfill_epoch_columns, ensure_epoch_columns
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_notifications_status_epoch ON notifications (status, scheduled_epoch)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_user_deadline_epoch ON tasks (user_id, deadline_epoch)",
+]
+
+def run_migration(db_path, batch_size=1000):
+    """Thêm cột *_epoch còn thiếu, backfill từng lô (commit mỗi lô) rồi tạo index"""
+    try:
+        with sqlite3.connect(db_path) as conn:
+            for table in EPOCH_COLUMNS:
+                added = ensure_epoch_columns(conn, table)
+                if added:
+                    print(f"✅ Added {', '.join(added)} to {table}")
+            conn.commit()
+
+            for table in EPOCH_COLUMNS:
+                count = backfill_epoch_columns(conn, table, batch_size=batch_size)
+                print(f"✅ Backfilled {count} rows in {table}")
+
+            for index_query in INDEXES:
+                try:
+                    conn.execute(index_query)
+                except sqlite3.OperationalError as e:
+                    print(f"⚠️  Could not create index: {e}")
+
+            conn.commit()
+            print("✅ Epoch columns ready")
+            return True
+    except Exception as e:
+        print(f"❌ Error adding epoch columns: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'database/calendar_tools.db'
+
+    # Đảm bảo thư mục database tồn tại
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+
+    success = run_migration(db_path)
+    sys.exit(0 if success else 1)
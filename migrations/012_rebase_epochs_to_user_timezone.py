@@ -0,0 +1,47 @@
+"""
+Migration 012: Tính lại các cột epoch của giờ do user nhập (tasks.deadline_epoch,
+calendar_events.deadline_epoch, notifications.scheduled_epoch của dòng pending,
+task_reminder_slots.fire_at_epoch) theo timezone của từng user thay vì giờ server
+"""
+import sqlite3
+import os
+import sys
+
+# Để import từ backend
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+from utils.date_utils import DEFAULT_TIMEZONE
+from utils.epoch_utils import rebase_user_epochs, user_timezones
+
+def run_migration(db_path):
+    """Rebase epoch theo timezone của chủ task (đọc timezone của mọi user một lần)"""
+    try:
+        with sqlite3.connect(db_path) as conn:
+            timezones = user_timezones(conn)
+            owners = [row[0] for row in conn.execute(
+                "SELECT DISTINCT user_id FROM tasks WHERE user_id IS NOT NULL"
+            ).fetchall()]
+
+            total = 0
+            for user_id in owners:
+                total += rebase_user_epochs(conn, user_id, timezones.get(user_id, DEFAULT_TIMEZONE))
+                # Commit theo user để transaction không quá lớn
+                conn.commit()
+
+            print(f"✅ Rebased {total} rows for {len(owners)} users to their timezone")
+            return True
+    except Exception as e:
+        print(f"❌ Error rebasing epochs to user timezone: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'database/calendar_tools.db'
+
+    # Đảm bảo thư mục database tồn tại
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+
+    success = run_migration(db_path)
+    sys.exit(0 if success else 1)
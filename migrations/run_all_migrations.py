@@ -73,8 +73,92 @@ def run_all_migrations():
         print("⚠️ Migration 005 failed, but continuing...")
         # Không raise error vì có thể bảng đã tồn tại
 
+    # Step 6: Materialised effective permissions + permission_version
     print("\n" + "=" * 60)
-    print("✅ ALL MIGRATIONS INCLUDING 005 COMPLETED!")
+    print("STEP 6: Creating user_effective_permissions table...")
+    print("=" * 60)
+    ret6 = subprocess.run([
+        sys.executable,
+        os.path.join(current_dir, '006_create_effective_permissions_table.py'),
+        db_path
+    ])
+    if ret6.returncode != 0:
+        raise SystemExit("Migration 006 failed")
+
+    # Step 7: Tools triggers bump permission_version (invalidate menu cache)
+    print("\n" + "=" * 60)
+    print("STEP 7: Creating tools version triggers...")
+    print("=" * 60)
+    ret7 = subprocess.run([
+        sys.executable,
+        os.path.join(current_dir, '007_add_tools_version_triggers.py'),
+        db_path
+    ])
+    if ret7.returncode != 0:
+        raise SystemExit("Migration 007 failed")
+
+    # Step 8: settings_change_log (bỏ cache settings giữa các process)
+    print("\n" + "=" * 60)
+    print("STEP 8: Creating settings_change_log table...")
+    print("=" * 60)
+    ret8 = subprocess.run([
+        sys.executable,
+        os.path.join(current_dir, '008_create_settings_change_log.py'),
+        db_path
+    ])
+    if ret8.returncode != 0:
+        raise SystemExit("Migration 008 failed")
+
+    # Step 9: task_status_counts (thống kê dashboard)
+    print("\n" + "=" * 60)
+    print("STEP 9: Creating task_status_counts table...")
+    print("=" * 60)
+    ret9 = subprocess.run([
+        sys.executable,
+        os.path.join(current_dir, '009_create_task_status_counts.py'),
+        db_path
+    ])
+    if ret9.returncode != 0:
+        raise SystemExit("Migration 009 failed")
+
+    # Step 10: task_reminder_slots (thời điểm nhắc chuẩn hóa + epoch)
+    print("\n" + "=" * 60)
+    print("STEP 10: Creating task_reminder_slots table...")
+    print("=" * 60)
+    ret10 = subprocess.run([
+        sys.executable,
+        os.path.join(current_dir, '010_create_task_reminder_slots.py'),
+        db_path
+    ])
+    if ret10.returncode != 0:
+        raise SystemExit("Migration 010 failed")
+
+    # Step 11: cột epoch INTEGER cho tasks / calendar_events / notifications
+    print("\n" + "=" * 60)
+    print("STEP 11: Adding epoch columns...")
+    print("=" * 60)
+    ret11 = subprocess.run([
+        sys.executable,
+        os.path.join(current_dir, '011_add_epoch_columns.py'),
+        db_path
+    ])
+    if ret11.returncode != 0:
+        raise SystemExit("Migration 011 failed")
+
+    # Step 12: epoch theo timezone của từng user
+    print("\n" + "=" * 60)
+    print("STEP 12: Rebasing epochs to user timezones...")
+    print("=" * 60)
+    ret12 = subprocess.run([
+        sys.executable,
+        os.path.join(current_dir, '012_rebase_epochs_to_user_timezone.py'),
+        db_path
+    ])
+    if ret12.returncode != 0:
+        raise SystemExit("Migration 012 failed")
+
+    print("\n" + "=" * 60)
+    print("✅ ALL MIGRATIONS INCLUDING 012 COMPLETED!")
     print("=" * 60)
 
 if __name__ == "__main__":
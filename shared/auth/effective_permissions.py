@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Bảng user_effective_permissions: quyền hiệu lực (trực tiếp + qua group) đã tính sẵn
+# của từng user, kèm bộ đếm permission_version để các process biết khi nào cần bỏ cache.
+#
+# Mọi chỗ đổi grants (admin routes, đăng ký, grant_revoke.py) gọi
+# refresh_effective_access(conn, user_ids=..., group_ids=...) trong cùng transaction.
+from typing import Iterable, List, Optional, Set
+import sqlite3
+
+# Số user tối đa mỗi lần rebuild (giới hạn số tham số của câu SQL)
+_CHUNK_SIZE = 100
+
+def _access_select(user_filter: str) -> str:
+    # Các dòng (user_id, kind, value) hiệu lực; user_filter áp vào cột user_id
+    return f"""
+        SELECT user_id, 'group', group_id
+        FROM user_group_memberships WHERE {user_filter.format(col='user_id')}
+        UNION
+        SELECT user_id, 'permission', permission_id
+        FROM user_permissions WHERE {user_filter.format(col='user_id')}
+        UNION
+        SELECT m.user_id, 'permission', gp.permission_id
+        FROM group_permissions gp
+        JOIN user_group_memberships m ON m.group_id = gp.group_id
+        WHERE {user_filter.format(col='m.user_id')}
+        UNION
+        SELECT user_id, 'tool', tool_id
+        FROM user_tool_access WHERE {user_filter.format(col='user_id')}
+        UNION
+        SELECT m.user_id, 'tool', gt.tool_id
+        FROM group_tool_access gt
+        JOIN user_group_memberships m ON m.group_id = gt.group_id
+        WHERE {user_filter.format(col='m.user_id')}
+    """
+
+def has_effective_table(conn: sqlite3.Connection) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_effective_permissions'"
+    ).fetchone()
+    return row is not None
+
+def get_permission_version(conn: sqlite3.Connection) -> Optional[int]:
+    # None nếu chưa chạy migration 006 (chưa có bảng version)
+    try:
+        row = conn.execute("SELECT version FROM permission_version WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else 0
+
+def bump_permission_version(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        INSERT INTO permission_version (id, version, updated_at)
+        VALUES (1, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT(id) DO UPDATE SET
+            version = version + 1,
+            updated_at = CURRENT_TIMESTAMP
+    """)
+
+def load_effective_rows(conn: sqlite3.Connection, user_id: str) -> List[tuple]:
+    # (kind, value) của user; đọc bảng đã tính sẵn nếu có, ngược lại tính trực tiếp
+    if has_effective_table(conn):
+        rows = conn.execute(
+            "SELECT kind, value FROM user_effective_permissions WHERE user_id = ?",
+            (user_id,)
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            f"SELECT * FROM ({_access_select('{col} = :uid')})",
+            {'uid': user_id}
+        ).fetchall()
+        rows = [(r[1], r[2]) for r in rows]
+    return [(r[0], r[1]) for r in rows]
+
+def group_members(conn: sqlite3.Connection, group_ids: Iterable[str]) -> Set[str]:
+    group_ids = list(group_ids)
+    if not group_ids:
+        return set()
+    placeholders = ",".join(["?"] * len(group_ids))
+    rows = conn.execute(
+        f"SELECT DISTINCT user_id FROM user_group_memberships WHERE group_id IN ({placeholders})",
+        group_ids
+    ).fetchall()
+    return {r[0] for r in rows}
+
+def rebuild_users(conn: sqlite3.Connection, user_ids: Iterable[str]) -> int:
+    # Tính lại quyền hiệu lực cho các user (xóa rồi chèn lại, theo chunk)
+    user_ids = sorted({u for u in user_ids if u})
+    for start in range(0, len(user_ids), _CHUNK_SIZE):
+        chunk = user_ids[start:start + _CHUNK_SIZE]
+        params = {f"u{i}": uid for i, uid in enumerate(chunk)}
+        in_list = ",".join(f":u{i}" for i in range(len(chunk)))
+        conn.execute(f"DELETE FROM user_effective_permissions WHERE user_id IN ({in_list})", params)
+        conn.execute(
+            "INSERT OR IGNORE INTO user_effective_permissions (user_id, kind, value) "
+            + _access_select("{col} IN (" + in_list + ")"),
+            params
+        )
+    return len(user_ids)
+
+def rebuild_all(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM user_effective_permissions")
+    conn.execute(
+        "INSERT OR IGNORE INTO user_effective_permissions (user_id, kind, value) "
+        + _access_select("{col} IS NOT NULL")
+    )
+    bump_permission_version(conn)
+
+def refresh_effective_access(conn: sqlite3.Connection, user_ids: Iterable[str] = (),
+                             group_ids: Iterable[str] = ()) -> int:
+    """
+    Cập nhật bảng quyền hiệu lực sau khi đổi grants, rồi tăng permission_version
+
+    Args:
+        conn: Connection đang giữ transaction đổi grants (caller commit)
+        user_ids: User bị đổi quyền / tool / group trực tiếp
+        group_ids: Group bị đổi quyền / tool (mọi thành viên hiện tại được tính lại)
+
+    Returns:
+        Số user đã tính lại (0 nếu chưa chạy migration 006)
+    """
+    if not has_effective_table(conn):
+        return 0
+    affected = set(user_ids) | group_members(conn, group_ids)
+    count = rebuild_users(conn, affected)
+    bump_permission_version(conn)
+    return count
@@ -1,86 +1,146 @@
 # -*- coding: utf-8 -*-
-from typing import List, Optional
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+import os
 import sqlite3
+import threading
+import time
+
+from shared.database.connection_pool import get_pool
+from shared.auth.effective_permissions import get_permission_version, has_effective_table, load_effective_rows
+
+# Cache quyền hiệu lực theo process: (db_path, user_id) -> (version, expires_at, access)
+_access_cache: Dict[Tuple[str, str], Tuple[Optional[int], float, Dict[str, FrozenSet[str]]]] = {}
+_access_lock = threading.Lock()
+
+# Cache menu tools theo process: (db_path, user_id) -> (version, expires_at, tools)
+_tools_cache: Dict[Tuple[str, str], Tuple[Optional[int], float, List[Dict[str, Any]]]] = {}
 
 class PermissionChecker:
+    # Thời gian sống của cache quyền khi chưa có permission_version (giây)
+    cache_ttl = 30
+
     def __init__(self, db_path: str):
         self.db_path = db_path
 
-    def _conn(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+    def _conn(self):
+        # Connection từ pool dùng chung (dùng với `with`, tự commit/trả lại pool)
+        return get_pool(self.db_path).connection(row_factory=sqlite3.Row)
 
-    def get_user_groups(self, user_id: str) -> List[str]:
+    def _cache_key(self, user_id: str) -> Tuple[str, str]:
+        return (os.path.abspath(self.db_path), user_id)
+
+    def get_effective_access(self, user_id: str) -> Dict[str, FrozenSet[str]]:
+        """
+        Toàn bộ groups / permissions / tools hiệu lực của user (trực tiếp + qua group)
+
+        Đọc từ bảng user_effective_permissions (migration 006), cache trong process
+        tới khi permission_version thay đổi. Nếu chưa có bảng thì tính trực tiếp
+        bằng một query và cache theo cache_ttl.
+
+        Returns:
+            {'groups': frozenset, 'permissions': frozenset, 'tools': frozenset}
+        """
+        key = self._cache_key(user_id)
         with self._conn() as conn:
-            rows = conn.execute(
-                "SELECT group_id FROM user_group_memberships WHERE user_id = ?",
-                (user_id,)
-            ).fetchall()
-            return [r["group_id"] for r in rows]
+            version = get_permission_version(conn)
+            with _access_lock:
+                entry = _access_cache.get(key)
+            if entry:
+                cached_version, expires_at, access = entry
+                if version is not None and cached_version == version:
+                    return access
+                if version is None and expires_at > time.monotonic():
+                    return access
 
-    def has_tool_access(self, user_id: str, tool_id: str) -> bool:
+            access = self._build_access(load_effective_rows(conn, user_id))
+
+        with _access_lock:
+            _access_cache[key] = (version, time.monotonic() + self.cache_ttl, access)
+        return access
+
+    def _build_access(self, rows) -> Dict[str, FrozenSet[str]]:
+        sets = {'group': set(), 'permission': set(), 'tool': set()}
+        for kind, value in rows:
+            sets[kind].add(value)
+        return {
+            'groups': frozenset(sets['group']),
+            'permissions': frozenset(sets['permission']),
+            'tools': frozenset(sets['tool']),
+        }
+
+    def get_accessible_tools(self, user_id: str) -> List[Dict[str, Any]]:
+        """
+        Danh sách tools đang active mà user được dùng (cho sidebar menu)
+
+        Một query JOIN tools với quyền hiệu lực; cache tới khi permission_version
+        thay đổi (đổi grants hoặc bảng tools, xem migration 007).
+
+        Returns:
+            List dict: tool_id, tool_name, icon, base_url (sắp theo tool_name)
+        """
+        key = self._cache_key(user_id)
         with self._conn() as conn:
-            # quyền trực tiếp
-            row = conn.execute(
-                "SELECT 1 FROM user_tool_access WHERE user_id = ? AND tool_id = ?",
-                (user_id, tool_id)
-            ).fetchone()
-            if row:
-                return True
-            # quyền qua group
-            groups = self.get_user_groups(user_id)
-            if not groups:
-                return False
-            q = """
-            SELECT 1 FROM group_tool_access
-            WHERE group_id IN ({placeholders}) AND tool_id = ?
-            LIMIT 1
-            """.format(placeholders=",".join(["?"]*len(groups)))
-            row = conn.execute(q, (*groups, tool_id)).fetchone()
-            return bool(row)
+            version = get_permission_version(conn)
+            with _access_lock:
+                entry = _tools_cache.get(key)
+            if entry:
+                cached_version, expires_at, tools = entry
+                if version is not None and cached_version == version:
+                    return tools
+                if version is None and expires_at > time.monotonic():
+                    return tools
+
+            if has_effective_table(conn):
+                rows = conn.execute("""
+                    SELECT t.tool_id, t.tool_name, t.icon, t.base_url
+                    FROM tools t
+                    JOIN user_effective_permissions e
+                        ON e.user_id = ? AND e.kind = 'tool' AND e.value = t.tool_id
+                    WHERE t.is_active = 1
+                    ORDER BY t.tool_name
+                """, (user_id,)).fetchall()
+            else:
+                rows = conn.execute("""
+                    SELECT t.tool_id, t.tool_name, t.icon, t.base_url
+                    FROM tools t
+                    WHERE t.is_active = 1
+                    AND (
+                        EXISTS (SELECT 1 FROM user_tool_access ua
+                                WHERE ua.user_id = :uid AND ua.tool_id = t.tool_id)
+                        OR EXISTS (SELECT 1 FROM group_tool_access gt
+                                   JOIN user_group_memberships m ON m.group_id = gt.group_id
+                                   WHERE m.user_id = :uid AND gt.tool_id = t.tool_id)
+                    )
+                    ORDER BY t.tool_name
+                """, {'uid': user_id}).fetchall()
+            tools = [dict(r) for r in rows]
+
+        with _access_lock:
+            _tools_cache[key] = (version, time.monotonic() + self.cache_ttl, tools)
+        return tools
+
+    @staticmethod
+    def invalidate(user_id: Optional[str] = None):
+        # Xóa cache quyền + menu tools của user (None = toàn bộ), gọi sau khi đổi quyền / group
+        with _access_lock:
+            for cache in (_access_cache, _tools_cache):
+                if user_id is None:
+                    cache.clear()
+                else:
+                    for key in [k for k in cache if k[1] == user_id]:
+                        del cache[key]
+
+    def get_user_groups(self, user_id: str) -> List[str]:
+        return sorted(self.get_effective_access(user_id)['groups'])
+
+    def has_tool_access(self, user_id: str, tool_id: str) -> bool:
+        return tool_id in self.get_effective_access(user_id)['tools']
 
     def has_permission(self, user_id: str, permission_id: str) -> bool:
-        with self._conn() as conn:
-            # quyền trực tiếp
-            row = conn.execute(
-                "SELECT 1 FROM user_permissions WHERE user_id = ? AND permission_id = ?",
-                (user_id, permission_id)
-            ).fetchone()
-            if row:
-                return True
-            # quyền qua group
-            groups = self.get_user_groups(user_id)
-            if not groups:
-                return False
-            q = """
-            SELECT 1 FROM group_permissions
-            WHERE group_id IN ({placeholders}) AND permission_id = ?
-            LIMIT 1
-            """.format(placeholders=",".join(["?"]*len(groups)))
-            row = conn.execute(q, (*groups, permission_id)).fetchone()
-            return bool(row)
+        return permission_id in self.get_effective_access(user_id)['permissions']
 
     def get_user_permissions(self, user_id: str, tool_id: Optional[str] = None) -> List[str]:
-        with self._conn() as conn:
-            # trực tiếp
-            direct = conn.execute(
-                "SELECT permission_id FROM user_permissions WHERE user_id = ?",
-                (user_id,)
-            ).fetchall()
-            direct_ids = [r["permission_id"] for r in direct]
-            # qua group
-            groups = self.get_user_groups(user_id)
-            group_ids: List[str] = []
-            if groups:
-                q = """
-                SELECT gp.permission_id
-                FROM group_permissions gp
-                WHERE gp.group_id IN ({placeholders})
-                """.format(placeholders=",".join(["?"]*len(groups)))
-                rows = conn.execute(q, (*groups,)).fetchall()
-                group_ids = [r["permission_id"] for r in rows]
-            merged = set(direct_ids) | set(group_ids)
-            if tool_id:
-                merged = {pid for pid in merged if pid.startswith(f"{tool_id}:")}
-            return sorted(merged)
\ No newline at end of file
+        merged = self.get_effective_access(user_id)['permissions']
+        if tool_id:
+            merged = {pid for pid in merged if pid.startswith(f"{tool_id}:")}
+        return sorted(merged)
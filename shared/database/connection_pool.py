@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+CONNECTION POOL MODULE
+=====================
+
+Mô tả: Connection pool SQLite dùng chung cho backend, web app và runner
+Cách hoạt động:
+1. Mỗi file database có một pool (get_pool(db_path))
+2. Một thread mượn một connection cho cả khối `with pool.connection()`;
+   các khối lồng nhau trong cùng thread dùng lại đúng connection đó
+3. Ra khỏi khối ngoài cùng: commit (hoặc rollback nếu có lỗi) rồi trả connection về pool
+   Khối lồng nhau chạy trong SAVEPOINT riêng: lỗi chỉ rollback phần của khối đó,
+   conn.commit() bên trong khối lồng nhau không commit sớm công việc của khối ngoài
+4. Connection mới được cấu hình PRAGMA một lần: WAL, synchronous=NORMAL,
+   busy_timeout, cache_size, mmap_size
+
+Thuật toán chính:
+- LIFO queue connection nhàn rỗi + BoundedSemaphore giới hạn tổng số connection
+- threading.local giữ connection đang mượn (reentrant theo thread)
+- Connection subclass (factory của sqlite3.connect): commit()/rollback() trong khối
+  lồng nhau chỉ tác động savepoint hiện tại; executescript() (luôn COMMIT ngầm)
+  bị chặn trong khối lồng nhau
+- Health check (SELECT 1) khi connection nhàn rỗi lâu, lỗi thì đóng và tạo mới
+
+Hướng dẫn sử dụng:
+1. pool = get_pool(db_path)
+2. `with pool.connection() as conn:` (giống `with sqlite3.connect(db_path) as conn:`)
+3. Truyền row_factory=sqlite3.Row nếu cần truy cập cột theo tên
+
+Ví dụ:
+    pool = get_pool('database/calendar_tools.db')
+    with pool.connection(row_factory=sqlite3.Row) as conn:
+        rows = conn.execute("SELECT * FROM users").fetchall()
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,       # ms
+    'cache_size': -16000,       # ~16MB mỗi connection
+    'mmap_size': 134217728,     # 128MB
+    'temp_store': 'MEMORY',
+}
+
+class _PoolConnection(sqlite3.Connection):
+    """Connection của pool: trong khối lồng nhau commit/rollback chỉ tác động savepoint của khối"""
+    savepoint: Optional[str] = None
+
+    def commit(self):
+        # Khối lồng nhau: RELEASE khi ra khỏi khối, khối ngoài cùng commit
+        if self.savepoint is None:
+            super().commit()
+
+    def rollback(self):
+        if self.savepoint is None:
+            super().rollback()
+        else:
+            self.execute(f"ROLLBACK TO {self.savepoint}")
+
+    def executescript(self, sql_script):
+        # executescript() luôn COMMIT trước khi chạy -> phá savepoint và commit sớm khối ngoài
+        if self.savepoint is not None:
+            raise sqlite3.ProgrammingError(
+                "executescript() is not allowed inside a nested pool.connection() block"
+            )
+        return super().executescript(sql_script)
+
+class _PooledConnection:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.last_used = time.monotonic()
+        self.depth = 0
+        # Khối lồng nhau không hoàn tác được phần của mình -> khối ngoài cùng phải rollback
+        self.failed = False
+
+class SQLiteConnectionPool:
+    def __init__(self, db_path: str, max_size: int = 16, acquire_timeout: float = 30,
+                 health_check_after: float = 60, pragmas: Optional[Dict[str, object]] = None):
+        """
+        Khởi tạo SQLiteConnectionPool
+
+        Args:
+            db_path: Đường dẫn file database
+            max_size: Số connection mở đồng thời tối đa
+            acquire_timeout: Thời gian chờ connection rảnh tối đa (giây)
+            health_check_after: Nhàn rỗi quá số giây này thì kiểm tra trước khi dùng lại
+            pragmas: PRAGMA ghi đè lên DEFAULT_PRAGMAS
+        """
+        self.db_path = db_path
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_after = health_check_after
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._local = threading.local()
+
+    def _create(self) -> sqlite3.Connection:
+        """Mở connection mới và cấu hình PRAGMA"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.pragmas.get('busy_timeout', 5000) / 1000,
+            check_same_thread=False,  # connection đi qua nhiều thread (mỗi lúc một thread)
+            factory=_PoolConnection
+        )
+        for name, value in self.pragmas.items():
+            try:
+                conn.execute(f"PRAGMA {name} = {value}")
+            except sqlite3.Error as e:
+                print(f"⚠️  Could not set PRAGMA {name}: {e}")
+        return conn
+
+    def _is_usable(self, pooled: _PooledConnection) -> bool:
+        if time.monotonic() - pooled.last_used < self.health_check_after:
+            return True
+        try:
+            pooled.conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, pooled: _PooledConnection):
+        try:
+            pooled.conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _checkout(self) -> _PooledConnection:
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise sqlite3.OperationalError(
+                f"connection pool exhausted ({self.max_size} connections in use)"
+            )
+        try:
+            while True:
+                try:
+                    pooled = self._idle.get_nowait()
+                except queue.Empty:
+                    return _PooledConnection(self._create())
+                if self._is_usable(pooled):
+                    return pooled
+                self._discard(pooled)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _checkin(self, pooled: _PooledConnection, failed: bool):
+        """Kết thúc transaction còn mở rồi trả connection về pool"""
+        try:
+            if pooled.conn.in_transaction:
+                if failed or pooled.failed:
+                    pooled.conn.rollback()
+                else:
+                    pooled.conn.commit()
+            pooled.failed = False
+            pooled.conn.row_factory = None
+            pooled.last_used = time.monotonic()
+            self._idle.put(pooled)
+        except sqlite3.Error as e:
+            print(f"⚠️  Discarding pooled connection: {e}")
+            self._discard(pooled)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, row_factory=None):
+        """
+        Mượn connection cho thread hiện tại
+
+        Khối `with` ngoài cùng commit khi thành công, rollback khi có lỗi
+        (giống `with sqlite3.connect(...)`). Khối lồng nhau dùng lại connection
+        của khối ngoài trong một SAVEPOINT: thành công thì RELEASE (khối ngoài
+        commit), lỗi thì ROLLBACK TO phần ghi của riêng khối đó.
+
+        Args:
+            row_factory: Row factory cho connection (vd: sqlite3.Row), None = tuple
+
+        Yields:
+            sqlite3.Connection
+        """
+        pooled = getattr(self._local, 'pooled', None)
+        if pooled is None:
+            pooled = self._checkout()
+            self._local.pooled = pooled
+
+        conn = pooled.conn
+        previous_factory = conn.row_factory
+        previous_savepoint = conn.savepoint
+        conn.row_factory = row_factory
+        pooled.depth += 1
+        failed = False
+        savepoint = None
+        try:
+            if pooled.depth > 1:
+                # BEGIN trước để RELEASE không commit khi khối ngoài chưa mở transaction
+                if not conn.in_transaction:
+                    conn.execute("BEGIN")
+                savepoint = f"pool_sp_{pooled.depth}"
+                conn.execute(f"SAVEPOINT {savepoint}")
+                conn.savepoint = savepoint
+            yield conn
+            if savepoint:
+                conn.savepoint = previous_savepoint
+                conn.execute(f"RELEASE {savepoint}")
+        except BaseException:
+            failed = True
+            if savepoint:
+                conn.savepoint = previous_savepoint
+                try:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+                except sqlite3.Error:
+                    # Savepoint đã mất (SQLite tự rollback cả transaction) -> rollback ở khối ngoài cùng
+                    pooled.failed = True
+            raise
+        finally:
+            pooled.depth -= 1
+            conn.savepoint = previous_savepoint
+            conn.row_factory = previous_factory
+            if pooled.depth == 0:
+                self._local.pooled = None
+                self._checkin(pooled, failed)
+
+    def close_all(self):
+        """Đóng toàn bộ connection nhàn rỗi"""
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+_pools: Dict[str, SQLiteConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path: str, **options) -> SQLiteConnectionPool:
+    """
+    Lấy pool dùng chung cho một file database (tạo nếu chưa có)
+
+    Args:
+        db_path: Đường dẫn file database
+        **options: Tham số SQLiteConnectionPool (chỉ dùng khi tạo pool lần đầu)
+
+    Returns:
+        SQLiteConnectionPool
+    """
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = SQLiteConnectionPool(db_path, **options)
+        return pool
+
+def close_all_pools():
+    """Đóng connection nhàn rỗi của mọi pool (gọi khi process thoát)"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+
+atexit.register(close_all_pools)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Bảng settings_change_log: trigger trên user_settings (migration 008) ghi user_id mỗi khi
+# settings của user đổi. Các process (web app, notification runner) poll bảng này định kỳ
+# để bỏ cache settings / profile của đúng những user vừa đổi.
+from typing import Optional, Set, Tuple
+import sqlite3
+
+def latest_change_seq(conn: sqlite3.Connection) -> Optional[int]:
+    # None nếu chưa chạy migration 008 (chưa có bảng change log)
+    try:
+        row = conn.execute("SELECT MAX(seq) FROM settings_change_log").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] or 0
+
+def poll_changes(conn: sqlite3.Connection, since: Optional[int]) -> Tuple[Optional[int], Optional[Set[str]]]:
+    """
+    Lấy các user có settings thay đổi sau seq `since`
+
+    Args:
+        conn: Connection database
+        since: Seq đã xử lý lần trước (None = lần đầu, chỉ lấy mốc hiện tại)
+
+    Returns:
+        (seq mới nhất, set user_id); set là None khi không xác định được
+        (chưa có bảng, hoặc log đã bị cắt qua mốc since) -> caller bỏ toàn bộ cache
+    """
+    if since is None:
+        return latest_change_seq(conn), set()
+    try:
+        rows = conn.execute(
+            "SELECT seq, user_id FROM settings_change_log WHERE seq > ? ORDER BY seq",
+            (since,)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return None, None
+    if not rows:
+        return since, set()
+    if rows[0][0] > since + 1:
+        # Trigger đã xóa log cũ mà process này chưa đọc
+        return rows[-1][0], None
+    return rows[-1][0], {r[1] for r in rows}
@@ -1,15 +1,21 @@
 # -*- coding: utf-8 -*-
+from collections import OrderedDict
+import os
 import sqlite3
-from typing import Any, Dict, Optional
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from shared.database.connection_pool import get_pool
+from shared.database.settings_change_log import poll_changes
 
 class UserSettingsManager:
     def __init__(self, db_path: str):
         self.db_path = db_path
 
-    def _conn(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+    def _conn(self):
+        # Connection từ pool dùng chung (dùng với `with`, tự commit/trả lại pool)
+        return get_pool(self.db_path).connection(row_factory=sqlite3.Row)
 
     def get_setting(self, user_id: str, setting_key: str, tool_id: Optional[str] = None, default: Any = None) -> Any:
         print(f"🔍 Debug: get_setting(user_id={user_id}, key={setting_key}, tool_id={tool_id})")
@@ -55,9 +61,196 @@ class UserSettingsManager:
             print(f"🔍 Debug: Setting saved with tool_id={db_tool_id}")
 
     def get_all_settings(self, user_id: str, tool_id: Optional[str] = None) -> Dict[str, Any]:
+        return self.get_settings_bulk(user_id).get(self._scope(tool_id), {})
+
+    def _scope(self, tool_id: Optional[str]) -> Optional[str]:
+        # tool_id 'None' (chuỗi) trong dữ liệu cũ = global
+        return None if tool_id in (None, 'None') else tool_id
+
+    def get_settings_bulk(self, user_id: str,
+                          defaults: Optional[Dict[Optional[str], Dict[str, Any]]] = None
+                          ) -> Dict[Optional[str], Dict[str, Any]]:
+        """
+        Lấy toàn bộ settings của user (global + theo tool) bằng một query
+
+        Args:
+            user_id: ID user
+            defaults: Giá trị mặc định theo scope, vd {None: {'timezone': 'Asia/Ho_Chi_Minh'}}
+
+        Returns:
+            Dict scope -> {setting_key: value}; scope None = global
+        """
+        result: Dict[Optional[str], Dict[str, Any]] = {None: {}}
+        for scope, values in (defaults or {}).items():
+            result.setdefault(self._scope(scope), {}).update(values)
+
         with self._conn() as conn:
             rows = conn.execute(
-                "SELECT setting_key, setting_value FROM user_settings WHERE user_id = ? AND (tool_id IS ? OR tool_id = ?)",
-                (user_id, None if tool_id is None else None, tool_id)
+                "SELECT tool_id, setting_key, setting_value FROM user_settings WHERE user_id = ? ORDER BY updated_at",
+                (user_id,)
             ).fetchall()
-            return {r["setting_key"]: r["setting_value"] for r in rows}
\ No newline at end of file
+
+        # ORDER BY updated_at tăng dần -> giá trị mới nhất ghi đè (giống get_setting)
+        for r in rows:
+            if r["setting_value"] is not None:
+                result.setdefault(self._scope(r["tool_id"]), {})[r["setting_key"]] = r["setting_value"]
+
+        print(f"🔍 Debug: get_settings_bulk(user_id={user_id}) = {len(rows)} rows")
+        return result
+
+    def set_settings_bulk(self, user_id: str, settings: Dict[Optional[str], Dict[str, Any]],
+                          setting_type: str = 'string') -> int:
+        """
+        Lưu nhiều settings (nhiều scope) trong một transaction
+
+        Global (tool_id NULL) không dùng được ON CONFLICT vì NULL không trùng nhau
+        trong PRIMARY KEY, nên xóa các dòng cũ của key rồi chèn lại.
+
+        Args:
+            user_id: ID user
+            settings: Dict scope -> {setting_key: value}; scope None = global
+            setting_type: Kiểu setting
+
+        Returns:
+            Số settings đã lưu
+        """
+        global_rows = []
+        tool_rows = []
+        for scope, values in settings.items():
+            scope = self._scope(scope)
+            for key, value in values.items():
+                row = (user_id, scope, key, str(value), setting_type)
+                (global_rows if scope is None else tool_rows).append(row)
+
+        with self._conn() as conn:
+            if global_rows:
+                conn.executemany(
+                    "DELETE FROM user_settings WHERE user_id = ? AND setting_key = ? AND (tool_id IS NULL OR tool_id = 'None')",
+                    [(r[0], r[2]) for r in global_rows]
+                )
+                conn.executemany(
+                    """
+                    INSERT INTO user_settings (user_id, tool_id, setting_key, setting_value, setting_type, updated_at)
+                    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    """,
+                    global_rows
+                )
+            if tool_rows:
+                conn.executemany(
+                    """
+                    INSERT INTO user_settings (user_id, tool_id, setting_key, setting_value, setting_type, updated_at)
+                    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(user_id, tool_id, setting_key) DO UPDATE SET
+                        setting_value = excluded.setting_value,
+                        setting_type = excluded.setting_type,
+                        updated_at = CURRENT_TIMESTAMP
+                    """,
+                    tool_rows
+                )
+            conn.commit()
+
+        print(f"🔍 Debug: set_settings_bulk(user_id={user_id}) saved {len(global_rows) + len(tool_rows)} settings")
+        return len(global_rows) + len(tool_rows)
+
+# Cache settings theo process (LRU): (db_path, user_id) -> (expires_at, {scope: {key: value}})
+_settings_cache: "OrderedDict[Tuple[str, str], Tuple[float, Dict[Optional[str], Dict[str, Any]]]]" = OrderedDict()
+# Trạng thái poll settings_change_log theo db: db_path -> (seq đã đọc, thời điểm poll kế tiếp)
+_settings_sync: Dict[str, Tuple[Optional[int], float]] = {}
+_settings_lock = threading.Lock()
+
+class CachedUserSettingsManager(UserSettingsManager):
+    # Thời gian sống của một entry (giây) - lưới an toàn khi chưa có settings_change_log
+    cache_ttl = 300
+    # Khoảng cách giữa hai lần poll settings_change_log (giây)
+    poll_interval = 2
+    # Số user tối đa giữ trong cache
+    max_users = 5000
+
+    def _db_key(self) -> str:
+        return os.path.abspath(self.db_path)
+
+    def _sync(self):
+        # Poll change log tối đa mỗi poll_interval giây, bỏ cache của user vừa đổi settings
+        db_key = self._db_key()
+        now = time.monotonic()
+        with _settings_lock:
+            since, next_poll = _settings_sync.get(db_key, (None, 0.0))
+            if next_poll > now:
+                return
+            _settings_sync[db_key] = (since, now + self.poll_interval)
+
+        with self._conn() as conn:
+            seq, changed = poll_changes(conn, since)
+
+        with _settings_lock:
+            _settings_sync[db_key] = (seq, now + self.poll_interval)
+            if changed is None and since is not None:
+                self._drop(db_key, None)
+            for user_id in changed or ():
+                self._drop(db_key, user_id)
+
+    def _drop(self, db_key: str, user_id: Optional[str]):
+        # Gọi khi đang giữ _settings_lock
+        for key in [k for k in _settings_cache if k[0] == db_key and (user_id is None or k[1] == user_id)]:
+            del _settings_cache[key]
+
+    def _cached_scopes(self, user_id: str) -> Dict[Optional[str], Dict[str, Any]]:
+        self._sync()
+        key = (self._db_key(), user_id)
+        with _settings_lock:
+            entry = _settings_cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                _settings_cache.move_to_end(key)
+                return entry[1]
+
+        scopes = super().get_settings_bulk(user_id)
+        with _settings_lock:
+            _settings_cache[key] = (time.monotonic() + self.cache_ttl, scopes)
+            _settings_cache.move_to_end(key)
+            while len(_settings_cache) > self.max_users:
+                _settings_cache.popitem(last=False)
+        return scopes
+
+    def _write_through(self, user_id: str, settings: Dict[Optional[str], Dict[str, Any]]):
+        # Cập nhật entry đang cache (nếu có) theo giá trị vừa ghi
+        with _settings_lock:
+            entry = _settings_cache.get((self._db_key(), user_id))
+            if entry is None:
+                return
+            for scope, values in settings.items():
+                target = entry[1].setdefault(self._scope(scope), {})
+                target.update({k: str(v) for k, v in values.items()})
+
+    def get_setting(self, user_id: str, setting_key: str, tool_id: Optional[str] = None, default: Any = None) -> Any:
+        value = self._cached_scopes(user_id).get(self._scope(tool_id), {}).get(setting_key)
+        return default if value is None else value
+
+    def get_all_settings(self, user_id: str, tool_id: Optional[str] = None) -> Dict[str, Any]:
+        return dict(self._cached_scopes(user_id).get(self._scope(tool_id), {}))
+
+    def get_settings_bulk(self, user_id: str,
+                          defaults: Optional[Dict[Optional[str], Dict[str, Any]]] = None
+                          ) -> Dict[Optional[str], Dict[str, Any]]:
+        result = {None: {}}
+        for scope, values in (defaults or {}).items():
+            result.setdefault(self._scope(scope), {}).update(values)
+        for scope, values in self._cached_scopes(user_id).items():
+            result.setdefault(scope, {}).update(values)
+        return result
+
+    def set_setting(self, user_id: str, setting_key: str, setting_value: Any, tool_id: Optional[str] = None, setting_type: str = 'string', description: str = None) -> None:
+        super().set_setting(user_id, setting_key, setting_value, tool_id, setting_type, description)
+        self._write_through(user_id, {tool_id: {setting_key: setting_value}})
+
+    def set_settings_bulk(self, user_id: str, settings: Dict[Optional[str], Dict[str, Any]],
+                          setting_type: str = 'string') -> int:
+        count = super().set_settings_bulk(user_id, settings, setting_type)
+        self._write_through(user_id, settings)
+        return count
+
+    @staticmethod
+    def invalidate(user_id: Optional[str] = None):
+        # Xóa cache settings của user (None = toàn bộ) trong process hiện tại
+        with _settings_lock:
+            for key in [k for k in _settings_cache if user_id is None or k[1] == user_id]:
+                del _settings_cache[key]
@@ -1,12 +1,25 @@
 # -*- coding: utf-8 -*-
 from functools import wraps
-from flask import session, redirect, url_for, flash, current_app, abort
+from flask import session, redirect, url_for, flash, current_app, abort, g
 from shared.auth.permission_checker import PermissionChecker
 
 def _checker() -> PermissionChecker:
     db_path = current_app.config.get("DB_PATH", "database/calendar_tools.db")
     return PermissionChecker(db_path)
 
+def get_effective_access(user_id: str):
+    # Memo theo request (Flask g): decorators + can() trong template chỉ tra cache một lần
+    memo = g.setdefault('_effective_access', {})
+    if user_id not in memo:
+        memo[user_id] = _checker().get_effective_access(user_id)
+    return memo[user_id]
+
+def user_has_permission(user_id: str, permission_id: str) -> bool:
+    return permission_id in get_effective_access(user_id)['permissions']
+
+def user_has_tool_access(user_id: str, tool_id: str) -> bool:
+    return tool_id in get_effective_access(user_id)['tools']
+
 def require_login(f):
     @wraps(f)
     def _wrap(*args, **kwargs):
@@ -22,7 +35,7 @@ def require_tool_access(tool_id: str):
         @require_login
         def _wrap(*args, **kwargs):
             user_id = session.get('user_id')
-            if not _checker().has_tool_access(user_id, tool_id):
+            if not user_has_tool_access(user_id, tool_id):
                 abort(403)
                 flash('Bạn không có quyền truy cập công cụ này', 'error')
                 return redirect(url_for('index'))
@@ -36,7 +49,7 @@ def require_permission(permission_id: str):
         @require_login
         def _wrap(*args, **kwargs):
             user_id = session.get('user_id')
-            if not _checker().has_permission(user_id, permission_id):
+            if not user_has_permission(user_id, permission_id):
                 abort(403)
                 flash('Bạn không có quyền thực hiện hành động này', 'error')
                 return redirect(url_for('index'))